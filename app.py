@@ -4,20 +4,18 @@ import os
 import time
 import tempfile
 import re
-from utils.fetch_url import (
-    fetch_page_html,
-    extract_visible_text,
-    extract_title,
-    download_all_images,
-    download_all_audio,
-)
-from utils.ocr import extract_text_from_image
-from utils.whisper_asr import transcribe_audio
-from utils.gpt import multilang_summarize_and_classify  # 可以改成你自己的多語摘要函式
-from utils.search_filter import filter_notes
-from utils.markdown_export import export_notes_to_md
-from utils.notion_api import upload_to_notion
-from utils.dropbox_export import upload_to_dropbox
+from utils.gpt import DEFAULT_CLASSIFY_MODE, CANDIDATE_LABELS
+from utils.fetch_url import EXTRACT_MODE
+from utils.jobs import JobQueue, get_worker
+from utils.models import registry
+from utils.metrics import metrics
+from utils.search_filter import search_notes
+from utils.note_store import NoteStore, STORE_PATH as NOTE_STORE_PATH, content_key
+from utils.vector_index import VectorIndex, sync_index, search_text
+from utils.note_wall import PAGE_SIZE, PREVIEW_CHARS, WALL_COLUMNS, page_count, page_slice, render_note_page
+from utils.exporter import FORMATS as EXPORT_FORMATS, MIME_TYPES as EXPORT_MIME_TYPES, export_store
+from utils.notion_api import get_notion_sync
+from utils.dropbox_export import DropboxBackup
 
 # ──────────── 輔助函式：從文字中擷取所有 URL ────────────
 URL_REGEX = re.compile(
@@ -31,6 +29,74 @@ def extract_urls_from_text(text: str) -> list[str]:
     """
     return re.findall(URL_REGEX, text)
 
+@st.cache_resource
+def get_note_store() -> NoteStore:
+    """
+    行程內共用同一個持久化筆記庫。
+    """
+    return NoteStore()
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """
+    行程內共用同一個背景工作佇列。
+    """
+    return JobQueue()
+
+def enqueue_new_items(label: str, items: list[dict]) -> int:
+    """
+    過濾掉筆記庫已有、背景已在處理、或這個 session 已送出過的項目，其餘排入背景工作。
+    檔案類項目 (含 data) 會先存到 spool 資料夾。回傳實際排入的筆數。
+    """
+    queue = get_job_queue()
+    submitted = st.session_state.setdefault("submitted_keys", set())
+    items = list({item["key"]: item for item in items}.values())
+    missing = set(get_note_store().missing(item["key"] for item in items))
+    skip = queue.active_keys() | submitted
+    items = [item for item in items if item["key"] in missing and item["key"] not in skip]
+    if not items:
+        return 0
+    for item in items:
+        if "data" in item:
+            item["path"] = queue.spool_upload(item.pop("data"), item["source"])
+    queue.submit(
+        label,
+        items,
+        options={
+            "classify_mode": classify_mode,
+            "extract_mode": "main" if main_text_only else "full",
+            "labels": custom_labels or None,
+            "profile_dir": PROFILE_DIR if profile_jobs else None,
+        },
+    )
+    submitted.update(item["key"] for item in items)
+    return len(items)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_notes_df(version: tuple) -> pd.DataFrame:
+    """
+    只有筆記庫內容變動 (version 改變) 時才重新讀取，其餘 rerun 直接用快取。
+    """
+    return get_note_store().load_df(columns=WALL_COLUMNS, preview_chars=PREVIEW_CHARS)
+
+@st.cache_resource
+def get_vector_index() -> VectorIndex:
+    """
+    行程內共用同一個語意向量索引。
+    """
+    return VectorIndex()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def sync_vectors(version: tuple) -> int:
+    """
+    筆記庫有新筆記時，把還沒有向量的筆記補進索引 (只算新增的部分)。
+    """
+    return sync_index(get_vector_index(), get_note_store())
+
+SEMANTIC_TOP_K = 20
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(NOTE_STORE_PATH)), "exports")
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(NOTE_STORE_PATH)), "profiles")
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Streamlit 基本設定
 st.set_page_config(
@@ -74,9 +140,29 @@ with st.sidebar:
     )
     process_urls_btn = st.button("➡️ 處理貼入的網址", key="process_urls")
 
+    # 分類設定：快速 (句向量) 或高準確度 (XLM-R NLI)，以及自訂主題標籤
+    classify_mode = st.radio(
+        "🏷️ 分類模式",
+        options=["nli", "embedding"],
+        index=0 if DEFAULT_CLASSIFY_MODE == "nli" else 1,
+        format_func=lambda m: "高準確度 (XLM-R)" if m == "nli" else "快速 (句向量)",
+        horizontal=True
+    )
+    custom_labels_text = st.text_input(
+        "自訂主題標籤 (逗號分隔，留空使用預設)",
+        placeholder="、".join(CANDIDATE_LABELS)
+    )
+    custom_labels = [l.strip() for l in re.split(r"[,，、]", custom_labels_text) if l.strip()]
+    main_text_only = st.checkbox(
+        "📰 網頁只擷取正文 (去掉選單、頁尾、留言與相關文章)",
+        value=EXTRACT_MODE == "main",
+        help="判斷不出正文時會自動改用全頁文字",
+    )
+
     # 3. 關鍵字搜尋
     st.markdown("---")
     keyword = st.text_input("🔍 關鍵字搜尋", placeholder="搜尋筆記內容...")
+    semantic_query = st.text_input("🧭 語意搜尋", placeholder="描述你想找的內容，找出意思相近的筆記...")
 
     # 4. 主題分類下拉：動態生成，之後會依 note_data 填入
     category_options_placeholder = st.empty()
@@ -103,108 +189,96 @@ with st.sidebar:
         placeholder="輸入你的 Dropbox Token", 
         type="password"
     )
-    sync_dropbox_btn = st.button("➡️ 備份到 Dropbox", key="sync_dropbox")
+    sync_dropbox_btn = st.button("➡️ 備份到 Dropbox (只傳新增 / 變動)", key="sync_dropbox")
+    restore_dropbox_btn = st.button("♻️ 從 Dropbox 還原筆記牆", key="restore_dropbox")
 
     # 7. Markdown 下載
     st.markdown("---")
-    st.subheader("📄 Markdown 匯出")
-    export_md_btn = st.button("⬇️ 下載 Markdown", key="export_md")
+    st.subheader("📄 匯出筆記")
+    export_format = st.selectbox(
+        "匯出格式",
+        options=list(EXPORT_FORMATS),
+        format_func=lambda f: {"markdown": "Markdown", "jsonl": "JSON Lines", "parquet": "Parquet", "arrow": "Arrow"}[f],
+    )
+    export_incremental = st.checkbox(
+        "增量匯出 (只附加上次匯出後的新筆記，忽略篩選條件)",
+        disabled=export_format not in ("markdown", "jsonl"),
+    )
+    export_md_btn = st.button("⬇️ 匯出筆記", key="export_md")
+
+    # 8. 模型狀態：這個行程已載入哪些模型、各花了多久 (模型都在第一次用到時才載入)
+    st.markdown("---")
+    with st.expander("⚙️ 模型載入狀態"):
+        load_times = registry.load_times()
+        for name in registry.names():
+            st.caption(f"{name}：{f'{load_times[name]:.1f} 秒' if name in load_times else '尚未載入'}")
+
+    # 9. 各階段耗時：背景工作回報的 p50 / p95 (本行程啟動以來)，可匯出給監控系統
+    with st.expander("⏱️ 各階段耗時"):
+        stage_rows = metrics.summary()
+        if stage_rows:
+            st.dataframe(
+                pd.DataFrame(stage_rows)[["stage", "count", "p50", "p95", "total"]].rename(columns={
+                    "stage": "階段", "count": "次數", "p50": "p50 (秒)", "p95": "p95 (秒)", "total": "合計 (秒)",
+                }),
+                hide_index=True,
+                use_container_width=True,
+            )
+            counters = metrics.counters()
+            if counters:
+                st.caption("、".join(f"{name} {value:g}" for name, value in sorted(counters.items())))
+            st.download_button("Prometheus", metrics.to_prometheus(), "instanote_metrics.prom", "text/plain")
+            st.download_button("JSON", metrics.to_json(), "instanote_metrics.json", "application/json")
+        else:
+            st.caption("還沒有處理紀錄")
+        profile_jobs = st.checkbox(
+            "🔬 剖析之後排入的項目 (cProfile)",
+            help=f"每個項目各寫一份剖析結果到 {PROFILE_DIR}",
+        )
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 主要邏輯：note_data 同時儲存「上傳檔案」及「貼入網址」的結果
-note_data = []
+# 主要邏輯：「上傳檔案」及「貼入網址」排入背景工作 (OCR/ASR + 多語摘要分類)，
+# 處理完成的筆記寫進持久化筆記庫；重新整理頁面也不會中斷
+store = get_note_store()
+get_worker()  # 確保背景派工已啟動 (上次中斷的工作會接著處理)
+
+# ———— 0) 從 Dropbox 還原 (筆記牆是空的也可以) ————
+if restore_dropbox_btn:
+    if not dropbox_token:
+        st.sidebar.error("⚠️ 請先填寫 Dropbox Token！")
+    else:
+        with st.spinner("♻️ 從 Dropbox 還原中…"):
+            try:
+                result = DropboxBackup(dropbox_token).restore(
+                    store, media_dir=os.path.join(tempfile.gettempdir(), "instanote_restore")
+                )
+                st.sidebar.success(f"✅ 已從 {result['segments']} 個備份分段還原 {result['notes']} 筆筆記")
+            except Exception as e:
+                st.sidebar.error(f"Dropbox 還原失敗：{e}")
 
 # ———— 1) 處理：使用者上傳檔案 ————
 if upload_files:
-    st.sidebar.success(f"已上傳 {len(upload_files)} 筆檔案，開始處理⋯⋯")
-    with st.spinner("📦 進行 OCR/ASR + 多語摘要分類…"):
-        for file in upload_files:
-            # 如果上傳的是 .txt，且裡面可能有多個 URL，先抽出來批次處理
-            if file.name.lower().endswith(".txt"):
-                raw_text = file.read().decode("utf-8")
-                urls = extract_urls_from_text(raw_text)
-
-                if urls:
-                    # 若抓到至少一個 URL，就按每個 URL 處理
-                    for url in urls:
-                        try:
-                            html = fetch_page_html(url)
-                            title = extract_title(html)
-                            text_content = extract_visible_text(html)
-
-                            # 建立臨時資料夾，下載多媒體
-                            tmp_dir = os.path.join(tempfile.gettempdir(), "url_fetch")
-                            os.makedirs(tmp_dir, exist_ok=True)
-                            imgs = download_all_images(html, url, tmp_dir)
-                            audios = download_all_audio(html, url, tmp_dir)
-
-                            # 圖片做 OCR、音訊做 ASR
-                            for img_path in imgs:
-                                text_content += "\n" + extract_text_from_image(open(img_path, "rb"))
-                            for audio_path in audios:
-                                text_content += "\n" + transcribe_audio(open(audio_path, "rb"))
-
-                            summary, category, keywords = multilang_summarize_and_classify(text_content)
-
-                            record = {
-                                "type": "url_batch",
-                                "source": url,
-                                "url": url,
-                                "title": title,
-                                "content": text_content,
-                                "summary": summary,
-                                "category": category,
-                                "keywords": keywords,
-                                "media": imgs + audios
-                            }
-                            note_data.append(record)
-                        except Exception as e:
-                            st.sidebar.error(f"❌ 無法讀取或處理網址：{url}\n請先下載內容再上傳檔案 ({e})")
-                else:
-                    # 純文字檔但無 URL，直接當成一筆「文字內容」跑摘要
-                    content = raw_text
-                    summary, category, keywords = multilang_summarize_and_classify(content)
-                    record = {
-                        "type": "text",
-                        "source": file.name,
-                        "url": "",
-                        "title": file.name,
-                        "content": content,
-                        "summary": summary,
-                        "category": category,
-                        "keywords": keywords,
-                        "media": []
-                    }
-                    note_data.append(record)
-                continue  # 處理完這個 .txt 檔後，繼續下一個上傳檔案
-
-            # 非 .txt：圖片、音訊、或單純文字檔 (其他副檔名)
-            if file.type.startswith("image"):
-                content = extract_text_from_image(file)
-                media_paths = []
-            elif file.type.startswith("audio"):
-                content = transcribe_audio(file)
-                media_paths = []
-            else:
-                content = file.read().decode("utf-8")
-                media_paths = []
-
-            summary, category, keywords = multilang_summarize_and_classify(content)
-            record = {
-                "type": "file",
-                "source": file.name,
-                "url": "",
-                "title": file.name,
-                "content": content,
-                "summary": summary,
-                "category": category,
-                "keywords": keywords,
-                "media": media_paths
-            }
-            note_data.append(record)
-
-        time.sleep(0.5)
-    st.sidebar.success("✅ 上傳檔案處理完成！")
+    upload_items = []
+    for file in upload_files:
+        data = file.getvalue()
+        # 如果上傳的是 .txt，且裡面可能有多個 URL，先抽出來批次處理
+        if file.name.lower().endswith(".txt"):
+            urls = extract_urls_from_text(data.decode("utf-8"))
+            if urls:
+                upload_items.extend({"key": content_key(u), "kind": "url_batch", "source": u} for u in urls)
+                continue
+            kind = "text"
+        elif file.type.startswith("image"):
+            kind = "image"
+        elif file.type.startswith("audio"):
+            kind = "audio"
+        else:
+            kind = "text"
+        upload_items.append({"key": content_key(data), "kind": kind, "source": file.name, "data": data})
+
+    queued = enqueue_new_items(f"上傳檔案 ({len(upload_files)} 個)", upload_items)
+    if queued:
+        st.sidebar.success(f"已上傳 {len(upload_files)} 筆檔案，{queued} 筆新內容已排入背景處理⋯⋯")
 
 # ———— 2) 處理：使用者直接貼入網址 ————
 if process_urls_btn and paste_urls:
@@ -213,63 +287,87 @@ if process_urls_btn and paste_urls:
     if not urls:
         st.sidebar.error("❌ 這段文字中找不到有效的 URL，請確認格式或直接下載後上傳檔案。")
     else:
-        st.sidebar.success(f"共偵測到 {len(urls)} 個網址，開始批次擷取⋯⋯")
-        with st.spinner("🌐 擷取並處理貼入的網址…"):
-            for url in urls:
-                try:
-                    html = fetch_page_html(url)
-                    title = extract_title(html)
-                    text_content = extract_visible_text(html)
-
-                    tmp_dir = os.path.join(tempfile.gettempdir(), "url_fetch")
-                    os.makedirs(tmp_dir, exist_ok=True)
-                    imgs = download_all_images(html, url, tmp_dir)
-                    audios = download_all_audio(html, url, tmp_dir)
-
-                    for img_path in imgs:
-                        text_content += "\n" + extract_text_from_image(open(img_path, "rb"))
-                    for audio_path in audios:
-                        text_content += "\n" + transcribe_audio(open(audio_path, "rb"))
-
-                    summary, category, keywords = multilang_summarize_and_classify(text_content)
-
-                    record = {
-                        "type": "url",
-                        "source": url,
-                        "url": url,
-                        "title": title,
-                        "content": text_content,
-                        "summary": summary,
-                        "category": category,
-                        "keywords": keywords,
-                        "media": imgs + audios
-                    }
-                    note_data.append(record)
-                except Exception as e:
-                    st.sidebar.error(f"❌ 網址 {url} 處理失敗：{e}\n請先下載檔案再上傳。")
-            time.sleep(0.5)
-        st.sidebar.success("✅ 貼入網址處理完成！")
+        # 按下按鈕代表要重試，先把這些網址從本 session 的已送出清單移除
+        st.session_state.setdefault("submitted_keys", set()).difference_update(content_key(u) for u in urls)
+        queued = enqueue_new_items(
+            f"貼入網址 ({len(urls)} 個)",
+            [{"key": content_key(u), "kind": "url", "source": u} for u in urls],
+        )
+        st.sidebar.success(f"共偵測到 {len(urls)} 個網址，其中 {queued} 個已排入背景處理⋯⋯")
+
+# ———— 3) 背景工作進度：每 2 秒更新，有新筆記完成就重新整理筆記牆 ————
+@st.fragment(run_every=2)
+def render_jobs_panel():
+    recent = [
+        job for job in get_job_queue().list_jobs(limit=5)
+        if job["status"] in ("queued", "running") or time.time() - job["updated_at"] < 300
+    ]
+    if recent:
+        st.subheader("⏳ 背景處理進度")
+    for job in recent:
+        finished = job["done"] + job["failed"] + job["cancelled"]
+        progress_col, cancel_col = st.columns([5, 1])
+        progress_col.progress(
+            finished / job["total"] if job["total"] else 1.0,
+            text=f"{job['label']}：完成 {job['done']}／失敗 {job['failed']}／共 {job['total']} 筆"
+            + ("（已取消）" if job["status"] == "cancelled" else "")
+        )
+        if job["status"] in ("queued", "running"):
+            cancel_col.button("取消", key=f"cancel_{job['id']}", on_click=get_job_queue().cancel, args=(job["id"],))
+        if job["errors"]:
+            with st.expander(f"❌ {len(job['errors'])} 筆處理失敗"):
+                for source, error in job["errors"]:
+                    st.caption(f"{source}：{error}")
+    if get_note_store().version() != st.session_state.get("wall_version"):
+        st.rerun()
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 若 note_data 有內容，將它轉成 DataFrame 並顯示
-if note_data:
-    notes_df = pd.DataFrame(note_data)
-
-    # 1. 更新「主題分類」下拉：先放「全部」再依序放實際 categories
-    category_list = ["全部"] + sorted(notes_df["category"].unique().tolist())
+# 若筆記庫有內容，從庫裡載入 DataFrame 並顯示
+st.session_state["wall_version"] = store.version()
+render_jobs_panel()
+notes_df = load_notes_df(st.session_state["wall_version"])
+if not notes_df.empty:
+    # 1. 更新「主題分類」下拉：先放「全部」再依序放實際 categories，並附上符合關鍵字的筆數
+    #    (分類清單與筆數都由筆記庫的彙總查詢取得，不掃 DataFrame)
+    category_counts = store.category_counts(keyword or None)
+    category_list = ["全部"] + sorted(store.category_counts() if keyword else category_counts)
     category = category_options_placeholder.selectbox(
         "🗂️ 選擇主題分類",
         category_list,
-        index=0
+        index=0,
+        format_func=lambda c: f"{c} ({sum(category_counts.values()) if c == '全部' else category_counts.get(c, 0)})"
     )
 
-    # 2. 篩選：先按關鍵字，再按主題分類
-    filtered_df = filter_notes(
-        notes_df.rename(columns={"category": "主題", "content": "原文", "summary": "摘要"}),
+    # 2. 篩選：先按關鍵字 (全文索引，依相關度排序)，再按主題分類
+    filtered_df = search_notes(
+        store,
+        notes_df.rename(columns={"category": "主題", "summary": "摘要"}),
         keyword=keyword,
         category=category
     )
 
+    # 2-1. 語意搜尋 / 相似筆記：改依向量索引的相似度排序 (仍套用上面的關鍵字與分類篩選)
+    similar_to = st.session_state.get("similar_to")
+    if semantic_query or similar_to:
+        with st.spinner("🧭 計算語意相似度…"):
+            sync_vectors(store.version())
+            if similar_to:
+                hits = get_vector_index().similar_to(similar_to, k=SEMANTIC_TOP_K)
+            else:
+                hits = search_text(get_vector_index(), semantic_query, k=SEMANTIC_TOP_K)
+        filtered_df = (
+            filtered_df.set_index("id", drop=False)
+            .reindex([note_id for note_id, _ in hits])
+            .dropna(subset=["id"])
+            .reset_index(drop=True)
+        )
+        if similar_to:
+            info_col, clear_col = st.columns([4, 1])
+            similar_rows = notes_df.loc[notes_df["id"] == similar_to]
+            similar_label = similar_rows["title"].iloc[0] if not similar_rows.empty else similar_to
+            info_col.info(f"🔗 與「{similar_label}」相似的筆記")
+            clear_col.button("清除", key="clear_similar", on_click=lambda: st.session_state.pop("similar_to", None))
+
     # 3. 左側顯示統計資訊
     col1, col2, col3 = st.columns(3)
     col1.metric("🔢 總筆記數", len(notes_df))
@@ -279,86 +377,88 @@ if note_data:
 
     st.markdown("---")
 
-    # 4. 按「主題」分組，兩欄顯示每筆筆記
-    grouped = filtered_df.groupby("主題")
-    for topic, group in grouped:
-        st.subheader(f"📂 {topic} ({len(group)})")
-        left_col, right_col = st.columns(2)
-        for idx, row in group.iterrows():
-            label = row["title"] or row["source"]
-            with (left_col if (idx % 2 == 0) else right_col).expander(f"📎 {label}"):
-                st.markdown(f"**摘要：** {row['摘要']}")
-                st.markdown(f"**原文內容：**\n{row['原文'][:1000]}{'...' if len(row['原文'])>1000 else ''}")
+    # 4. 分頁：按「主題」分組、兩欄顯示，只渲染目前這一頁；篩選條件改變時回到第 1 頁
+    wall_filter = (keyword, category, semantic_query, similar_to)
+    if st.session_state.get("wall_filter") != wall_filter:
+        st.session_state["wall_filter"] = wall_filter
+        st.session_state["wall_page"] = 1
+    pages = page_count(len(filtered_df))
+    st.session_state["wall_page"] = min(st.session_state.get("wall_page", 1), pages)
+    page = st.number_input(f"📄 頁數 (共 {pages} 頁，每頁 {PAGE_SIZE} 筆)", min_value=1, max_value=pages, key="wall_page")
+
+    page_df = page_slice(filtered_df, page)
+    page_dups = set(page_df["duplicate_of"]) - {""}
+    original_rows = notes_df.loc[notes_df["id"].isin(page_dups)]
+    titles_by_id = dict(zip(
+        original_rows["id"], original_rows["title"].where(original_rows["title"] != "", original_rows["source"])
+    ))
+    render_note_page(
+        store,
+        page_df,
+        topic_counts=filtered_df["主題"].value_counts().to_dict(),
+        titles_by_id=titles_by_id,
+        on_similar=lambda note_id: st.session_state.update(similar_to=note_id),
+        version=st.session_state["wall_version"],
+    )
 
     # 5. 按鈕回呼：Markdown 匯出、Notion 同步、Dropbox
     if export_md_btn:
-        export_path = export_notes_to_md(
-            filtered_df.rename(columns={
-                "category": "主題",
-                "content": "原文",
-                "summary": "摘要",
-                "keywords": "關鍵字",
-                "url": "網址",
-                "title": "標題"
-            }).to_dict("records"),
-            path="notes_export.md"
-        )
-        with open(export_path, "rb") as f:
-            st.sidebar.download_button(
-                label="⬇️ 下載 notes_export.md",
-                data=f,
-                file_name="notes_export.md",
-                mime="text/markdown"
-            )
+        # 從筆記庫串流寫到磁碟，再把檔案交給 download_button，不在記憶體組出整份內容
+        ext = EXPORT_FORMATS[export_format]
+        # 停用的 checkbox 會保留先前的值，切到 parquet / arrow 時要自己排除
+        incremental = export_incremental and export_format in ("markdown", "jsonl")
+        tmp_path = None
+        if incremental:
+            exported = export_store(store, os.path.join(EXPORT_DIR, f"notes_export{ext}"), export_format, incremental=True)
+        else:
+            # 每次匯出各用一個暫存檔，同一行程裡的多個 session 不會互相覆蓋
+            fd, tmp_path = tempfile.mkstemp(prefix="instanote_export_", suffix=ext)
+            os.close(fd)
+            exported = export_store(store, tmp_path, export_format, ids=set(filtered_df["id"]))
+        st.sidebar.caption(f"本次匯出 {exported['count']} 筆")
+        try:
+            with open(exported["path"], "rb") as f:
+                st.sidebar.download_button(
+                    label=f"⬇️ 下載 notes_export{ext}",
+                    data=f,
+                    file_name=f"notes_export{ext}",
+                    mime=EXPORT_MIME_TYPES[export_format]
+                )
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
     if sync_notion_btn:
         if not notion_token or not notion_db_id:
             st.sidebar.error("⚠️ 請先填寫 Notion Token 與 Database ID！")
         else:
-            with st.spinner("🔄 同步到 Notion 中…"):
-                success_count = 0
-                for _, row in filtered_df.iterrows():
-                    try:
-                        upload_to_notion(
-                            page_id=notion_db_id,
-                            summary=row["摘要"],
-                            category=row["主題"],
-                            source_text=row["原文"],
-                            notion_token=notion_token,
-                            url=row["url"],
-                            title=row["title"],
-                            keywords=row["keywords"]
-                        )
-                        success_count += 1
-                    except Exception as e:
-                        st.sidebar.error(f"同步失敗：{row['source']} － {e}")
-                time.sleep(0.5)
-            st.sidebar.success(f"✅ 已成功同步 {success_count} 筆到 Notion！")
+            # 原文不在筆記牆的 DataFrame 裡，從筆記庫串流讀出篩選結果的完整筆記
+            sync_ids = set(filtered_df["id"])
+            notes_to_sync = [note for note in store.iter_notes() if note["id"] in sync_ids]
+            progress_bar = st.sidebar.progress(0.0, text="🔄 同步到 Notion 中…")
+            result = get_notion_sync(notion_token, notion_db_id).sync(
+                notes_to_sync,
+                progress=lambda done, total: progress_bar.progress(done / total, text=f"🔄 同步到 Notion 中… {done}/{total}"),
+            )
+            progress_bar.empty()
+            for note_id, error in result["errors"]:
+                st.sidebar.error(f"同步失敗：{note_id[:12]} － {error}")
+            st.sidebar.success(
+                f"✅ Notion 同步完成：新增 {result['created']}、更新 {result['updated']}、"
+                f"未變動略過 {result['skipped']} 筆"
+            )
 
     if sync_dropbox_btn:
         if not dropbox_token:
             st.sidebar.error("⚠️ 請先填寫 Dropbox Token！")
         else:
-            tmp_md = export_notes_to_md(
-                filtered_df.rename(columns={
-                    "category": "主題",
-                    "content": "原文",
-                    "summary": "摘要",
-                    "keywords": "關鍵字",
-                    "url": "網址",
-                    "title": "標題"
-                }).to_dict("records"),
-                path="notes_backup.md"
-            )
             with st.spinner("☁️ 備份到 Dropbox 中…"):
                 try:
-                    dropbox_path = f"/notes_backup_{int(time.time())}.md"
-                    upload_to_dropbox(
-                        token=dropbox_token,
-                        local_file_path=tmp_md,
-                        dropbox_dest_path=dropbox_path
+                    result = DropboxBackup(dropbox_token).backup(store)
+                    st.sidebar.success(
+                        f"✅ 已備份 {result['notes']} 筆新增/變動筆記、{result['media']} 個媒體檔"
+                        f" ({result['bytes'] / 1024:.0f} KiB)"
                     )
-                    st.sidebar.success(f"✅ 已備份至 Dropbox：{dropbox_path}")
                 except Exception as e:
                     st.sidebar.error(f"Dropbox 備份失敗：{e}")
                     raise
@@ -0,0 +1,140 @@
+# benchmarks/bench_backends.py
+"""
+推論後端的品質回歸與延遲比較：以 fp32 為基準，量測 int8 / onnx 的
+  - 分類：與 fp32 標籤一致的比例、對標註資料的準確度
+  - 摘要：與 fp32 摘要的字元級 ROUGE-L F1 (中英文通用，不需要斷詞)
+  - 每篇延遲與模型大小
+任一後端低於門檻時以非零狀態結束，可放進 CI。
+
+模型從 INSTANOTE_MODEL_DIR 載入 (先執行 python -m utils.inference prepare --onnx)，
+搭配 INSTANOTE_OFFLINE=1 即可完全離線執行：
+    INSTANOTE_OFFLINE=1 python -m benchmarks.bench_backends --backends int8 onnx
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+from benchmarks.bench_classifier import LABELED_NOTES
+from benchmarks.bench_summarize import make_notes
+from utils import inference
+from utils.gpt import (
+    CANDIDATE_LABELS,
+    CLASSIFIER_MODEL,
+    SUMMARIZER_MODEL,
+    _classify_batch,
+    _map_reduce_summarize,
+    build_classifier,
+    build_summarizer,
+)
+
+
+def rouge_l(candidate: str, reference: str) -> float:
+    """
+    字元級 ROUGE-L F1：最長共同子序列長度換算的 F1。
+    """
+    if not candidate or not reference:
+        return float(candidate == reference)
+    prev = [0] * (len(reference) + 1)
+    for a in candidate:
+        cur = [0]
+        for j, b in enumerate(reference):
+            cur.append(prev[j] + 1 if a == b else max(prev[j + 1], cur[j]))
+        prev = cur
+    lcs = prev[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(candidate), lcs / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def model_mb(model, backend: str, model_name: str) -> float:
+    if backend == "onnx":
+        root = inference.local_path(model_name, "--onnx")
+        size = sum(
+            os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files
+        )
+        return size / 1e6
+    import torch
+
+    # 量化後的權重打包在 packed params 裡，以序列化後的大小比較才公平
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell() / 1e6
+
+
+def run_backend(backend: str, texts: list[str], notes: list[str], batch_size: int) -> dict:
+    summarizer = build_summarizer(backend)
+    classifier = build_classifier(backend)
+    # 暖機一次，排除第一次呼叫的初始化成本
+    _classify_batch(classifier, texts[:1], CANDIDATE_LABELS)
+    _map_reduce_summarize(summarizer, notes[:1], batch_size)
+
+    start = time.perf_counter()
+    labels = []
+    for i in range(0, len(texts), batch_size):
+        labels += _classify_batch(classifier, texts[i:i + batch_size], CANDIDATE_LABELS)
+    classify_seconds = (time.perf_counter() - start) / len(texts)
+
+    start = time.perf_counter()
+    summaries = _map_reduce_summarize(summarizer, notes, batch_size)
+    summarize_seconds = (time.perf_counter() - start) / len(notes)
+
+    return {
+        "labels": labels,
+        "summaries": summaries,
+        "classify_ms": classify_seconds * 1000,
+        "summarize_ms": summarize_seconds * 1000,
+        "size_mb": model_mb(summarizer.model, backend, SUMMARIZER_MODEL)
+        + model_mb(classifier.model, backend, CLASSIFIER_MODEL),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["int8", "onnx"], choices=inference.BACKENDS[1:])
+    parser.add_argument("--notes", type=int, default=8, help="摘要比較用的筆記數")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--min-label-agreement", type=float, default=0.9)
+    parser.add_argument("--min-summary-score", type=float, default=0.6)
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    texts = [text for text, _ in LABELED_NOTES]
+    gold = [label for _, label in LABELED_NOTES]
+    notes = make_notes(args.notes)
+
+    baseline = run_backend("fp32", texts, notes, args.batch_size)
+    results = {"fp32": baseline}
+    for backend in args.backends:
+        results[backend] = run_backend(backend, texts, notes, args.batch_size)
+
+    print(
+        f"{'backend':>8} {'accuracy':>9} {'agree':>7} {'rouge-l':>8} "
+        f"{'cls ms':>8} {'sum ms':>8} {'size MB':>8}"
+    )
+    failed = []
+    for backend, r in results.items():
+        accuracy = sum(p == g for p, g in zip(r["labels"], gold)) / len(gold)
+        agree = sum(p == b for p, b in zip(r["labels"], baseline["labels"])) / len(texts)
+        rouge = sum(rouge_l(s, b) for s, b in zip(r["summaries"], baseline["summaries"])) / len(notes)
+        print(
+            f"{backend:>8} {accuracy:>9.2%} {agree:>7.2%} {rouge:>8.3f} "
+            f"{r['classify_ms']:>8.1f} {r['summarize_ms']:>8.1f} {r['size_mb']:>8.1f}"
+        )
+        if agree < args.min_label_agreement or rouge < args.min_summary_score:
+            failed.append(backend)
+
+    if failed:
+        print(f"品質低於門檻：{', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
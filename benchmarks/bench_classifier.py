@@ -0,0 +1,76 @@
+# benchmarks/bench_classifier.py
+"""
+比較兩種分類引擎的準確度與延遲：
+  - nli：XLM-R zero-shot (每個標籤一次大模型前向)
+  - embedding：句向量 + 快取的標籤向量 (每篇筆記一次小模型前向)
+
+執行方式（在專案根目錄，需能下載或已快取模型）：
+    python -m benchmarks.bench_classifier --repeat 2
+"""
+
+import argparse
+import time
+
+from utils.gpt import (
+    CANDIDATE_LABELS,
+    _classify_texts,
+    get_label_vectors,
+    load_multilang_classifier,
+)
+
+# 小型標註資料集：(文字, 正確標籤)
+LABELED_NOTES = [
+    ("這家拉麵湯頭濃郁，叉燒入口即化，排隊一小時也值得。", "美食"),
+    ("推薦台南五家必吃的早餐店，牛肉湯和碗粿都很道地。", "美食"),
+    ("Homemade sourdough recipe with a crispy crust and open crumb.", "美食"),
+    ("新款筆電搭載最新處理器，續航力提升到二十小時。", "科技"),
+    ("OpenAI released a new model that improves code generation.", "科技"),
+    ("教你用 Python 寫一個簡單的網頁爬蟲。", "科技"),
+    ("京都賞楓五日遊行程，清水寺和嵐山一定要去。", "旅遊"),
+    ("Backpacking through Iceland: ring road itinerary and tips.", "旅遊"),
+    ("冰島自駕環島十天，極光與瀑布的絕美紀錄。", "旅遊"),
+    ("這部電影的特效震撼，結局也出乎意料。", "娛樂"),
+    ("The band announced a world tour starting next spring.", "娛樂"),
+    ("綜藝節目最新一集笑點滿滿，來賓互動超有趣。", "娛樂"),
+    ("多益考試準備心得：每天背五十個單字並練習聽力。", "學習"),
+    ("How to take better lecture notes with the Cornell method.", "學習"),
+    ("線上課程推薦：機器學習入門到實戰。", "學習"),
+    ("新創公司完成 A 輪募資，估值突破十億。", "商業"),
+    ("Quarterly earnings beat analyst expectations by a wide margin.", "商業"),
+    ("小店經營心得：如何用社群行銷提升營業額。", "商業"),
+    ("整理房間的十個小技巧，讓居家空間更清爽。", "生活"),
+    ("Morning routine ideas for a calmer and more productive day.", "生活"),
+    ("換季衣物收納方法，衣櫃瞬間多出一倍空間。", "生活"),
+]
+
+
+def evaluate(mode: str, texts: list[str], gold: list[str], repeat: int) -> tuple[float, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predicted = _classify_texts(texts, CANDIDATE_LABELS, mode)
+        timings.append(time.perf_counter() - start)
+    accuracy = sum(p == g for p, g in zip(predicted, gold)) / len(gold)
+    return accuracy, min(timings) / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    texts = [t for t, _ in LABELED_NOTES]
+    gold = [g for _, g in LABELED_NOTES]
+
+    # 暖機：模型載入與標籤向量計算不算入延遲
+    load_multilang_classifier()
+    get_label_vectors(CANDIDATE_LABELS)
+
+    print(f"{'mode':>10} {'accuracy':>9} {'ms/note':>9}")
+    for mode in ("nli", "embedding"):
+        accuracy, per_note = evaluate(mode, texts, gold, args.repeat)
+        print(f"{mode:>10} {accuracy:>9.1%} {per_note * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_cold_start.py
+"""
+量測 app.py 冷啟動時「匯入所有依賴」的耗時 (首次畫面出現前的主要成本)。
+每次都在全新的 Python 行程裡執行，取多次的中位數。
+
+加上 --rev 可同時量測另一個 git 版本 (例如改版前的 baseline)，方便前後比較：
+    python -m benchmarks.bench_cold_start --repeat 5
+    python -m benchmarks.bench_cold_start --rev HEAD~1 --repeat 5
+"""
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+print(time.perf_counter() - start)
+"""
+
+
+def app_imports(root: str) -> list[str]:
+    """
+    從 app.py 的頂層 import 敘述找出它啟動時會匯入的模組。
+    """
+    with open(os.path.join(root, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure(root: str, repeat: int) -> float:
+    modules = app_imports(root)
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE, *modules],
+            cwd=root, capture_output=True, text=True, check=True,
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rev", help="另外量測的 git 版本 (會暫時建立 git worktree)")
+    args = parser.parse_args()
+
+    print(f"working tree: {measure(ROOT, args.repeat):.2f}s")
+    if args.rev:
+        worktree = tempfile.mkdtemp(prefix="instanote-bench-")
+        subprocess.run(["git", "worktree", "add", "--detach", worktree, args.rev], cwd=ROOT, check=True)
+        try:
+            print(f"{args.rev}: {measure(worktree, args.repeat):.2f}s")
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=ROOT, check=True)
+
+
+if __name__ == "__main__":
+    main()
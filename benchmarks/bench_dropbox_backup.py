@@ -0,0 +1,147 @@
+# benchmarks/bench_dropbox_backup.py
+"""
+以記憶體中的 Dropbox 替身量測增量備份：首次完整備份、沒有變動、新增少量筆記後再備份，
+最後從替身還原到一個全新的筆記庫並比對筆數。不需要 Dropbox 帳號。
+
+    python -m benchmarks.bench_dropbox_backup --notes 5000 --added 100
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import types
+import uuid
+
+from utils.dropbox_export import DropboxBackup
+from utils.note_store import NoteStore
+
+
+class _Response:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def iter_content(self, chunk_size: int):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeDropbox:
+    """
+    只實作 DropboxBackup 用到的 API，檔案存在 dict 裡；記錄各 API 的呼叫次數與上傳位元組。
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.sessions = {}
+        self.calls = {}
+        self.uploaded_bytes = 0
+
+    def _count(self, name: str, data: bytes = b""):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.uploaded_bytes += len(data)
+
+    def files_upload(self, data, path, mode=None):
+        self._count("files_upload", data)
+        self.files[path] = bytes(data)
+
+    def files_upload_session_start(self, data):
+        self._count("session_start", data)
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = bytearray(data)
+        return types.SimpleNamespace(session_id=session_id)
+
+    def files_upload_session_append_v2(self, data, cursor):
+        self._count("session_append", data)
+        buf = self.sessions[cursor.session_id]
+        assert cursor.offset == len(buf), "offset mismatch"
+        buf.extend(data)
+
+    def files_upload_session_finish(self, data, cursor, commit):
+        self._count("session_finish", data)
+        buf = self.sessions.pop(cursor.session_id)
+        assert cursor.offset == len(buf), "offset mismatch"
+        buf.extend(data)
+        self.files[commit.path] = bytes(buf)
+
+    def files_download(self, path):
+        self._count("files_download")
+        return None, _Response(self.files[path])
+
+
+FILES_TYPES = types.SimpleNamespace(
+    WriteMode=types.SimpleNamespace(overwrite="overwrite"),
+    UploadSessionCursor=lambda session_id, offset: types.SimpleNamespace(session_id=session_id, offset=offset),
+    CommitInfo=lambda path, mode: types.SimpleNamespace(path=path, mode=mode),
+)
+
+
+def make_notes(count: int, offset: int = 0, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed + offset)
+    return [
+        {
+            "id": f"note-{offset + i}",
+            "type": "url",
+            "source": f"https://example.com/{offset + i}",
+            "url": f"https://example.com/{offset + i}",
+            "title": f"筆記 {offset + i}",
+            "content": "社群貼文內容，" * rng.randint(20, 400),
+            "summary": "摘要",
+            "category": rng.choice(["科技", "旅遊", "美食"]),
+            "keywords": ["測試"],
+            "media": [],
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--added", type=int, default=100)
+    parser.add_argument("--chunk-mb", type=float, default=None, help="覆寫上傳分塊大小 (MB)")
+    args = parser.parse_args()
+
+    if args.chunk_mb:
+        import utils.dropbox_export as dropbox_export
+        dropbox_export.CHUNK_SIZE = int(args.chunk_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NoteStore(os.path.join(tmp, "notes.sqlite"))
+        store.add_many(make_notes(args.notes))
+        dbx = FakeDropbox()
+        backup = DropboxBackup(
+            dbx=dbx, files_types=FILES_TYPES, manifest_path=os.path.join(tmp, "manifest.sqlite"),
+        )
+
+        for label, added in (("initial", 0), ("unchanged", 0), (f"+{args.added} notes", args.added)):
+            if added:
+                store.add_many(make_notes(added, offset=args.notes))
+            before = dbx.uploaded_bytes
+            start = time.perf_counter()
+            result = backup.backup(store)
+            print(
+                f"{label:>12}: {time.perf_counter() - start:6.2f}s, {result['notes']} notes, "
+                f"{(dbx.uploaded_bytes - before) / 1024:.0f} KiB uploaded"
+            )
+        print(f"api calls: {dbx.calls}")
+
+        restored = NoteStore(os.path.join(tmp, "restored.sqlite"))
+        restorer = DropboxBackup(
+            dbx=dbx, files_types=FILES_TYPES, manifest_path=os.path.join(tmp, "restored-manifest.sqlite"),
+        )
+        start = time.perf_counter()
+        result = restorer.restore(restored, media_dir=os.path.join(tmp, "media"))
+        print(
+            f"restore: {time.perf_counter() - start:.2f}s, {result['notes']} records from "
+            f"{result['segments']} segments, {restored.version()[0]} notes in restored store"
+        )
+        print(f"backup after restore: {restorer.backup(restored)['notes']} notes re-uploaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_extract.py
+"""
+比較 parse_page 的全文模式 (full) 與正文模式 (main) 送進模型的 token 數，
+並檢查 fixtures/html/expected.json 列出的正文片段都有保留、樣板片段都被去掉。
+
+token 數預設用 mT5 tokenizer (本地模型資料夾或 Hub 有就用)，
+拿不到時改用估算：中日韓文字一字一 token，英數字每個詞一 token，標點各一 token。
+
+    python -m benchmarks.bench_extract
+    python -m benchmarks.bench_extract --fixtures path/to/saved/pages --tokenizer approx
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from utils.fetch_url import parse_page
+from utils.search_index import _CJK
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+_APPROX_RE = re.compile(rf"[{_CJK}]|(?:(?![{_CJK}])[^\W_])+|[^\w\s]")
+
+
+def make_counter(kind: str):
+    if kind in ("auto", "mt5"):
+        try:
+            from transformers import AutoTokenizer
+            from utils import inference
+            from utils.gpt import SUMMARIZER_MODEL
+
+            tokenizer = AutoTokenizer.from_pretrained(inference.resolve(SUMMARIZER_MODEL))
+            return "mt5", lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+        except Exception as e:
+            if kind == "mt5":
+                raise
+            print(f"(mT5 tokenizer 無法載入，改用估算：{e})", file=sys.stderr)
+    return "approx", lambda text: len(_APPROX_RE.findall(text))
+
+
+def check(text: str, expected: dict) -> list[str]:
+    problems = [f"缺少正文：{s}" for s in expected.get("keep", []) if s not in text]
+    problems += [f"殘留樣板：{s}" for s in expected.get("drop", []) if s in text]
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="存放 .html 的資料夾 (可附 expected.json)")
+    parser.add_argument("--tokenizer", choices=["auto", "mt5", "approx"], default="auto")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    if not paths:
+        parser.error(f"{args.fixtures} 裡沒有 .html")
+    expected_path = os.path.join(args.fixtures, "expected.json")
+    expected = {}
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding="utf-8") as f:
+            expected = json.load(f)
+    tokenizer_name, count_tokens = make_counter(args.tokenizer)
+
+    print(f"tokenizer: {tokenizer_name}")
+    print(f"{'page':<24} {'full':>7} {'main':>7} {'saved':>7} {'mode':>5} {'+ms':>6}  check")
+    total_full = total_main = 0
+    failures = 0
+    for path in paths:
+        name = os.path.basename(path)
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        timings = {}
+        for mode in ("full", "main"):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                parsed = parse_page(html, mode=mode)
+                best = min(best, time.perf_counter() - start)
+            timings[mode] = (best, parsed)
+        full_tokens = count_tokens(timings["full"][1]["text"])
+        main = timings["main"][1]
+        main_tokens = count_tokens(main["text"])
+        total_full += full_tokens
+        total_main += main_tokens
+        problems = check(main["text"], expected.get(name, {}))
+        failures += bool(problems)
+        extra_ms = (timings["main"][0] - timings["full"][0]) * 1000
+        saved = 1 - main_tokens / full_tokens if full_tokens else 0.0
+        print(
+            f"{name:<24} {full_tokens:>7} {main_tokens:>7} {saved:>7.0%} {main['extracted']:>5} {extra_ms:>6.1f}  "
+            + ("ok" if not problems else "; ".join(problems))
+        )
+
+    saved = 1 - total_main / total_full if total_full else 0.0
+    print(f"{'total':<24} {total_full:>7} {total_main:>7} {saved:>7.0%}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_keywords.py
+"""
+量測關鍵字 DF 統計的增量更新成本：筆記庫分階段成長到 --notes 筆，每個階段量
+「新增一批筆記時每筆的統計更新時間」與「每筆的關鍵字擷取時間」，應與筆記庫大小無關；
+另量一次「從零重算整個語料的統計」作為對照。
+
+    python -m benchmarks.bench_keywords --notes 10000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+from utils import keyword_index
+from utils.note_store import NoteStore
+
+_VOCAB = (
+    "機器學習 人工智慧 深度學習 牛肉麵 咖啡廳 旅遊 日本 台北 股票 投資 健身 減肥 料理 食譜 "
+    "電影 音樂 演唱會 貓咪 狗狗 手機 相機 攝影 程式 設計 創業 行銷 房價 租屋 保險 讀書"
+).split()
+_FILLERS = ["，", "。", "，今天的", "，我們覺得", "，真的很不錯，", "！", "、"]
+
+
+def make_notes(count: int, offset: int, rng: random.Random) -> list[dict]:
+    notes = []
+    for i in range(offset, offset + count):
+        topic = rng.sample(_VOCAB, 3)
+        words = [rng.choice(topic) if rng.random() < 0.4 else rng.choice(_VOCAB) for _ in range(rng.randint(40, 200))]
+        notes.append({
+            "id": f"note-{i}",
+            "type": "text",
+            "source": f"note-{i}",
+            "title": f"{topic[0]}筆記",
+            "content": "".join(w + rng.choice(_FILLERS) for w in words),
+        })
+    return notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--stages", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=200, help="每個階段量測的新增筆數")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NoteStore(os.path.join(tmp, "notes.sqlite"))
+        size = 0
+        for stage in range(1, args.stages + 1):
+            target = args.notes * stage // args.stages
+            fill = target - size - args.batch
+            if fill > 0:
+                store.add_many(make_notes(fill, size, rng))
+                size += fill
+            batch = make_notes(args.batch, size, rng)
+
+            with closing(sqlite3.connect(store.path)) as conn, conn:
+                start = time.perf_counter()
+                for note in batch:
+                    keyword_index.index_note(conn, note["id"], f"{note['title']}\n{note['content']}")
+                index_ms = (time.perf_counter() - start) * 1000 / len(batch)
+                conn.rollback()   # 只量時間，實際寫入交給 add_many
+            store.add_many(batch)
+            size += len(batch)
+
+            start = time.perf_counter()
+            keywords = [store.extract_keywords(note["content"]) for note in batch]
+            extract_ms = (time.perf_counter() - start) * 1000 / len(batch)
+            print(
+                f"{size:>7} notes: update {index_ms:6.2f} ms/note, extract {extract_ms:6.2f} ms/note, "
+                f"e.g. {batch[0]['title']} → {keywords[0]}"
+            )
+
+        with closing(sqlite3.connect(store.path)) as conn:
+            conn.execute("DELETE FROM keyword_meta")
+            conn.commit()
+            start = time.perf_counter()
+            keyword_index.ensure_index(conn)
+            print(f"full recompute of {size} notes: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
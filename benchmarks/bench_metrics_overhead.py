@@ -0,0 +1,44 @@
+# benchmarks/bench_metrics_overhead.py
+"""
+量測 utils.metrics 的額外成本：同一個空迴圈分別不包 span、包啟用中的 span、包停用的 span，
+換算成每次呼叫多花的時間。處理階段動輒數十毫秒以上，span 的成本應小到可以忽略。
+
+    python -m benchmarks.bench_metrics_overhead --calls 200000
+"""
+
+import argparse
+import time
+
+from utils.metrics import Metrics
+
+
+def _loop(registry, calls: int) -> float:
+    start = time.perf_counter()
+    if registry is None:
+        for _ in range(calls):
+            pass
+    else:
+        for _ in range(calls):
+            with registry.span("stage", size=1):
+                pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    baseline = _loop(None, args.calls)
+    for label, registry in (("enabled", Metrics(enabled=True)), ("disabled", Metrics(enabled=False))):
+        seconds = _loop(registry, args.calls)
+        per_call = (seconds - baseline) / args.calls * 1e9
+        print(f"{label:>9}: {per_call:8.0f} ns/span")
+    enabled = Metrics(enabled=True)
+    _loop(enabled, 5000)
+    row = enabled.summary()[0]
+    print(f"summary: {row['count']} spans, p50 {row['p50'] * 1e9:.0f} ns, p95 {row['p95'] * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
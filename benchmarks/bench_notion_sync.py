@@ -0,0 +1,175 @@
+# benchmarks/bench_notion_sync.py
+"""
+在本地假的 Notion 伺服器上量測 NotionSync：首次同步、未變動重送、部分修改後再同步。
+假伺服器會以每秒請求上限模擬 Notion 的 429，並可設定延遲，不需要真的 token。
+
+    python -m benchmarks.bench_notion_sync --notes 200 --rate 3 --workers 1 4
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.notion_api import NotionSync
+
+DATABASE_PROPERTIES = {
+    "摘要": {"type": "title"},
+    "分類": {"type": "select"},
+    "網址": {"type": "url"},
+    "關鍵字": {"type": "multi_select"},
+}
+
+
+class FakeNotion(ThreadingHTTPServer):
+    """
+    只實作 NotionSync 用到的端點；每秒超過 rate 個請求就回 429。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, rate: float, latency: float):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.rate = rate
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.counts = Counter()
+        self.children = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def admit(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 1.0:
+                self.recent.popleft()
+            if len(self.recent) >= self.rate:
+                self.counts["429"] += 1
+                return False
+            self.recent.append(now)
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeNotion
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _handle(self, method: str):
+        server = self.server
+        if not server.admit():
+            return self._reply(
+                429, {"object": "error", "status": 429, "code": "rate_limited", "message": "slow down"},
+                {"Retry-After": "1"},
+            )
+        time.sleep(server.latency)
+        parts = self.path.split("?")[0].strip("/").split("/")[1:]  # 去掉 v1
+        server.counts[f"{method} {parts[0]}"] += 1
+        body = self._body() if method in ("POST", "PATCH") else {}
+
+        if parts[0] == "databases":
+            return self._reply(200, {"object": "database", "id": parts[1], "properties": DATABASE_PROPERTIES})
+        if parts[0] == "pages" and method == "POST":
+            page_id = str(uuid.uuid4())
+            server.children[page_id] = [str(uuid.uuid4()) for _ in body.get("children", [])]
+            return self._reply(200, {"object": "page", "id": page_id})
+        if parts[0] == "pages":
+            return self._reply(200, {"object": "page", "id": parts[1]})
+        if parts[0] == "blocks" and len(parts) == 3 and method == "GET":
+            results = [{"object": "block", "id": b} for b in server.children.get(parts[1], [])]
+            return self._reply(200, {"object": "list", "results": results, "has_more": False, "next_cursor": None})
+        if parts[0] == "blocks" and len(parts) == 3:
+            server.children.setdefault(parts[1], []).extend(str(uuid.uuid4()) for _ in body.get("children", []))
+            return self._reply(200, {"object": "list", "results": []})
+        if parts[0] == "blocks" and method == "DELETE":
+            return self._reply(200, {"object": "block", "id": parts[1], "archived": True})
+        return self._reply(404, {"object": "error", "status": 404, "code": "object_not_found", "message": self.path})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def make_notes(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"note-{i}",
+            "title": f"筆記 {i}",
+            "summary": f"第 {i} 篇筆記的摘要",
+            "category": rng.choice(["科技", "旅遊", "美食"]),
+            "content": "\n".join("這是一段很長的內容。" * rng.randint(5, 80) for _ in range(rng.randint(1, 12))),
+            "url": f"https://example.com/{i}",
+            "keywords": ["測試", "notion"],
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=3.0, help="假伺服器每秒允許的請求數")
+    parser.add_argument("--latency", type=float, default=0.05, help="每個請求的模擬延遲 (秒)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    notes = make_notes(args.notes)
+    for workers in args.workers:
+        server = FakeNotion(args.rate, args.latency)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        state = tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False).name
+        sync = NotionSync(
+            "fake-token", "fake-db", state_path=state, base_url=server.base_url,
+            rate=args.rate, max_workers=workers,
+        )
+        for label, batch in (
+            ("initial", notes),
+            ("unchanged", notes),
+            ("10% edited", [dict(n, summary=n["summary"] + "（更新）") if i % 10 == 0 else n for i, n in enumerate(notes)]),
+        ):
+            start = time.perf_counter()
+            result = sync.sync(batch)
+            elapsed = time.perf_counter() - start
+            print(
+                f"workers={workers} {label:>10}: {elapsed:6.1f}s "
+                f"created={result['created']} updated={result['updated']} skipped={result['skipped']} "
+                f"failed={result['failed']}"
+            )
+        print(f"  server: {dict(server.counts)}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
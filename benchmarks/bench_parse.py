@@ -0,0 +1,85 @@
+# benchmarks/bench_parse.py
+"""
+比較「舊版：同一份 HTML 解析四次」與「parse_page：只解析一次」的耗時。
+
+執行方式（在專案根目錄）：
+    python -m benchmarks.bench_parse --posts 2000 --repeat 5
+"""
+
+import argparse
+import random
+import time
+
+from bs4 import BeautifulSoup
+
+from utils.fetch_url import parse_page
+
+
+def make_fixture(posts: int, seed: int = 0) -> str:
+    """
+    產生一份模擬社群動態牆的大型 HTML：每則貼文含文字、圖片、留言與內嵌 script。
+    """
+    rng = random.Random(seed)
+    words = ["今天", "分享", "美食", "旅遊", "coffee", "travel", "photo", "科技", "新聞", "learning"]
+    parts = ["<html><head><title>Feed</title><style>.a{color:red}</style></head><body>"]
+    for i in range(posts):
+        text = " ".join(rng.choice(words) for _ in range(40))
+        parts.append(
+            f'<article><h2>Post {i}</h2><p>{text}</p>'
+            f'<img src="/img/{i}.jpg"><img data-src="/lazy/{i}.png">'
+            f'<audio><source src="/audio/{i}.mp3"></audio>'
+            f'<script>track({i});</script>'
+            f'<ul>' + "".join(f"<li>comment {j}</li>" for j in range(5)) + "</ul></article>"
+        )
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def legacy_parse(html: str) -> tuple:
+    """
+    舊版流程：extract_title / extract_visible_text / download_all_images /
+    download_all_audio 各自建立一次 BeautifulSoup 樹（不含實際下載）。
+    """
+    soup = BeautifulSoup(html, "lxml")
+    title_tag = soup.find("title")
+    title = title_tag.get_text().strip() if title_tag else ""
+
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    lines = [line.strip() for line in soup.get_text(separator="\n").splitlines()]
+    text = "\n".join([line for line in lines if line])
+
+    soup = BeautifulSoup(html, "lxml")
+    images = [img.get("src") or img.get("data-src") for img in soup.find_all("img")]
+
+    soup = BeautifulSoup(html, "lxml")
+    audios = [tag.get("src") for tag in soup.find_all(["audio", "source"]) if tag.get("src")]
+    return title, text, images, audios
+
+
+def best_of(fn, html: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'posts':>6} {'size(KB)':>9} {'legacy(s)':>10} {'parse_page(s)':>14} {'speedup':>8}")
+    for posts in args.posts:
+        html = make_fixture(posts)
+        legacy = best_of(legacy_parse, html, args.repeat)
+        single = best_of(parse_page, html, args.repeat)
+        print(f"{posts:>6} {len(html) / 1024:>9.0f} {legacy:>10.3f} {single:>14.3f} {legacy / single:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
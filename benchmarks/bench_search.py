@@ -0,0 +1,69 @@
+# benchmarks/bench_search.py
+"""
+在暫存的筆記庫裡產生大量筆記，量測全文索引的建立與查詢延遲，
+並和舊版 DataFrame 逐筆 str.contains 掃描比較。
+
+執行方式（在專案根目錄）：
+    python -m benchmarks.bench_search --notes 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from utils.note_store import NoteStore
+from utils.search_filter import filter_notes
+
+WORDS = [
+    "咖啡", "拉麵", "旅遊", "京都", "露營", "手機", "晶片", "電影", "音樂", "投資",
+    "python", "travel", "coffee", "startup", "recipe", "camera", "guitar", "market",
+]
+CATEGORIES = ["生活", "美食", "科技", "旅遊", "娛樂", "學習", "商業", "其他"]
+QUERIES = ["咖啡", "京都 旅遊", '"拉麵"', "pyth", "startup market", "晶片"]
+
+
+def make_note(i: int, rng: random.Random) -> dict:
+    body = "".join(rng.choice(WORDS) + ("，" if rng.random() < 0.5 else " ") for _ in range(120))
+    return {
+        "id": f"note-{i}",
+        "type": "bench",
+        "source": f"bench-{i}",
+        "title": " ".join(rng.sample(WORDS, 3)),
+        "content": body,
+        "summary": body[:120],
+        "category": rng.choice(CATEGORIES),
+        "keywords": rng.sample(WORDS, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    path = os.path.join(tempfile.mkdtemp(), "bench_notes.sqlite")
+    store = NoteStore(path)
+
+    start = time.perf_counter()
+    for offset in range(0, args.notes, args.batch):
+        store.add_many([make_note(i, rng) for i in range(offset, min(offset + args.batch, args.notes))])
+    print(f"indexed {args.notes} notes in {time.perf_counter() - start:.1f}s")
+
+    df = store.load_df().rename(columns={"category": "主題", "content": "原文", "summary": "摘要"})
+    print(f"{'query':>18} {'hits':>7} {'fts(ms)':>8} {'scan(ms)':>9}")
+    for query in QUERIES:
+        start = time.perf_counter()
+        hits = store.search(query)
+        fts_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        filter_notes(df, keyword=query.strip('"'))
+        scan_ms = (time.perf_counter() - start) * 1000
+        print(f"{query:>18} {len(hits):>7} {fts_ms:>8.1f} {scan_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_transcribe.py
+"""
+量測長音訊 (Podcast 長度) 的轉錄耗時：舊版整檔 model.transcribe(path) 對照
+串流解碼 + VAD + 平行視窗的 transcribe()。
+
+沒有現成的長音檔時，可用 --minutes 把一段短錄音重複拼接 (中間穿插靜音) 成指定長度：
+    python -m benchmarks.bench_transcribe --audio sample.mp3 --minutes 60 --workers 1 2 4
+    python -m benchmarks.bench_transcribe --audio podcast.mp3 --baseline
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from utils import whisper_asr
+
+
+def build_long_audio(path: str, minutes: float, gap_seconds: float = 2.0) -> str:
+    """
+    把 path 的內容重複拼接到 minutes 分鐘，片段之間補 gap_seconds 的靜音，輸出 16 kHz WAV。
+    """
+    clip = np.concatenate(list(whisper_asr.iter_pcm(path)))
+    gap = np.zeros(int(gap_seconds * whisper_asr.SAMPLE_RATE), dtype=np.float32)
+    target = int(minutes * 60 * whisper_asr.SAMPLE_RATE)
+    fd, out = tempfile.mkstemp(suffix=".wav", prefix="instanote-bench-")
+    os.close(fd)
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(whisper_asr.SAMPLE_RATE)
+        written = 0
+        while written < target:
+            for part in (clip, gap):
+                wav.writeframes((part * 32767).astype(np.int16).tobytes())
+                written += len(part)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--audio", required=True)
+    parser.add_argument("--minutes", type=float, default=None, help="拼接成指定長度 (分鐘)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[whisper_asr.ASR_WORKERS])
+    parser.add_argument("--baseline", action="store_true", help="同時量測整檔轉錄的舊做法")
+    args = parser.parse_args()
+
+    path = build_long_audio(args.audio, args.minutes) if args.minutes else args.audio
+    try:
+        if args.baseline:
+            model = whisper_asr.load_whisper_model()
+            start = time.perf_counter()
+            model.transcribe(path, fp16=False)
+            print(f"baseline (whole file): {time.perf_counter() - start:.1f}s")
+
+        for workers in args.workers:
+            # 每組 worker 數各開一個新的行程池；第一次轉錄前先等模型載入完成
+            whisper_asr.ASR_WORKERS = workers
+            whisper_asr._pool = None
+            pool = whisper_asr._get_pool()
+            list(pool.map(time.sleep, [1.0] * workers))
+            start = time.perf_counter()
+            result = whisper_asr.transcribe(path)
+            elapsed = time.perf_counter() - start
+            pool.shutdown()
+            speech = result["speech_seconds"] / max(result["audio_seconds"], 1e-9)
+            print(
+                f"workers={workers}: {elapsed:.1f}s for {result['audio_seconds'] / 60:.1f} min audio "
+                f"(RTF {elapsed / max(result['audio_seconds'], 1e-9):.3f}, "
+                f"{result['windows']} windows, speech {speech:.0%})"
+            )
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"peak RSS (main process): {peak_mb:.0f} MB")
+    finally:
+        if path != args.audio:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_wall_render.py
+"""
+量測筆記牆在大量筆記下的渲染時間：舊版 groupby + iterrows 逐筆建立 expander，
+對照分頁版 (只渲染一頁、原文只取前幾個字)。以 Streamlit 的 AppTest 在本行程執行腳本，
+分別量首次執行與再次執行 (rerun) 的時間，以及產生的 expander 數量。
+
+    python -m benchmarks.bench_wall_render --notes 10000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from utils.note_store import NoteStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LEGACY = """
+import sys
+sys.path.insert(0, {root!r})
+import streamlit as st
+from utils.note_store import NoteStore
+
+@st.cache_data
+def load(path):
+    return NoteStore(path).load_df().rename(columns={{"category": "主題", "content": "原文", "summary": "摘要"}})
+
+df = load({path!r})
+for topic, group in df.groupby("主題"):
+    st.subheader(f"📂 {{topic}} ({{len(group)}})")
+    left_col, right_col = st.columns(2)
+    for idx, row in group.iterrows():
+        with (left_col if (idx % 2 == 0) else right_col).expander(f"📎 {{row['title'] or row['source']}}"):
+            st.markdown(f"**摘要：** {{row['摘要']}}")
+            st.markdown(f"**原文內容：**\\n{{row['原文'][:1000]}}{{'...' if len(row['原文'])>1000 else ''}}")
+            st.button("🔗 找相似筆記", key=f"similar_{{row['id']}}")
+"""
+
+_PAGINATED = """
+import sys
+sys.path.insert(0, {root!r})
+import streamlit as st
+from utils.note_store import NoteStore
+from utils.note_wall import PREVIEW_CHARS, WALL_COLUMNS, page_slice, render_note_page
+
+@st.cache_data
+def load(path):
+    df = NoteStore(path).load_df(columns=WALL_COLUMNS, preview_chars=PREVIEW_CHARS)
+    return df.rename(columns={{"category": "主題", "summary": "摘要"}})
+
+df = load({path!r})
+render_note_page(
+    NoteStore({path!r}), page_slice(df, 1), df["主題"].value_counts().to_dict(), {{}}, lambda note_id: None,
+)
+"""
+
+
+def make_store(path: str, count: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    topics = ["科技", "旅遊", "美食", "健康", "財經", "教育", "娛樂", "其他"]
+    store = NoteStore(path)
+    notes = [
+        {
+            "id": f"note-{i}",
+            "type": "url",
+            "source": f"https://example.com/{i}",
+            "url": f"https://example.com/{i}",
+            "title": f"筆記 {i}",
+            "content": "這是一段社群貼文的原文內容。" * rng.randint(20, 300),
+            "summary": "這是一段摘要。" * rng.randint(2, 6),
+            "category": rng.choice(topics),
+            "keywords": ["測試"],
+            "media": [],
+        }
+        for i in range(count)
+    ]
+    for start in range(0, count, 1000):
+        store.add_many(notes[start:start + 1000])
+
+
+def measure(script: str) -> tuple:
+    at = AppTest.from_string(script, default_timeout=1800)
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    at.run()
+    warm = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception)
+    return cold, warm, len(at.expander)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "notes.sqlite")
+        make_store(path, args.notes)
+        variants = [("paginated", _PAGINATED)]
+        if not args.skip_legacy:
+            variants.insert(0, ("legacy", _LEGACY))
+        for label, template in variants:
+            cold, warm, expanders = measure(template.format(root=ROOT, path=path))
+            print(f"{label:>10}: first run {cold:7.2f}s, rerun {warm:7.2f}s, {expanders} expanders")
+
+
+if __name__ == "__main__":
+    main()
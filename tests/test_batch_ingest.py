@@ -0,0 +1,76 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import batch_ingest, jobs
+from utils.batch_ingest import BatchIngest, Checkpoint
+
+N = 10
+
+
+class _ThreadPool(ThreadPoolExecutor):
+    # 行程池換成執行緒池；mp_context 在這裡用不到
+    def __init__(self, max_workers, mp_context=None, **kwargs):
+        super().__init__(max_workers=max_workers, **kwargs)
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_ingest, "ProcessPoolExecutor", _ThreadPool)
+    monkeypatch.setattr(jobs, "_init_worker", lambda workers=1: None)
+    paths = []
+    for i in range(N):
+        path = tmp_path / "in" / f"{i}.txt"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(f"筆記 {i}", encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def _note(item):
+    return {"title": item["source"], "content": "", "summary": "摘要", "category": "其他"}, []
+
+
+def _run(tmp_path, sources):
+    batch = BatchIngest(Checkpoint(str(tmp_path / "out.checkpoint")), out_path=str(tmp_path / "out.jsonl"), workers=2)
+    try:
+        return batch.run(sources)
+    finally:
+        batch.close()
+
+
+def test_resume_after_interrupt_neither_duplicates_nor_drops(tmp_path, sources, monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def interrupted(item, options, page=None):
+        with lock:
+            calls.append(item["source"])
+            if len(calls) == 6:
+                raise KeyboardInterrupt
+        return _note(item)
+
+    monkeypatch.setattr(jobs, "run_item", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        _run(tmp_path, sources)
+
+    out = tmp_path / "out.jsonl"
+    with open(out, "rb") as f:
+        written = [json.loads(line)["title"] for line in f]
+    assert 0 < len(written) < N
+    # 模擬中斷時正在寫的那一行只寫了一半
+    with open(out, "ab") as f:
+        f.write('{"title": "5.txt", "summ'.encode("utf-8"))
+
+    resumed = []
+    monkeypatch.setattr(jobs, "run_item", lambda item, options, page=None: resumed.append(item["source"]) or _note(item))
+    stats = _run(tmp_path, sources)
+
+    with open(out, encoding="utf-8") as f:
+        titles = [json.loads(line)["title"] for line in f]
+    assert sorted(titles) == sorted(f"{i}.txt" for i in range(N))
+    assert titles[:len(written)] == written
+    assert not set(resumed) & set(written)   # 已確認的項目不會重做
+    assert stats["done"] == N - len(written) and stats["skipped"] == len(written)
@@ -0,0 +1,166 @@
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from utils import dropbox_export
+from utils.dropbox_export import DropboxBackup
+from utils.note_store import NoteStore
+
+
+class _Cursor:
+    def __init__(self, session_id, offset):
+        self.session_id = session_id
+        self.offset = offset
+
+
+files_types = SimpleNamespace(
+    WriteMode=SimpleNamespace(overwrite="overwrite"),
+    UploadSessionCursor=_Cursor,
+    CommitInfo=lambda path, mode: SimpleNamespace(path=path, mode=mode),
+)
+
+
+class FakeDropbox:
+    """
+    記在記憶體裡的 Dropbox；fail_on 指定的路徑上傳時丟出例外。
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.sessions = {}
+        self.uploads = []
+        self.chunked = []
+        self.fail_on = set()
+
+    def _store(self, path, data):
+        if path in self.fail_on:
+            raise ConnectionError(f"upload failed: {path}")
+        self.files[path] = data
+        self.uploads.append(path)
+
+    def files_upload(self, data, path, mode):
+        self._store(path, data)
+
+    def files_upload_session_start(self, data):
+        session_id = f"s{len(self.sessions)}"
+        self.sessions[session_id] = bytearray(data)
+        return SimpleNamespace(session_id=session_id)
+
+    def files_upload_session_append_v2(self, data, cursor):
+        assert cursor.offset == len(self.sessions[cursor.session_id])
+        self.sessions[cursor.session_id] += data
+
+    def files_upload_session_finish(self, data, cursor, commit):
+        assert cursor.offset == len(self.sessions[cursor.session_id])
+        self.chunked.append(commit.path)
+        self._store(commit.path, bytes(self.sessions.pop(cursor.session_id) + data))
+
+    def files_download(self, path):
+        body = io.BytesIO(self.files[path])
+        response = SimpleNamespace(
+            iter_content=lambda size: iter(lambda: body.read(size), b""),
+            close=lambda: None,
+        )
+        return SimpleNamespace(path_display=path), response
+
+
+@pytest.fixture
+def dbx():
+    return FakeDropbox()
+
+
+def _backup(tmp_path, dbx, name="manifest.sqlite"):
+    return DropboxBackup(manifest_path=str(tmp_path / name), dbx=dbx, files_types=files_types)
+
+
+def _media(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _notes(tmp_path):
+    big = _media(tmp_path, "big.png", os.urandom(2500))
+    small = _media(tmp_path, "small.mp3", b"audio")
+    store = NoteStore(str(tmp_path / "notes.sqlite"))
+    store.add_many([
+        {"id": "n1", "type": "image", "source": "big.png", "content": "first", "media": [big]},
+        {"id": "n2", "type": "audio", "source": "small.mp3", "content": "second", "media": [small]},
+    ])
+    return store, big, small
+
+
+def test_backup_chunks_large_files_and_skips_unchanged(tmp_path, dbx, monkeypatch):
+    monkeypatch.setattr(dropbox_export, "CHUNK_SIZE", 1024)
+    store, big, small = _notes(tmp_path)
+    backup = _backup(tmp_path, dbx)
+
+    result = backup.backup(store)
+    assert result["notes"] == 2 and result["media"] == 2
+    big_remote = f"/InstaNote/media/{dropbox_export._file_hash(big)}.png"
+    assert big_remote in dbx.chunked
+    with open(big, "rb") as f:
+        assert dbx.files[big_remote] == f.read()
+
+    dbx.uploads.clear()
+    assert backup.backup(store) == {"notes": 0, "media": 0, "bytes": 0, "segment": None}
+    assert dbx.uploads == []
+
+    # 內容改了 (大小也變了)：同一路徑要重新雜湊並上傳
+    with open(small, "wb") as f:
+        f.write(b"new audio")
+    assert backup.backup(store)["media"] == 1
+    assert f"/InstaNote/media/{dropbox_export._file_hash(small)}.mp3" in dbx.uploads
+
+
+def test_unchanged_stat_does_not_rehash(tmp_path, dbx, monkeypatch):
+    store, _, _ = _notes(tmp_path)
+    backup = _backup(tmp_path, dbx)
+    backup.backup(store)
+
+    hashed = []
+    monkeypatch.setattr(dropbox_export, "_file_hash", lambda path: hashed.append(path))
+    backup.backup(store)
+    assert hashed == []
+
+
+def test_media_uploaded_before_failure_is_recorded(tmp_path, dbx):
+    store, big, small = _notes(tmp_path)
+    dbx.fail_on.add(f"/InstaNote/media/{dropbox_export._file_hash(small)}.mp3")
+    backup = _backup(tmp_path, dbx)
+    with pytest.raises(ConnectionError):
+        backup.backup(store)
+
+    dbx.fail_on.clear()
+    dbx.uploads.clear()
+    result = backup.backup(store)
+    assert result["media"] == 1 and result["notes"] == 2
+    assert not any(path.endswith(".png") for path in dbx.uploads)
+
+
+def test_restore_rebuilds_notes_and_media(tmp_path, dbx, monkeypatch):
+    monkeypatch.setattr(dropbox_export, "CHUNK_SIZE", 1024)
+    store, big, _ = _notes(tmp_path)
+    _backup(tmp_path, dbx).backup(store)
+    store.add_many([{"id": "n1", "type": "image", "source": "big.png", "content": "edited", "media": [big]}])
+    _backup(tmp_path, dbx).backup(store)
+
+    target = NoteStore(str(tmp_path / "restored.sqlite"))
+    media_dir = tmp_path / "restored_media"
+    restorer = _backup(tmp_path, dbx, name="other_manifest.sqlite")
+    result = restorer.restore(target, str(media_dir))
+    assert result == {"notes": 3, "media": 2, "segments": 2}
+
+    notes = {note["id"]: note for note in target.iter_notes()}
+    assert notes["n1"]["content"] == "edited"
+    restored_big = notes["n1"]["media"][0]
+    assert os.path.dirname(restored_big) == str(media_dir)
+    with open(restored_big, "rb") as a, open(big, "rb") as b:
+        assert a.read() == b.read()
+
+    # 還原後的內容已記進 manifest，再備份不會重傳
+    dbx.uploads.clear()
+    assert restorer.backup(target)["notes"] == 0
+    assert dbx.uploads == []
@@ -0,0 +1,127 @@
+import os
+import threading
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils.fetch_cache import FetchCache, FetchRejected
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # path → (內容, ETag 或 None)；ETag 為 None 時改用 Last-Modified
+    pages = {}
+    requests = []
+
+    def do_GET(self):
+        body, etag = self.pages[self.path]
+        self.requests.append((self.path, dict(self.headers)))
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            return self._reply(304)
+        if etag is None and self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            return self._reply(304)
+        validator = ("ETag", etag) if etag is not None else ("Last-Modified", LAST_MODIFIED)
+        self._reply(200, body, validator)
+
+    def _reply(self, status, body=b"", validator=None):
+        self.send_response(status)
+        if validator is not None:
+            self.send_header(*validator)
+        if status == 200:
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.pages = {}
+    _Handler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as s:
+        yield s
+
+
+def test_etag_revalidation(tmp_path, server, session):
+    cache = FetchCache(str(tmp_path))
+    _Handler.pages["/a"] = (b"version one", '"v1"')
+
+    first = cache.fetch(f"{server}/a", session, ext=".bin")
+    assert first["status"] == "miss"
+    with open(first["path"], "rb") as f:
+        assert f.read() == b"version one"
+
+    second = cache.fetch(f"{server}/a", session, ext=".bin")
+    assert second["status"] == "hit" and second["path"] == first["path"]
+    assert _Handler.requests[-1][1].get("If-None-Match") == '"v1"'
+
+    _Handler.pages["/a"] = (b"version two", '"v2"')
+    third = cache.fetch(f"{server}/a", session, ext=".bin")
+    assert third["status"] == "miss" and third["sha256"] != first["sha256"]
+    with open(third["path"], "rb") as f:
+        assert f.read() == b"version two"
+
+
+def test_last_modified_revalidation(tmp_path, server, session):
+    cache = FetchCache(str(tmp_path))
+    _Handler.pages["/b"] = (b"body", None)
+    assert cache.fetch(f"{server}/b", session)["status"] == "miss"
+    assert cache.fetch(f"{server}/b", session)["status"] == "hit"
+    assert _Handler.requests[-1][1].get("If-Modified-Since") == LAST_MODIFIED
+
+
+def test_missing_object_is_downloaded_again(tmp_path, server, session):
+    cache = FetchCache(str(tmp_path))
+    _Handler.pages["/a"] = (b"payload", '"v1"')
+    os.remove(cache.fetch(f"{server}/a", session)["path"])
+    again = cache.fetch(f"{server}/a", session)
+    assert again["status"] == "miss" and os.path.exists(again["path"])
+    assert "If-None-Match" not in _Handler.requests[-1][1]
+
+
+def test_lru_eviction_respects_shared_objects(tmp_path, server, session):
+    cache = FetchCache(str(tmp_path), max_bytes=250)
+    for name in ("old", "mid", "new"):
+        _Handler.pages[f"/{name}"] = (name.encode() * 40, f'"{name}"')
+    _Handler.pages["/old-mirror"] = (b"old" * 40, '"old"')
+
+    old = cache.fetch(f"{server}/old", session)
+    cache.fetch(f"{server}/old-mirror", session)  # 同內容，共用同一個檔案
+    mid = cache.fetch(f"{server}/mid", session)
+    assert os.path.exists(old["path"]) and os.path.exists(mid["path"])
+    assert cache.fetch(f"{server}/old-mirror", session)["status"] == "hit"  # 更新存取時間
+
+    new = cache.fetch(f"{server}/new", session)
+    # 超過上限：最久沒用的 old 先刪索引，但 old-mirror 還引用同一檔案，接著淘汰 mid
+    assert os.path.exists(old["path"])
+    assert not os.path.exists(mid["path"])
+    assert os.path.exists(new["path"])
+    with closing(cache._connect()) as conn:
+        urls = {row["url"] for row in conn.execute("SELECT url FROM entries")}
+    assert urls == {f"{server}/old-mirror", f"{server}/new"}
+
+
+def test_oversized_body_is_rejected(tmp_path, server, session):
+    cache = FetchCache(str(tmp_path))
+    _Handler.pages["/big"] = (b"x" * 1000, '"big"')
+    with pytest.raises(FetchRejected):
+        cache.fetch(f"{server}/big", session, max_size=100)
+    assert not any(name.endswith(".part") for _, _, files in os.walk(tmp_path) for name in files)
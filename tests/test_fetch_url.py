@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import fetch_url
+from utils.fetch_cache import FetchCache
+from utils.fetch_url import ByteBudget, download_images, extract_title, extract_visible_text, parse_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures", "html")
+with open(os.path.join(FIXTURES, "expected.json"), encoding="utf-8") as f:
+    EXPECTED = json.load(f)
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_page_defaults_to_full_text():
+    html = _read("zh_travel_blog.html")
+    parsed = parse_page(html)
+    assert parsed["extracted"] == "full"
+    assert "本網站使用 Cookie" in parsed["text"]
+    assert extract_visible_text(html) == parsed["text"]
+    assert extract_title(html).startswith("京都賞楓五日遊")
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_main_mode_keeps_body_and_drops_boilerplate(name):
+    text = parse_page(_read(name), mode="main")["text"]
+    for snippet in EXPECTED[name]["keep"]:
+        assert snippet in text
+    for snippet in EXPECTED[name]["drop"]:
+        assert snippet not in text
+
+
+def test_main_mode_falls_back_when_unsure():
+    parsed = parse_page(_read("en_landing_short.html"), mode="main")
+    assert parsed["extracted"] == "full"
+
+
+# ------------------------------------------------------------------------
+# 多媒體下載
+# ------------------------------------------------------------------------
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    """
+    /img/<name> 等 0.2 秒後回 1000 位元組的 PNG (內容由 name 決定)，/missing 回 404。
+    """
+
+    lock = threading.Lock()
+    active = peak = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            time.sleep(0.2)
+            if self.path == "/missing":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            name = self.path.rsplit("/", 1)[-1].split("-")[0].encode()
+            body = (PNG + name * 1000)[:1000]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    _MediaHandler.active = _MediaHandler.peak = 0
+    cache = FetchCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(fetch_url, "get_cache", lambda: cache)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _MediaHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    save_dir = tmp_path / "media"
+    save_dir.mkdir()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}", str(save_dir)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def _contents(paths):
+    out = []
+    for path in paths:
+        with open(path, "rb") as f:
+            out.append(f.read()[len(PNG):len(PNG) + 1])
+    return out
+
+
+def test_images_download_concurrently_in_page_order(media):
+    base, save_dir = media
+    urls = [f"{base}/img/{name}" for name in "abcd"] + [f"{base}/img/a-copy"]
+    saved = download_images(urls, save_dir, limiter=fetch_url.HostLimiter(4))
+    assert _contents(saved) == [b"a", b"b", b"c", b"d"]   # 內容相同的 a-copy 只留一份
+    assert _MediaHandler.peak > 1
+
+
+def test_failed_download_is_logged_with_url(media, caplog):
+    base, save_dir = media
+    with caplog.at_level(logging.WARNING, logger=fetch_url.__name__):
+        saved = download_images([f"{base}/img/a", f"{base}/missing", f"{base}/img/b"], save_dir)
+    assert _contents(saved) == [b"a", b"b"]
+    assert any(f"{base}/missing" in r.getMessage() for r in caplog.records if r.levelno == logging.WARNING)
+
+
+def test_concurrent_downloads_stay_within_page_budget(media):
+    base, save_dir = media
+    budget = ByteBudget(2500)
+    saved = download_images([f"{base}/img/{name}" for name in "abcd"], save_dir, budget)
+    assert len(saved) == 2
+    assert sum(os.path.getsize(path) for path in saved) <= 2500
+    assert budget.remaining == 500
@@ -0,0 +1,97 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from utils import inference
+
+
+class _FakeModel:
+    def __init__(self, source):
+        self.source = source
+        self.evaluated = False
+
+    def eval(self):
+        self.evaluated = True
+        return self
+
+
+class _FakeAutoClass:
+    @staticmethod
+    def from_pretrained(source):
+        return _FakeModel(source)
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    """
+    把 transformers / 量化 / ONNX 換成替身，記錄 load_model 走了哪條路。
+    """
+    calls = []
+    monkeypatch.setattr(inference, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(inference, "OFFLINE", False)
+    monkeypatch.setitem(
+        sys.modules,
+        "transformers",
+        SimpleNamespace(AutoTokenizer=SimpleNamespace(from_pretrained=lambda source: ("tokenizer", source))),
+    )
+    monkeypatch.setattr(inference, "_auto_class", lambda kind: calls.append(("auto", kind)) or _FakeAutoClass)
+    monkeypatch.setattr(inference, "quantize_int8", lambda model: calls.append(("int8", model.source)) or "int8-model")
+    monkeypatch.setattr(inference, "_load_onnx", lambda name, kind: calls.append(("onnx", name, kind)) or "onnx-model")
+    return calls
+
+
+def test_backend_for_prefers_role_override(monkeypatch):
+    monkeypatch.setattr(inference, "DEFAULT_BACKEND", "int8")
+    monkeypatch.delenv("INSTANOTE_BACKEND_SUMMARIZER", raising=False)
+    assert inference.backend_for("summarizer") == "int8"
+    monkeypatch.setenv("INSTANOTE_BACKEND_SUMMARIZER", "onnx")
+    assert inference.backend_for("summarizer") == "onnx"
+    assert inference.backend_for("classifier") == "int8"
+
+
+def test_backend_for_rejects_unknown_backend(monkeypatch):
+    monkeypatch.setenv("INSTANOTE_BACKEND_EMBEDDER", "fp16")
+    with pytest.raises(ValueError):
+        inference.backend_for("embedder")
+
+
+def test_resolve_prefers_local_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(inference, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(inference, "OFFLINE", False)
+    assert inference.resolve("google/mt5-base") == "google/mt5-base"
+
+    (tmp_path / "google--mt5-base").mkdir()
+    assert inference.resolve("google/mt5-base") == str(tmp_path / "google--mt5-base")
+
+
+def test_resolve_offline_requires_local_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(inference, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(inference, "OFFLINE", True)
+    with pytest.raises(FileNotFoundError):
+        inference.resolve("google/mt5-base")
+
+
+def test_load_model_fp32(models):
+    tokenizer, model = inference.load_model("org/model", "seq2seq", "fp32")
+    assert tokenizer == ("tokenizer", "org/model")
+    assert model.source == "org/model" and model.evaluated
+    assert models == [("auto", "seq2seq")]
+
+
+def test_load_model_int8_quantizes(models):
+    _, model = inference.load_model("org/model", "sequence-classification", "int8")
+    assert model == "int8-model"
+    assert models == [("auto", "sequence-classification"), ("int8", "org/model")]
+
+
+def test_load_model_onnx_skips_pytorch(models):
+    _, model = inference.load_model("org/model", "feature-extraction", "onnx")
+    assert model == "onnx-model"
+    assert models == [("onnx", "org/model", "feature-extraction")]
+
+
+def test_load_model_rejects_unknown_backend(models):
+    with pytest.raises(ValueError):
+        inference.load_model("org/model", "seq2seq", "fp16")
+    assert models == []
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils import fetch_url
+from utils.fetch_cache import FetchCache
+from utils.ingest import iter_fetched_pages
+
+DELAY = 0.2
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    /page/<n> 等 DELAY 秒後回一頁 HTML，/missing 回 404；記錄每個主機同時處理中的請求數。
+    """
+
+    lock = threading.Lock()
+    active = Counter()
+    peak = Counter()
+    hits = Counter()
+
+    def do_GET(self):
+        host = self.headers["Host"].split(":")[0]
+        with self.lock:
+            self.hits[self.path] += 1
+            self.active[host] += 1
+            self.peak[host] = max(self.peak[host], self.active[host])
+        try:
+            time.sleep(DELAY)
+            if self.path == "/missing":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = f"<html><title>{self.path}</title><body><p>內容 {self.path}</p></body></html>".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def port(tmp_path, monkeypatch):
+    for counter in (_Handler.active, _Handler.peak, _Handler.hits):
+        counter.clear()
+    cache = FetchCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(fetch_url, "get_cache", lambda: cache)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield httpd.server_address[1]
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def _fetch_all(urls, tmp_path, **kwargs):
+    return list(iter_fetched_pages(urls, root=str(tmp_path / "media"), extract_mode="full", **kwargs))
+
+
+def test_pages_are_fetched_concurrently(port, tmp_path):
+    urls = [f"http://127.0.0.1:{port}/page/{i}" for i in range(6)]
+    start = time.perf_counter()
+    results = _fetch_all(urls, tmp_path, max_workers=6, per_host=6)
+    elapsed = time.perf_counter() - start
+
+    assert sorted(url for url, _, _ in results) == sorted(urls)
+    assert all(page is not None and error is None for _, page, error in results)
+    assert _Handler.peak["127.0.0.1"] > 1
+    assert elapsed < DELAY * len(urls)
+
+
+def test_duplicate_urls_are_fetched_once(port, tmp_path):
+    a, b = f"http://127.0.0.1:{port}/page/a", f"http://127.0.0.1:{port}/page/b"
+    results = _fetch_all([a, b, a, a], tmp_path)
+    assert sorted(url for url, _, _ in results) == [a, b]
+    assert _Handler.hits["/page/a"] == 1
+
+
+def test_failing_url_does_not_stop_the_others(port, tmp_path):
+    good = [f"http://127.0.0.1:{port}/page/{i}" for i in range(3)]
+    bad = f"http://127.0.0.1:{port}/missing"
+    results = {url: (page, error) for url, page, error in _fetch_all(good + [bad], tmp_path)}
+
+    page, error = results.pop(bad)
+    assert page is None and isinstance(error, requests.HTTPError)
+    for url, (page, error) in results.items():
+        assert error is None and page["url"] == url and "內容" in page["text"]
+
+
+def test_per_host_cap_holds(port, tmp_path):
+    urls = [f"http://{host}:{port}/page/{i}" for host in ("127.0.0.1", "localhost") for i in range(6)]
+    shared = fetch_url.host_limiter
+    results = _fetch_all(urls, tmp_path, max_workers=12, per_host=2)
+
+    assert all(error is None for _, _, error in results)
+    assert _Handler.peak["127.0.0.1"] == 2
+    assert _Handler.peak["localhost"] == 2
+    assert fetch_url.host_limiter is shared  # 不會換掉模組共用的 limiter
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from utils import ingest, jobs
+from utils.jobs import JobQueue, JobWorker
+from utils.note_store import NoteStore
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "SPOOL_DIR", str(tmp_path / "spool"))
+    return JobQueue(str(tmp_path / "jobs.sqlite"))
+
+
+def _statuses(queue):
+    with queue._connect() as conn:
+        return [row[0] for row in conn.execute("SELECT status FROM items ORDER BY seq")]
+
+
+def _items(n):
+    return [{"key": f"k{i}", "kind": "url", "source": f"https://example.com/{i}"} for i in range(n)]
+
+
+def _files(n):
+    return [{"key": f"f{i}", "kind": "text", "source": f"{i}.txt", "path": f"/nonexistent/{i}.txt"} for i in range(n)]
+
+
+def _wait_for(queue, statuses, timeout=10):
+    deadline = time.time() + timeout
+    while _statuses(queue) != statuses and time.time() < deadline:
+        time.sleep(0.05)
+    return _statuses(queue)
+
+
+def test_only_expired_leases_are_requeued(queue):
+    queue.submit("job", _items(2))
+    mine = queue.claim(1, owner="a")
+    theirs = queue.claim(1, owner="b")
+    assert len(mine) == len(theirs) == 1
+    assert queue.requeue_stale() == 0
+
+    with queue._connect() as conn:
+        conn.execute("UPDATE items SET lease_until = ? WHERE owner = 'b'", (time.time() - 1,))
+    queue.renew("a")
+    assert queue.requeue_stale() == 1
+    assert _statuses(queue) == ["running", "queued"]
+
+
+def test_spool_file_removed_when_no_pending_item_uses_it(queue):
+    path = queue.spool_upload(b"image bytes", "a.png")
+    item = {"key": "k", "kind": "image", "source": "a.png", "path": path}
+    queue.submit("first", [item])
+    queue.submit("second", [item])
+    first, second = queue.claim(2)
+
+    queue.finish(first, "done")
+    assert os.path.exists(path)
+    queue.finish(second, "failed", "boom")
+    assert not os.path.exists(path)
+
+
+class _BrokenPool:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("killed"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_dispatcher_survives_broken_pool(queue, monkeypatch):
+    monkeypatch.setattr(JobWorker, "_new_pool", lambda self: _BrokenPool())
+    queue.submit("job", _files(1))
+    worker = JobWorker(queue, store=None, max_workers=1).start()
+    try:
+        # 每次行程池壞掉都重新排隊，重試 MAX_ATTEMPTS 次後才標為 failed，派工執行緒仍在執行
+        assert _wait_for(queue, ["failed"]) == ["failed"]
+        assert worker._thread.is_alive()
+    finally:
+        worker.stop()
+
+
+def test_url_items_are_fetched_concurrently_before_the_pool(queue, tmp_path, monkeypatch):
+    lock = threading.Lock()
+    active, peak, fetched = [0], [0], []
+
+    def fake_fetch_page(url, root, extract_mode, limiter):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.2)
+        with lock:
+            active[0] -= 1
+            fetched.append(url)
+        if url.endswith("/bad"):
+            raise ConnectionError("boom")
+        return {"url": url, "title": url, "text": "text", "images": [], "audios": []}
+
+    def fake_run_item(item, options, page=None):
+        assert page is not None and page["url"] == item["source"]  # worker 行程不再自己抓
+        note = {
+            "id": item["key"], "type": item["kind"], "source": item["source"], "url": item["source"],
+            "title": page["title"], "content": page["text"], "summary": "s", "category": "c",
+            "keywords": [], "media": [], "duplicate_of": "",
+        }
+        return note, []
+
+    monkeypatch.setattr(ingest, "fetch_page", fake_fetch_page)
+    monkeypatch.setattr(jobs, "run_item", fake_run_item)
+    monkeypatch.setattr(JobWorker, "_new_pool", lambda self: ThreadPoolExecutor(1))
+    items = _items(4) + [{"key": "dup", "kind": "url", "source": "https://example.com/0"},
+                         {"key": "bad", "kind": "url", "source": "https://example.org/bad"}]
+    queue.submit("job", items, {"extract_mode": "full"})
+    store = NoteStore(str(tmp_path / "notes.sqlite"))
+    worker = JobWorker(queue, store=store, max_workers=1).start()
+    try:
+        expected = ["done"] * 5 + ["failed"]
+        assert _wait_for(queue, expected) == expected
+    finally:
+        worker.stop()
+    assert peak[0] > 1
+    assert sorted(fetched).count("https://example.com/0") == 1  # 同一網址只抓一次
+    assert sorted(store.ids()) == sorted(["k0", "k1", "k2", "k3", "dup"])
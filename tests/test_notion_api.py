@@ -0,0 +1,165 @@
+import itertools
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+from utils import notion_api
+from utils.notion_api import NotionSync, retry_after_seconds
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"status {status}")
+        self.status = status
+        self.headers = headers or {}
+
+
+class RequestTimeoutError(Exception):
+    code = "notionhq_client_request_timeout"
+
+
+class FakeNotion:
+    """
+    只實作 NotionSync 用到的端點；failures 依序在指定端點丟出例外。
+    """
+
+    def __init__(self):
+        self.saved = {}
+        self.calls = []
+        self.failures = []
+        self._ids = itertools.count(1)
+        self.databases = SimpleNamespace(retrieve=self._wrap("databases.retrieve", self._retrieve))
+        self.pages = SimpleNamespace(
+            create=self._wrap("pages.create", self._create),
+            update=self._wrap("pages.update", self._update),
+        )
+        self.blocks = SimpleNamespace(
+            children=SimpleNamespace(
+                append=self._wrap("blocks.children.append", self._append),
+                list=self._wrap("blocks.children.list", self._list),
+            ),
+            delete=self._wrap("blocks.delete", self._delete),
+        )
+
+    def _wrap(self, name, fn):
+        def call(**kwargs):
+            self.calls.append(name)
+            if self.failures and self.failures[0][0] == name:
+                raise self.failures.pop(0)[1]
+            return fn(**kwargs)
+        return call
+
+    def _retrieve(self, database_id):
+        return {"properties": {"標題": {"type": "title"}, "摘要": {"type": "rich_text"}}}
+
+    def _create(self, parent, properties, children):
+        page_id = f"page-{next(self._ids)}"
+        self.saved[page_id] = {"properties": properties, "blocks": [self._block(b) for b in children]}
+        return {"id": page_id}
+
+    def _update(self, page_id, properties):
+        if page_id not in self.saved:
+            raise FakeAPIError(404)
+        self.saved[page_id]["properties"] = properties
+        return {"id": page_id}
+
+    def _append(self, block_id, children):
+        self.saved[block_id]["blocks"].extend(self._block(b) for b in children)
+        return {}
+
+    def _list(self, block_id, page_size, start_cursor=None):
+        return {"results": list(self.saved[block_id]["blocks"]), "has_more": False}
+
+    def _delete(self, block_id):
+        for page in self.saved.values():
+            page["blocks"] = [b for b in page["blocks"] if b["id"] != block_id]
+        return {}
+
+    def _block(self, block):
+        return {"id": f"block-{next(self._ids)}", "text": block["paragraph"]["rich_text"][0]["text"]["content"]}
+
+    def texts(self, page_id):
+        return [b["text"] for b in self.saved[page_id]["blocks"]]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(notion_api.time, "sleep", slept.append)
+    return slept
+
+
+@pytest.fixture
+def client():
+    return FakeNotion()
+
+
+@pytest.fixture
+def sync(tmp_path, client, sleeps, monkeypatch):
+    sync = NotionSync("token", "db", state_path=str(tmp_path / "state.sqlite"), client=client)
+    monkeypatch.setattr(sync.limiter, "wait", lambda: None)  # sleeps 只記錄重試的等待
+    return sync
+
+
+def _note(content="body", title="t"):
+    return {"id": "n1", "title": title, "summary": "s", "content": content, "url": "https://example.com"}
+
+
+def test_create_update_and_skip(sync, client):
+    assert sync.sync([_note()])["created"] == 1
+    (page_id,) = client.saved
+    assert client.texts(page_id) == ["body"]
+    assert "標題" in client.saved[page_id]["properties"]
+
+    before = len(client.calls)
+    assert sync.sync([_note()])["skipped"] == 1
+    assert len(client.calls) == before
+
+    result = sync.sync([_note(content="new body", title="t2")])
+    assert result["updated"] == 1
+    assert list(client.saved) == [page_id]
+    assert client.texts(page_id) == ["new body"]
+
+
+def test_page_deleted_in_notion_is_recreated(sync, client):
+    sync.sync([_note()])
+    client.saved.clear()
+    assert sync.sync([_note(content="again")])["updated"] == 1
+    (page_id,) = client.saved
+    assert client.texts(page_id) == ["again"]
+
+
+def test_429_waits_retry_after_seconds(sync, client, sleeps):
+    client.failures.append(("pages.create", FakeAPIError(429, {"Retry-After": "2"})))
+    assert sync.sync([_note()])["created"] == 1
+    assert sleeps == [2.0]
+    assert client.calls.count("pages.create") == 2
+
+
+def test_429_accepts_http_date_retry_after(sync, client, sleeps):
+    when = formatdate(time.time() + 30, usegmt=True)
+    client.failures.append(("pages.create", FakeAPIError(429, {"retry-after": when})))
+    assert sync.sync([_note()])["created"] == 1
+    assert len(sleeps) == 1 and 25 < sleeps[0] <= 30
+
+
+def test_timeouts_are_retried(sync, client, sleeps):
+    client.failures.append(("pages.create", RequestTimeoutError("timed out")))
+    client.failures.append(("pages.create", TimeoutError()))
+    assert sync.sync([_note()])["created"] == 1
+    assert len(sleeps) == 2
+
+
+def test_client_errors_are_not_retried(sync, client, sleeps):
+    client.failures.append(("pages.create", FakeAPIError(400)))
+    result = sync.sync([_note()])
+    assert result["failed"] == 1 and result["errors"][0][0] == "n1"
+    assert sleeps == []
+    assert sync.sync([_note()])["created"] == 1  # 失敗的筆記下次會重送
+
+
+@pytest.mark.parametrize("value, expected", [("3", 3.0), ("-1", 0.0), ("soon", None), (None, None)])
+def test_retry_after_seconds(value, expected):
+    assert retry_after_seconds(value) == expected
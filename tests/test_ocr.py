@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import _compat, jobs, ocr
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """
+    把 OCR 行程池換成執行緒池，記錄 ocr_images 是否真的把圖片交給行程池。
+    """
+    calls = []
+
+    class _Pool(ThreadPoolExecutor):
+        def map(self, fn, items):
+            calls.append(list(items))
+            return super().map(fn, items)
+
+    executor = _Pool(max_workers=2)
+    monkeypatch.setattr(ocr, "_get_pool", lambda: executor)
+    monkeypatch.setattr(ocr, "select_images", lambda paths: (list(paths), {"small": 0}))
+    monkeypatch.setattr(ocr, "_ocr_file", lambda path: (f"text:{path}", 0.01))
+    yield calls
+    executor.shutdown()
+
+
+def test_cpu_share_splits_cores_between_job_workers(monkeypatch):
+    monkeypatch.setenv(_compat.JOB_WORKER_ENV, "")
+    assert _compat.job_workers() == 1 and _compat.cpu_share(8) == 8
+    jobs._init_worker(4)
+    assert _compat.job_workers() == 4 and _compat.cpu_share(8) == 2
+    assert _compat.cpu_share(3) == 1
+    monkeypatch.setenv(_compat.JOB_WORKER_ENV, "x")
+    assert _compat.job_workers() == 1
+
+
+def test_ocr_uses_pool_inside_job_worker(pool, monkeypatch):
+    monkeypatch.setenv(_compat.JOB_WORKER_ENV, "4")
+    texts, stats = ocr.ocr_images(["a.png", "b.png", "c.png"])
+    assert texts == ["text:a.png", "text:b.png", "text:c.png"]
+    assert pool == [["a.png", "b.png", "c.png"]]
+    assert stats["ocr"] == 3 and stats["cpu_seconds"] == pytest.approx(0.03)
+
+
+def test_ocr_pool_is_sized_by_cpu_share(monkeypatch):
+    created = {}
+
+    class _Executor:
+        def __init__(self, max_workers, **kwargs):
+            created["max_workers"] = max_workers
+
+    monkeypatch.setattr(ocr, "_pool", None)
+    monkeypatch.setattr(ocr, "ProcessPoolExecutor", _Executor)
+    monkeypatch.setattr(ocr, "OCR_WORKERS", 8)
+    monkeypatch.setenv(_compat.JOB_WORKER_ENV, "4")
+    ocr._get_pool()
+    assert created["max_workers"] == 2
@@ -0,0 +1,54 @@
+import numpy as np
+
+from utils import gpt
+from utils.note_store import NoteStore
+from utils.vector_index import VectorIndex, sync_index
+
+
+def _unit(dim, seed):
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_add_after_interrupted_append_keeps_rows_aligned(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=8)
+    a, b, c = _unit(8, 1), _unit(8, 2), _unit(8, 3)
+    index.add(["a"], a[None, :])
+
+    # 模擬附加到一半中斷：向量與簽章寫了，ids.txt 沒寫到 (還留半行)
+    with open(index._vectors_path, "ab") as f:
+        f.write(b.tobytes())
+    with open(index._lsh_path, "ab") as f:
+        f.write(np.zeros(1, dtype="<u8").tobytes())
+    with open(index._ids_path, "a", encoding="utf-8") as f:
+        f.write("or")
+
+    index.add(["c"], c[None, :])
+    reopened = VectorIndex(str(tmp_path))
+    assert reopened.ids() == ["a", "c"]
+    for approximate in (False, True):
+        assert reopened.search(c, k=1, approximate=approximate)[0][0] == "c"
+        assert reopened.search(a, k=1, approximate=approximate)[0][0] == "a"
+
+
+def test_sync_index_embeds_only_missing_notes(tmp_path, monkeypatch):
+    store = NoteStore(str(tmp_path / "notes.sqlite"))
+    store.add_many([
+        {"id": f"n{i}", "type": "text", "source": f"n{i}", "title": f"title {i}", "content": f"body {i}"}
+        for i in range(5)
+    ])
+    index = VectorIndex(str(tmp_path / "vectors"), dim=4)
+    index.add(["n0", "n1"], np.eye(4, dtype=np.float32)[:2])
+
+    embedded = []
+
+    def fake_embed(texts):
+        embedded.extend(texts)
+        return np.tile(np.eye(4, dtype=np.float32)[2], (len(texts), 1))
+
+    monkeypatch.setattr(gpt, "embed_texts", fake_embed)
+    monkeypatch.setattr(store, "load_df", None)  # 不應再整批讀取
+    assert sync_index(index, store, batch_size=2) == 3
+    assert sorted(index.ids()) == [f"n{i}" for i in range(5)]
+    assert len(embedded) == 3 and all("title" in t for t in embedded)
+    assert sync_index(index, store) == 0
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from utils import _compat, whisper_asr
+from utils.whisper_asr import SAMPLE_RATE, iter_speech_segments, pack_windows
+
+
+def _silence(seconds):
+    return np.zeros(int(round(seconds * SAMPLE_RATE)), dtype=np.float32)
+
+
+def _tone(seconds):
+    t = np.arange(int(round(seconds * SAMPLE_RATE))) / SAMPLE_RATE
+    return (0.1 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def _blocks(pcm, size=SAMPLE_RATE // 3):
+    # 區塊長度故意不是 VAD 格長的整數倍
+    return [pcm[i:i + size] for i in range(0, len(pcm), size)]
+
+
+def test_speech_segments_keep_padding_on_both_sides():
+    # 兩段語音中間的靜音 (0.66 秒) 剛好超過切段門檻
+    pcm = np.concatenate([_silence(0.9), _tone(0.9), _silence(0.66), _tone(0.9), _silence(0.9)])
+    stats = {}
+    segments = list(iter_speech_segments(_blocks(pcm), stats))
+
+    assert [round(start, 2) for start, _ in segments] == [0.72, 2.28]
+    # 前後各 0.18 秒 (6 格) 靜音 + 0.9 秒語音
+    assert [len(samples) for _, samples in segments] == [42 * 480, 42 * 480]
+    assert stats["audio_seconds"] == pytest.approx(4.26)
+    assert stats["speech_seconds"] == pytest.approx(1.8)
+
+
+def test_long_speech_is_split_below_window_length():
+    segments = list(iter_speech_segments(_blocks(_tone(40.0), SAMPLE_RATE)))
+    assert len(segments) == 2
+    assert all(len(samples) <= 30 * SAMPLE_RATE for _, samples in segments)
+    assert sum(len(samples) for _, samples in segments) == 40 * SAMPLE_RATE
+
+
+def test_pack_windows_merges_and_splits():
+    segments = [(0.0, _tone(0.5)), (1.0, _tone(0.5)), (2.0, _tone(0.5))]
+    gap = int(whisper_asr.WINDOW_GAP_SECONDS * SAMPLE_RATE)
+
+    merged = list(pack_windows(segments))
+    assert [start for start, _ in merged] == [0.0]
+    assert len(merged[0][1]) == 3 * 8000 + 2 * gap
+
+    split = list(pack_windows(segments, max_seconds=1.5))
+    assert [start for start, _ in split] == [0.0, 2.0]
+    assert [len(samples) for _, samples in split] == [2 * 8000 + gap, 8000]
+
+
+def test_windows_go_to_pool_inside_job_worker(monkeypatch):
+    monkeypatch.setenv(_compat.JOB_WORKER_ENV, "4")
+    pcm = np.concatenate([_tone(0.5), _silence(1.0), _tone(0.5)])
+    executor = ThreadPoolExecutor(max_workers=2)
+    submitted = []
+
+    def get_pool():
+        submitted.append(True)
+        return executor
+
+    monkeypatch.setattr(whisper_asr, "iter_pcm", lambda source: _blocks(pcm))
+    monkeypatch.setattr(whisper_asr, "_get_pool", get_pool)
+    monkeypatch.setattr(whisper_asr, "pack_windows", lambda segments: pack_windows(segments, max_seconds=1.0))
+    monkeypatch.setattr(whisper_asr, "_transcribe_window", lambda samples, language=None: f"{len(samples)}")
+    try:
+        result = whisper_asr._transcribe("audio.wav", None, None)
+    finally:
+        executor.shutdown()
+    assert submitted and result["windows"] == 2
+    assert [round(s["start"], 2) for s in result["segments"]] == [0.0, 1.32]
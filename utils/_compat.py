@@ -0,0 +1,111 @@
+# utils/_compat.py
+
+import os
+import time
+import functools
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# ------------------------------------------------------------------------
+# Streamlit 相容層：utils 只透過這裡取用 st.cache_data，
+#   - 在 Streamlit 底下 (或有安裝 streamlit 時) 直接用 st.cache_data
+#   - 沒安裝 streamlit，或設定 INSTANOTE_HEADLESS=1 (批次匯入 CLI、排程、worker 節點) 時，
+#     改用行程內的 LRU 快取：參數是 str / bytes / 數字 / tuple / list / dict 這類值時才快取，
+#     檔案物件等其他參數直接呼叫不快取 (避免以物件身分當鍵、留住已關閉的檔案)
+# ------------------------------------------------------------------------
+HEADLESS = os.environ.get("INSTANOTE_HEADLESS", "") not in ("", "0")
+
+
+def _streamlit():
+    if HEADLESS:
+        return None
+    try:
+        import streamlit
+    except ImportError:
+        return None
+    return streamlit
+
+
+_VALUE_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def _freeze(value):
+    if isinstance(value, _VALUE_TYPES):
+        return value
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_freeze(v) for v in value))
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((k, _freeze(v)) for k, v in value.items())))
+    raise TypeError(f"not cacheable: {type(value).__name__}")
+
+
+def _lru_cache_data(func: Callable, max_entries: Optional[int], ttl: Optional[float]) -> Callable:
+    entries: OrderedDict = OrderedDict()
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            key = (_freeze(args), _freeze(kwargs))
+        except TypeError:
+            return func(*args, **kwargs)
+        now = time.monotonic()
+        with lock:
+            hit = entries.get(key)
+            if hit is not None and (ttl is None or now - hit[1] < ttl):
+                entries.move_to_end(key)
+                return hit[0]
+        value = func(*args, **kwargs)
+        with lock:
+            entries[key] = (value, now)
+            entries.move_to_end(key)
+            while max_entries is not None and len(entries) > max_entries:
+                entries.popitem(last=False)
+        return value
+
+    def clear():
+        with lock:
+            entries.clear()
+
+    wrapper.clear = clear
+    return wrapper
+
+
+def cache_data(func: Optional[Callable] = None, *, max_entries: Optional[int] = None, ttl: Optional[float] = None, **kwargs):
+    """
+    與 st.cache_data 相同的用法 (@cache_data 或 @cache_data(max_entries=..., ttl=...))。
+    其餘參數 (如 show_spinner) 只在 Streamlit 底下有作用。
+    """
+    st = _streamlit()
+    if st is not None:
+        decorator = st.cache_data(max_entries=max_entries, ttl=ttl, **kwargs)
+    else:
+        def decorator(f):
+            return _lru_cache_data(f, max_entries, ttl)
+    return decorator(func) if func is not None else decorator
+
+
+# ------------------------------------------------------------------------
+# 執行環境：背景工作 / 批次匯入的 worker 行程 (jobs._init_worker) 會把同時執行的 worker 行程數
+# 寫進 INSTANOTE_JOB_WORKER。OCR / ASR 照常用各自的行程池，但大小以 cpu_share() 平分，
+# N 個 worker 行程合起來才用滿所有核心，不會各自都開滿
+# ------------------------------------------------------------------------
+JOB_WORKER_ENV = "INSTANOTE_JOB_WORKER"
+
+
+def job_workers() -> int:
+    """
+    同一台機器上同時執行的 worker 行程數；不在 worker 行程裡時為 1。
+    """
+    try:
+        return max(1, int(os.environ.get(JOB_WORKER_ENV, "") or 1))
+    except ValueError:
+        return 1
+
+
+def cpu_share(total: int) -> int:
+    """
+    把 total 個平行單位 (行程、執行緒) 平分給 job_workers() 個 worker 行程，至少 1。
+    """
+    return max(1, total // job_workers())
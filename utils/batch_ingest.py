@@ -0,0 +1,346 @@
+# utils/batch_ingest.py
+"""
+不經 Streamlit 的批次匯入：從清單檔或 stdin 讀入網址 / 本地檔案路徑 (一行一筆，# 開頭為註解)，
+以行程池平行跑 擷取 → OCR/ASR → 摘要分類，結果寫成 JSONL 和/或寫進筆記庫。
+進度記在 checkpoint 檔，中斷後以同樣的參數重跑會從停下的地方繼續。
+
+    python -m utils.batch_ingest urls.txt --out notes.jsonl
+    cat urls.txt | python -m utils.batch_ingest --store ~/.instanote/notes.sqlite --workers 4
+"""
+
+import os
+
+# 在匯入其他 utils 之前設定，讓快取改用 utils._compat 的行程內 LRU，不必載入 Streamlit
+os.environ.setdefault("INSTANOTE_HEADLESS", "1")
+
+import sys
+import json
+import time
+import signal
+import sqlite3
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from utils import metrics
+from utils.fetch_url import AUDIO_EXTS, IMAGE_EXTS
+from utils.note_store import content_key
+
+# ------------------------------------------------------------------------
+# 批次匯入：
+#   - 輸入逐行讀取，同時在行程池裡的項目最多 workers × 2 筆，記憶體用量和清單長度無關
+#   - 每筆完成後「先寫輸出、再記 checkpoint」；checkpoint 同時記下 JSONL 已確認的位元組數，
+#     續跑時先把 JSONL 截回該位置，中斷前寫了一半或還沒記錄的那筆不會重複出現
+#   - 失敗的項目也記在 checkpoint，預設續跑時略過，加 --retry-failed 才重試
+# ------------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+TEXT_EXTS = [".txt", ".md"]
+PROGRESS_EVERY = 50   # 每完成幾筆記一次進度
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    key        TEXT PRIMARY KEY,
+    source     TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    error      TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+# --- 輸入 -----------------------------------------------------------------
+def read_sources(paths: List[str], stdin: TextIO = sys.stdin) -> Iterator[str]:
+    """
+    逐行產生清單裡的網址或檔案路徑 ("-" 或沒有指定清單時讀 stdin)，略過空行與 # 註解。
+    """
+    for path in paths or ["-"]:
+        f = stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+        finally:
+            if f is not stdin:
+                f.close()
+
+
+def make_item(source: str) -> dict:
+    """
+    把一行輸入轉成 jobs.run_item 的項目：網址 → url；本地檔案依副檔名 → image / audio / text。
+    """
+    if source.startswith(("http://", "https://")):
+        return {"key": content_key(source), "kind": "url", "source": source}
+    path = os.path.abspath(os.path.expanduser(source))
+    ext = os.path.splitext(path)[1].lower()
+    if ext in IMAGE_EXTS:
+        kind = "image"
+    elif ext in AUDIO_EXTS:
+        kind = "audio"
+    elif ext in TEXT_EXTS:
+        kind = "text"
+    else:
+        raise ValueError(f"不支援的檔案類型：{source}")
+    with open(path, "rb") as f:
+        key = content_key(f.read())
+    return {"key": key, "kind": kind, "source": os.path.basename(path), "path": path}
+
+
+# --- checkpoint -----------------------------------------------------------
+class Checkpoint:
+    """
+    SQLite 記錄每個項目 (以 key 識別) 的處理結果，以及 JSONL 輸出已確認的長度。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def status(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT status FROM items WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+
+    def output_offset(self) -> Optional[int]:
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'output_offset'").fetchone()
+        return int(row[0]) if row else None
+
+    def record(self, item: dict, status: str, error: str = "", output_offset: Optional[int] = None) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO items (key, source, status, error, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (item["key"], item["source"], status, error, time.time()),
+            )
+            if output_offset is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('output_offset', ?)", (str(output_offset),)
+                )
+
+
+# --- 執行 -----------------------------------------------------------------
+class BatchIngest:
+    """
+    有界的平行匯入：主行程讀輸入、寫輸出與 checkpoint，worker 行程跑 jobs.run_item。
+    """
+
+    def __init__(
+        self,
+        checkpoint: Checkpoint,
+        out_path: Optional[str] = None,
+        store=None,
+        workers: int = 2,
+        options: Optional[dict] = None,
+        retry_failed: bool = False,
+    ):
+        self.checkpoint = checkpoint
+        self.store = store
+        self.workers = workers
+        self.options = options or {}
+        self.retry_failed = retry_failed
+        self.stats = {"done": 0, "failed": 0, "skipped": 0}
+        self.out = None
+        if out_path:
+            self.out = self._open_output(out_path)
+
+    def _open_output(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        out = open(path, "ab")
+        offset = self.checkpoint.output_offset() or 0
+        if out.tell() > offset:
+            # 上次中斷時寫了但還沒記進 checkpoint 的部分，續跑會重新處理
+            logger.info("truncating %s from %d to %d bytes", path, out.tell(), offset)
+            out.truncate(offset)
+            out.seek(offset)
+        return out
+
+    def _pending(self, sources: Iterable[str]) -> Iterator[dict]:
+        seen = set()
+        for source in sources:
+            try:
+                item = make_item(source)
+            except (OSError, ValueError) as e:
+                item = {"key": content_key(source), "source": source}
+                if self.checkpoint.status(item["key"]) == "failed" and not self.retry_failed:
+                    self.stats["skipped"] += 1
+                    continue
+                logger.warning("skip %s: %s", source, e)
+                self.checkpoint.record(item, "failed", str(e))
+                self.stats["failed"] += 1
+                continue
+            if item["key"] in seen:
+                continue
+            seen.add(item["key"])
+            status = self.checkpoint.status(item["key"])
+            if status == "done" or (status == "failed" and not self.retry_failed):
+                self.stats["skipped"] += 1
+                continue
+            if self.store is not None and self.store.has(item["key"]):
+                self.checkpoint.record(item, "done")
+                self.stats["skipped"] += 1
+                continue
+            yield item
+
+    def _collect(self, future: Future, item: dict) -> None:
+        from utils.pipeline import note_error
+
+        try:
+            note, measurements = future.result()
+            metrics.merge(measurements)
+            error = note_error(note)
+        except BrokenProcessPool:
+            # worker 行程被終止 (例如記憶體不足)，不是這個項目本身的錯：不記錄，續跑時重做
+            raise
+        except Exception as e:
+            note, error = None, str(e) or type(e).__name__
+        if error:
+            logger.warning("failed %s: %s", item["source"], error)
+            self.checkpoint.record(item, "failed", error)
+            self.stats["failed"] += 1
+            return
+
+        offset = None
+        if self.out is not None:
+            self.out.write((json.dumps(note, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.out.flush()
+            os.fsync(self.out.fileno())
+            offset = self.out.tell()
+        if self.store is not None:
+            self.store.add_many([note])
+        self.checkpoint.record(item, "done", output_offset=offset)
+        self.stats["done"] += 1
+
+    def run(self, sources: Iterable[str]) -> dict:
+        from utils.jobs import _init_worker, run_item
+
+        start = time.perf_counter()
+        pending = self._pending(sources)
+        inflight: Dict[Future, dict] = {}
+        finished = 0
+        # 和 JobWorker 一樣用 spawn 啟動 worker，並預先載入模型
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.workers,),
+        ) as pool:
+            try:
+                while True:
+                    # 多派一倍給行程池排隊，讓 worker 不會閒置
+                    while len(inflight) < self.workers * 2:
+                        item = next(pending, None)
+                        if item is None:
+                            break
+                        inflight[pool.submit(run_item, item, self.options)] = item
+                    if not inflight:
+                        break
+                    done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._collect(future, inflight.pop(future))
+                        finished += 1
+                        if finished % PROGRESS_EVERY == 0:
+                            elapsed = time.perf_counter() - start
+                            logger.info(
+                                "%d done, %d failed, %d skipped (%.2f items/s)",
+                                self.stats["done"], self.stats["failed"], self.stats["skipped"],
+                                finished / elapsed,
+                            )
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        self.stats["seconds"] = time.perf_counter() - start
+        return self.stats
+
+    def close(self) -> None:
+        if self.out is not None:
+            self.out.close()
+        self.checkpoint.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="批次匯入網址或本地檔案 (不需要 Streamlit)，可中斷後續跑。",
+    )
+    parser.add_argument("lists", nargs="*", help="清單檔 (一行一個網址或檔案路徑)；省略或 - 讀 stdin")
+    parser.add_argument("--out", help="輸出 JSONL 檔 (附加寫入)")
+    parser.add_argument(
+        "--store", nargs="?", const="", default=None,
+        help="寫進筆記庫；不帶路徑時用 INSTANOTE_STORE_PATH / 預設位置",
+    )
+    parser.add_argument("--checkpoint", help="checkpoint 檔 (預設為 <out>.checkpoint 或筆記庫旁的 batch.checkpoint)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("INSTANOTE_WORKERS", 2)))
+    parser.add_argument("--classify-mode", choices=["nli", "embedding"])
+    parser.add_argument("--labels", help="自訂分類標籤 (逗號分隔)")
+    parser.add_argument("--extract-mode", choices=["main", "full"], help="網頁文字只取正文或全頁 (預設依 INSTANOTE_EXTRACT_MODE)")
+    parser.add_argument("--retry-failed", action="store_true", help="重試上次失敗的項目")
+    parser.add_argument("--metrics", default=metrics.EXPORT_PATH, help="結束時寫出各階段耗時 (.json 或 Prometheus 文字檔)")
+    parser.add_argument("--profile", metavar="DIR", help="每個項目各寫一份剖析結果到 DIR (INSTANOTE_PROFILER=sampling 改用 pyinstrument)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if not args.out and args.store is None:
+        parser.error("至少要指定 --out 或 --store")
+    if args.store:
+        # worker 行程 (spawn) 繼承環境變數，近似重複與關鍵字統計也查同一個筆記庫
+        os.environ["INSTANOTE_STORE_PATH"] = os.path.abspath(os.path.expanduser(args.store))
+
+    from utils.note_store import NoteStore, STORE_PATH
+
+    store = NoteStore(os.environ.get("INSTANOTE_STORE_PATH", STORE_PATH)) if args.store is not None else None
+    checkpoint_path = args.checkpoint or (
+        f"{args.out}.checkpoint" if args.out
+        else os.path.join(os.path.dirname(os.path.abspath(store.path)), "batch.checkpoint")
+    )
+    options = {}
+    if args.classify_mode:
+        options["classify_mode"] = args.classify_mode
+    if args.extract_mode:
+        options["extract_mode"] = args.extract_mode
+    if args.labels:
+        options["labels"] = [label.strip() for label in args.labels.split(",") if label.strip()]
+    if args.profile:
+        options["profile_dir"] = os.path.abspath(args.profile)
+
+    batch = BatchIngest(
+        Checkpoint(checkpoint_path), out_path=args.out, store=store,
+        workers=args.workers, options=options, retry_failed=args.retry_failed,
+    )
+    # SIGTERM (例如排程逾時) 和 Ctrl-C 一樣中止，已完成的項目都已記在 checkpoint
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        stats = batch.run(read_sources(args.lists))
+    except KeyboardInterrupt:
+        logger.warning("interrupted; rerun the same command to resume (%s)", checkpoint_path)
+        return 130
+    except BrokenProcessPool:
+        logger.error("a worker process died; rerun the same command to resume (%s)", checkpoint_path)
+        return 1
+    finally:
+        batch.close()
+        if args.metrics:
+            metrics.metrics.export(args.metrics)
+    logger.info(
+        "finished: %d done, %d failed, %d skipped in %.1fs",
+        stats["done"], stats["failed"], stats["skipped"], stats["seconds"],
+    )
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,321 @@
-import dropbox
+# utils/dropbox_export.py
+
+import os
+import gzip
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import uuid
+from contextlib import closing
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+from utils.note_store import STORE_PATH, NoteStore
+
+# ------------------------------------------------------------------------
+# Dropbox 增量備份：
+#   - 大檔以 upload session 分塊串流上傳 (每塊 CHUNK_SIZE)，不必整檔讀進記憶體
+#   - 筆記寫成 gzip 壓縮的 JSON Lines「分段」(notes/<時間>.jsonl.gz)，
+#     每次只包含上次備份後新增或有變動的筆記
+#   - 媒體檔以內容雜湊命名 (media/<sha256><ext>)，已上傳過的不再重送；
+#     本地路徑的 mtime / 大小沒變就沿用上次的雜湊，變了才重新計算；
+#     圖片、音訊本身已壓縮，原樣上傳，每上傳一個就記進 manifest
+#   - 本地 manifest (SQLite) 記錄已備份的內容雜湊；遠端 manifest.json 記錄分段順序，
+#     restore() 依序讀回分段就能重建筆記牆
+# dbx / files_types 可注入替身物件，不需真的 Dropbox 帳號也能測試
+# ------------------------------------------------------------------------
+MANIFEST_PATH = os.environ.get(
+    "INSTANOTE_DROPBOX_MANIFEST_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(STORE_PATH)), "dropbox_manifest.sqlite"),
+)
+BACKUP_ROOT = "/InstaNote"
+CHUNK_SIZE = 8 * 1024 * 1024   # Dropbox 建議 4 MiB 的倍數
+RESTORE_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dropbox_manifest (
+    root         TEXT NOT NULL,
+    kind         TEXT NOT NULL,
+    key          TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    remote_path  TEXT NOT NULL,
+    backed_up_at REAL NOT NULL,
+    file_stat    TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (root, kind, key)
+);
+CREATE TABLE IF NOT EXISTS dropbox_segments (
+    root        TEXT NOT NULL,
+    remote_path TEXT NOT NULL,
+    notes       INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    PRIMARY KEY (root, remote_path)
+);
+"""
+
+
+def _record_hash(note: dict) -> str:
+    return hashlib.sha256(json.dumps(note, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _file_stat(path: str) -> str:
+    """
+    媒體檔的 mtime (ns) 與大小；跟上次備份時相同就不必重算雜湊。
+    """
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upload_stream(
+    dbx, f: BinaryIO, dest_path: str, size: int, files_types=None, chunk_size: Optional[int] = None,
+) -> None:
+    """
+    把 file-like 物件上傳到 dest_path (覆蓋)：小檔一次 files_upload，大檔走 upload session 分塊上傳。
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    if files_types is None:
+        from dropbox import files as files_types  # 用到備份時才匯入
+
+    mode = files_types.WriteMode.overwrite
+    if size <= chunk_size:
+        dbx.files_upload(f.read(), dest_path, mode=mode)
+        return
+    session = dbx.files_upload_session_start(f.read(chunk_size))
+    cursor = files_types.UploadSessionCursor(session_id=session.session_id, offset=f.tell())
+    commit = files_types.CommitInfo(path=dest_path, mode=mode)
+    while size - f.tell() > chunk_size:
+        dbx.files_upload_session_append_v2(f.read(chunk_size), cursor)
+        cursor.offset = f.tell()
+    dbx.files_upload_session_finish(f.read(chunk_size), cursor, commit)
+
+
+def _download_to(dbx, remote_path: str, local_path: str) -> None:
+    """
+    串流下載到 local_path (先寫暫存檔再 os.replace)。
+    """
+    _, response = dbx.files_download(remote_path)
+    tmp_path = f"{local_path}.part"
+    try:
+        with open(tmp_path, "wb") as out:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                out.write(chunk)
+        os.replace(tmp_path, local_path)
+    finally:
+        response.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class DropboxBackup:
+    """
+    筆記庫的 Dropbox 增量備份 / 還原。
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        root: str = BACKUP_ROOT,
+        manifest_path: str = MANIFEST_PATH,
+        dbx=None,
+        files_types=None,
+    ):
+        if dbx is None:
+            import dropbox  # 用到備份時才匯入
+
+            dbx = dropbox.Dropbox(token)
+        self.dbx = dbx
+        self.files_types = files_types
+        self.root = root.rstrip("/")
+        self.manifest_path = manifest_path
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(dropbox_manifest)")}
+            if "file_stat" not in columns:
+                conn.execute("ALTER TABLE dropbox_manifest ADD COLUMN file_stat TEXT NOT NULL DEFAULT ''")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.manifest_path, timeout=30)
+
+    def _upload_file(self, local_path: str, remote_path: str) -> int:
+        size = os.path.getsize(local_path)
+        with open(local_path, "rb") as f:
+            upload_stream(self.dbx, f, remote_path, size, self.files_types)
+        return size
+
+    # --- 備份 -------------------------------------------------------------
+    def backup(self, store: NoteStore, progress: Optional[Callable[[str], None]] = None) -> dict:
+        """
+        上傳上次備份後新增或變動的筆記與媒體，回傳 {"notes", "media", "bytes", "segment"}。
+        """
+        with closing(self._connect()) as conn:
+            known = {
+                (kind, key): (content_hash, file_stat)
+                for kind, key, content_hash, file_stat in conn.execute(
+                    "SELECT kind, key, content_hash, file_stat FROM dropbox_manifest WHERE root = ?", (self.root,)
+                )
+            }
+
+        uploaded_media = {h for (kind, _), (h, _) in known.items() if kind == "media"}
+        result = {"notes": 0, "media": 0, "bytes": 0, "segment": None}
+        note_entries, media_changed = [], False
+        fd, segment_path = tempfile.mkstemp(suffix=".jsonl.gz", prefix="instanote-backup-")
+        os.close(fd)
+        try:
+            with gzip.open(segment_path, "wt", encoding="utf-8") as segment, closing(self._connect()) as conn:
+                for note in store.iter_notes():
+                    digest = _record_hash(note)
+                    if known.get(("note", note["id"]), (None, None))[0] != digest:
+                        segment.write(json.dumps(note, ensure_ascii=False) + "\n")
+                        note_entries.append((note["id"], digest))
+                    for media_path in note.get("media") or []:
+                        if not os.path.exists(media_path):
+                            continue
+                        stat = _file_stat(media_path)
+                        old_hash, old_stat = known.get(("media", media_path), (None, None))
+                        if old_stat == stat:
+                            continue
+                        media_hash = _file_hash(media_path)
+                        remote = f"{self.root}/media/{media_hash}{os.path.splitext(media_path)[1].lower()}"
+                        if media_hash not in uploaded_media:
+                            if progress is not None:
+                                progress(f"上傳媒體 {os.path.basename(media_path)}")
+                            result["bytes"] += self._upload_file(media_path, remote)
+                            result["media"] += 1
+                            uploaded_media.add(media_hash)
+                        known[("media", media_path)] = (media_hash, stat)
+                        media_changed = media_changed or media_hash != old_hash
+                        # 每上傳一個就寫進 manifest，後面失敗時下次也不必重傳
+                        with conn:
+                            conn.execute(
+                                "INSERT OR REPLACE INTO dropbox_manifest "
+                                "(root, kind, key, content_hash, remote_path, backed_up_at, file_stat) "
+                                "VALUES (?, 'media', ?, ?, ?, ?, ?)",
+                                (self.root, media_path, media_hash, remote, time.time(), stat),
+                            )
+
+            if note_entries:
+                remote_segment = f"{self.root}/notes/{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+                if progress is not None:
+                    progress(f"上傳 {len(note_entries)} 筆筆記")
+                result["bytes"] += self._upload_file(segment_path, remote_segment)
+                result["notes"] = len(note_entries)
+                result["segment"] = remote_segment
+        finally:
+            os.remove(segment_path)
+
+        now = time.time()
+        if note_entries:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dropbox_manifest "
+                    "(root, kind, key, content_hash, remote_path, backed_up_at) VALUES (?, 'note', ?, ?, ?, ?)",
+                    [(self.root, note_id, digest, result["segment"], now) for note_id, digest in note_entries],
+                )
+                conn.execute(
+                    "INSERT INTO dropbox_segments VALUES (?, ?, ?, ?)",
+                    (self.root, result["segment"], len(note_entries), now),
+                )
+        if note_entries or media_changed:
+            self._upload_remote_manifest()
+        return result
+
+    def _upload_remote_manifest(self) -> None:
+        with closing(self._connect()) as conn:
+            segments = [row[0] for row in conn.execute(
+                "SELECT remote_path FROM dropbox_segments WHERE root = ? ORDER BY created_at", (self.root,)
+            )]
+            media = dict(conn.execute(
+                "SELECT key, remote_path FROM dropbox_manifest WHERE root = ? AND kind = 'media'", (self.root,)
+            ).fetchall())
+        data = json.dumps({"version": 1, "segments": segments, "media": media}, ensure_ascii=False).encode("utf-8")
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.seek(0)
+            upload_stream(self.dbx, f, f"{self.root}/manifest.json", len(data), self.files_types)
+
+    # --- 還原 -------------------------------------------------------------
+    def restore(self, store: NoteStore, media_dir: str, progress: Optional[Callable[[str], None]] = None) -> dict:
+        """
+        依遠端 manifest.json 依序讀回所有分段寫進 store (較新的分段覆蓋舊版本)，
+        媒體下載到 media_dir 並改寫筆記的 media 路徑。回傳 {"notes", "media", "segments"}。
+        """
+        os.makedirs(media_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="instanote-restore-") as tmp_dir:
+            manifest_file = os.path.join(tmp_dir, "manifest.json")
+            _download_to(self.dbx, f"{self.root}/manifest.json", manifest_file)
+            with open(manifest_file, encoding="utf-8") as f:
+                manifest = json.load(f)
+
+            local_media: Dict[str, str] = {}
+            for original, remote in manifest["media"].items():
+                local_path = os.path.join(media_dir, os.path.basename(remote))
+                if not os.path.exists(local_path):
+                    if progress is not None:
+                        progress(f"下載媒體 {os.path.basename(remote)}")
+                    _download_to(self.dbx, remote, local_path)
+                local_media[original] = local_path
+
+            restored = 0
+            note_entries = {}
+            for remote_segment in manifest["segments"]:
+                if progress is not None:
+                    progress(f"還原 {os.path.basename(remote_segment)}")
+                segment_file = os.path.join(tmp_dir, "segment.jsonl.gz")
+                _download_to(self.dbx, remote_segment, segment_file)
+                batch: List[dict] = []
+                with gzip.open(segment_file, "rt", encoding="utf-8") as segment:
+                    for line in segment:
+                        note = json.loads(line)
+                        note["media"] = [local_media.get(p, p) for p in note.get("media") or []]
+                        note_entries[note["id"]] = (_record_hash(note), remote_segment)
+                        batch.append(note)
+                        if len(batch) >= RESTORE_BATCH:
+                            store.add_many(batch)
+                            restored += len(batch)
+                            batch = []
+                store.add_many(batch)
+                restored += len(batch)
+
+        # 還原後的內容已在遠端，記進本地 manifest，下次備份才不會整批重傳
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO dropbox_manifest "
+                "(root, kind, key, content_hash, remote_path, backed_up_at) VALUES (?, 'note', ?, ?, ?, ?)",
+                [(self.root, note_id, digest, remote, now) for note_id, (digest, remote) in note_entries.items()],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO dropbox_manifest "
+                "(root, kind, key, content_hash, remote_path, backed_up_at, file_stat) VALUES (?, 'media', ?, ?, ?, ?, ?)",
+                [
+                    (self.root, local, os.path.splitext(os.path.basename(manifest["media"][original]))[0],
+                     manifest["media"][original], now, _file_stat(local))
+                    for original, local in local_media.items()
+                ],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO dropbox_segments VALUES (?, ?, 0, ?)",
+                [(self.root, remote, now + i * 1e-6) for i, remote in enumerate(manifest["segments"])],
+            )
+        return {"notes": restored, "media": len(local_media), "segments": len(manifest["segments"])}
+
 
 def upload_to_dropbox(token, local_file_path, dropbox_dest_path):
+    """
+    上傳單一檔案 (大檔自動改用 upload session 分塊上傳)。
+    """
+    import dropbox  # 用到備份時才匯入
+
     dbx = dropbox.Dropbox(token)
     with open(local_file_path, "rb") as f:
-        dbx.files_upload(f.read(), dropbox_dest_path, mode=dropbox.files.WriteMode.overwrite)
+        upload_stream(dbx, f, dropbox_dest_path, os.path.getsize(local_file_path))
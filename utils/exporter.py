@@ -0,0 +1,198 @@
+# utils/exporter.py
+
+import os
+import json
+import tempfile
+from typing import Iterable, Iterator, Optional, TextIO
+
+from utils.note_store import NoteStore
+
+# ------------------------------------------------------------------------
+# 串流匯出：筆記從 iterator 逐筆 (或逐批) 寫出，記憶體用量與筆記總數無關
+#   - markdown / jsonl：逐筆寫入文字檔；增量模式直接附加在檔尾
+#   - parquet / arrow：以 ARROW_BATCH 筆為一批寫成欄式檔 (需要 pyarrow)；
+#     增量模式每次另寫一個分段檔 (notes.00001.parquet …)，可當成同一個資料集讀取
+#   - 完整匯出先寫暫存檔再 os.replace，中途失敗不會留下寫一半的檔案
+#   - 增量匯出的進度 (已匯出到的 rowid) 記在 <path>.checkpoint
+# ------------------------------------------------------------------------
+FORMATS = {
+    "markdown": ".md",
+    "jsonl": ".jsonl",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+MIME_TYPES = {
+    "markdown": "text/markdown",
+    "jsonl": "application/jsonl",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+EXPORT_COLUMNS = [
+    "id", "type", "source", "url", "title", "category", "summary",
+    "keywords", "content", "media", "duplicate_of", "created_at",
+]
+ARROW_BATCH = 1000
+
+
+def write_markdown(notes: Iterable[dict], f: TextIO) -> int:
+    count = 0
+    for note in notes:
+        f.write(f"# {note.get('title') or note.get('source') or note.get('url') or note.get('id', '')}\n")
+        f.write(f"**主題：** {note.get('category', '')}\n\n")
+        if note.get("url"):
+            f.write(f"**網址：** {note['url']}\n\n")
+        if note.get("keywords"):
+            f.write(f"**關鍵字：** {', '.join(note['keywords'])}\n\n")
+        f.write(f"**摘要：** {note.get('summary', '')}\n\n")
+        f.write("**原文內容：**\n")
+        f.write(f"{note.get('content', '')}\n\n---\n")
+        count += 1
+    return count
+
+
+def write_jsonl(notes: Iterable[dict], f: TextIO) -> int:
+    count = 0
+    for note in notes:
+        f.write(json.dumps({col: note.get(col) for col in EXPORT_COLUMNS}, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    fields = []
+    for col in EXPORT_COLUMNS:
+        if col in ("keywords", "media"):
+            fields.append(pa.field(col, pa.list_(pa.string())))
+        elif col == "created_at":
+            fields.append(pa.field(col, pa.float64()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def _iter_batches(notes: Iterable[dict], schema, batch_size: int = ARROW_BATCH) -> Iterator:
+    import pyarrow as pa
+
+    batch = []
+    for note in notes:
+        batch.append({col: note.get(col) for col in EXPORT_COLUMNS})
+        if len(batch) >= batch_size:
+            yield pa.RecordBatch.from_pylist(batch, schema=schema)
+            batch = []
+    if batch:
+        yield pa.RecordBatch.from_pylist(batch, schema=schema)
+
+
+def write_columnar(notes: Iterable[dict], path: str, fmt: str) -> int:
+    """
+    以批次寫出 Parquet 或 Arrow IPC 檔，一次只在記憶體保留 ARROW_BATCH 筆。
+    """
+    try:
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet / Arrow 匯出需要安裝 pyarrow") from e
+
+    schema = _arrow_schema()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pyarrow.ipc.new_file(path, schema)
+    count = 0
+    with writer:
+        for batch in _iter_batches(notes, schema):
+            if fmt == "parquet":
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            count += batch.num_rows
+    return count
+
+
+def export_notes(notes: Iterable[dict], path: str, fmt: str = "markdown", append: bool = False) -> int:
+    """
+    把 notes 匯出到 path，回傳匯出筆數。
+    append=True 時 markdown / jsonl 附加在檔尾；parquet / arrow 不能附加，請改用 export_store 的增量模式。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支援的匯出格式：{fmt} (可用：{', '.join(FORMATS)})")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    if append:
+        if fmt not in ("markdown", "jsonl"):
+            raise ValueError(f"{fmt} 不支援附加寫入")
+        with open(path, "a", encoding="utf-8") as f:
+            return (write_markdown if fmt == "markdown" else write_jsonl)(notes, f)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    os.close(fd)
+    try:
+        if fmt in ("markdown", "jsonl"):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                count = (write_markdown if fmt == "markdown" else write_jsonl)(notes, f)
+        else:
+            count = write_columnar(notes, tmp_path, fmt)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def _read_checkpoint(path: str) -> dict:
+    try:
+        with open(path + ".checkpoint", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"rowid": 0, "parts": 0}
+
+
+def _write_checkpoint(path: str, checkpoint: dict) -> None:
+    tmp_path = path + ".checkpoint.part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path + ".checkpoint")
+
+
+def export_store(
+    store: NoteStore,
+    path: str,
+    fmt: str = "markdown",
+    incremental: bool = False,
+    ids: Optional[set] = None,
+) -> dict:
+    """
+    從筆記庫串流匯出，回傳 {"path": 實際寫入的檔案, "count": 筆數}。
+      - ids：只匯出這些筆記 (例如目前篩選結果)
+      - incremental：只匯出上次增量匯出後新寫入的筆記 (依 rowid)，
+        markdown / jsonl 附加到 path，parquet / arrow 另寫一個分段檔；不能和 ids 同時使用
+    """
+    if incremental and ids is not None:
+        raise ValueError("增量匯出會涵蓋所有新筆記，不能同時指定 ids")
+    checkpoint = _read_checkpoint(path) if incremental else None
+    until_rowid = store.version()[1]
+    notes = store.iter_notes(
+        after_rowid=checkpoint["rowid"] if checkpoint else 0,
+        until_rowid=until_rowid,
+    )
+    if ids is not None:
+        notes = (note for note in notes if note["id"] in ids)
+
+    target = path
+    if incremental and fmt not in ("markdown", "jsonl"):
+        base, ext = os.path.splitext(path)
+        target = f"{base}.{checkpoint['parts'] + 1:05d}{ext}"
+    count = export_notes(notes, target, fmt, append=incremental and fmt in ("markdown", "jsonl"))
+
+    if incremental:
+        if count and target != path:
+            checkpoint["parts"] += 1
+        elif not count and target != path and os.path.exists(target):
+            os.remove(target)  # 沒有新筆記就不留空的分段檔
+            target = None
+        checkpoint["rowid"] = until_rowid
+        _write_checkpoint(path, checkpoint)
+    return {"path": target, "count": count}
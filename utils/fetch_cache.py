@@ -0,0 +1,237 @@
+# utils/fetch_cache.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from contextlib import closing
+from typing import Callable, Optional
+
+import requests
+
+from utils.metrics import incr
+
+# ------------------------------------------------------------------------
+# 內容定址的下載快取：
+#   - 檔案以內容 SHA-256 命名 (objects/ab/abcdef....jpg)，相同內容只存一份
+#   - 索引存在 SQLite (WAL)，多個 Streamlit session / worker 行程可共用
+#   - 有 ETag / Last-Modified 時用條件式請求重新驗證，沒變就只花一個 304
+#   - 超過位元組上限時，依最後存取時間 (LRU) 淘汰
+#   - 可限制單檔大小 (max_size) 並依開頭位元組判斷型別 (sniff)，不合就中途放棄
+# ------------------------------------------------------------------------
+CACHE_ROOT = os.environ.get(
+    "INSTANOTE_FETCH_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "url_fetch", "cache"),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("INSTANOTE_FETCH_CACHE_BYTES", 2 * 1024 ** 3))
+CHUNK_SIZE = 1024 * 1024
+SNIFF_BYTES = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url           TEXT PRIMARY KEY,
+    sha256        TEXT NOT NULL,
+    path          TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    content_type  TEXT,
+    encoding      TEXT,
+    last_access   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access);
+CREATE INDEX IF NOT EXISTS entries_path ON entries(path);
+"""
+
+
+class FetchRejected(Exception):
+    """
+    內容超過大小上限或型別不符，下載已中止 (不會寫入快取)。
+    """
+
+
+class FetchCache:
+    """
+    以網址為索引、以內容雜湊為檔名的磁碟快取。
+    fetch() 回傳 dict：path / sha256 / size / content_type / encoding / status
+    （status 為 "hit"＝304 沿用、"miss"＝重新下載）。
+
+    max_size：超過此位元組數就丟出 FetchRejected (先看 Content-Length，下載中也會檢查)。
+    sniff(head, content_type) -> ext：以內容開頭判斷真正的副檔名，不接受就丟出 FetchRejected；
+    有給 sniff 時會取代 ext。
+    """
+
+    def __init__(self, root: str = CACHE_ROOT, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _lookup(self, conn: sqlite3.Connection, url: str):
+        row = conn.execute("SELECT * FROM entries WHERE url = ?", (url,)).fetchone()
+        # 檔案可能已被其他行程淘汰，視同沒有快取
+        if row is not None and not os.path.exists(os.path.join(self.root, row["path"])):
+            return None
+        return row
+
+    def fetch(
+        self,
+        url: str,
+        session: requests.Session,
+        timeout: int = 10,
+        ext: str = "",
+        max_size: Optional[int] = None,
+        sniff: Optional[Callable[[bytes, str], str]] = None,
+    ) -> dict:
+        """
+        取得 url 的內容：有快取就帶條件式標頭重新驗證，否則完整下載並寫入快取。
+        """
+        with closing(self._connect()) as conn:
+            row = self._lookup(conn, url)
+
+        headers = {}
+        if row is not None:
+            if row["etag"]:
+                headers["If-None-Match"] = row["etag"]
+            if row["last_modified"]:
+                headers["If-Modified-Since"] = row["last_modified"]
+
+        r = session.get(url, stream=True, timeout=timeout, headers=headers)
+        try:
+            if r.status_code == 304 and row is not None:
+                if max_size is not None and row["size"] > max_size:
+                    raise FetchRejected(f"{url}: {row['size']} bytes exceeds {max_size}")
+                with closing(self._connect()) as conn, conn:
+                    conn.execute(
+                        "UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url)
+                    )
+                return self._result(row, "hit")
+            r.raise_for_status()
+            length = r.headers.get("Content-Length", "")
+            if max_size is not None and length.isdigit() and int(length) > max_size:
+                raise FetchRejected(f"{url}: Content-Length {length} exceeds {max_size}")
+            sha256, rel_path, size = self._store_body(r, ext, max_size, sniff)
+            # 只有頁面需要記住編碼，沿用 requests 依 Content-Type 判斷的結果
+            encoding = r.encoding if ext == ".html" else None
+        finally:
+            r.close()
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(url, sha256, path, size, etag, last_modified, content_type, encoding, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url, sha256, rel_path, size,
+                    r.headers.get("ETag"), r.headers.get("Last-Modified"),
+                    r.headers.get("Content-Type"), encoding, time.time(),
+                ),
+            )
+            self._evict(conn, keep=url)
+            row = self._lookup(conn, url)
+        return self._result(row, "miss")
+
+    def _result(self, row: sqlite3.Row, status: str) -> dict:
+        incr(f"fetch_cache.{status}")
+        return {
+            "path": os.path.join(self.root, row["path"]),
+            "sha256": row["sha256"],
+            "size": row["size"],
+            "content_type": row["content_type"],
+            "encoding": row["encoding"],
+            "status": status,
+        }
+
+    def _store_body(
+        self,
+        r: requests.Response,
+        ext: str,
+        max_size: Optional[int] = None,
+        sniff: Optional[Callable[[bytes, str], str]] = None,
+    ) -> tuple:
+        """
+        以大區塊邊下載邊算雜湊寫入暫存檔，完成後以 os.replace 原子地搬到內容定址的位置。
+        有 sniff 時先湊滿 SNIFF_BYTES 判斷型別；超過 max_size 立刻中止。
+        """
+        digest = hashlib.sha256()
+        size = 0
+        head = b"" if sniff is not None else None
+        content_type = r.headers.get("Content-Type", "")
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise FetchRejected(f"{r.url}: body exceeds {max_size} bytes")
+                    if head is not None:
+                        head += chunk
+                        if len(head) < SNIFF_BYTES:
+                            continue
+                        ext, chunk, head = sniff(head, content_type), head, None
+                    digest.update(chunk)
+                    f.write(chunk)
+                if head is not None:  # 整個內容比 SNIFF_BYTES 還短
+                    ext = sniff(head, content_type)
+                    digest.update(head)
+                    f.write(head)
+            sha256 = digest.hexdigest()
+            rel_path = os.path.join("objects", sha256[:2], sha256 + ext)
+            final_path = os.path.join(self.root, rel_path)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return sha256, rel_path, size
+
+    def _evict(self, conn: sqlite3.Connection, keep: str = "") -> None:
+        """
+        總大小超過 max_bytes 時，從最久沒用到的網址開始刪，直到回到上限以內。
+        同一個檔案若還有其他網址引用，就只刪索引不刪檔；keep 指定的網址不刪。
+        """
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY path)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in conn.execute("SELECT url, path, size FROM entries ORDER BY last_access").fetchall():
+            if row["url"] == keep:
+                continue
+            conn.execute("DELETE FROM entries WHERE url = ?", (row["url"],))
+            if conn.execute("SELECT 1 FROM entries WHERE path = ?", (row["path"],)).fetchone():
+                continue
+            try:
+                os.remove(os.path.join(self.root, row["path"]))
+            except FileNotFoundError:
+                pass
+            total -= row["size"]
+            if total <= self.max_bytes:
+                break
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> FetchCache:
+    """
+    回傳行程內共用的 FetchCache，第一次呼叫時才建立。
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FetchCache()
+    return _cache
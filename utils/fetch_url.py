@@ -2,96 +2,573 @@
 
 import os
 import re
+import shutil
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+from urllib.parse import urldefrag, urljoin, urlparse
+import tempfile
+
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import tempfile
 
-def fetch_page_html(url: str, timeout: int = 10) -> str:
+from utils.fetch_cache import FetchRejected, get_cache
+from utils.metrics import incr, span, timed
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------
+# 共用連線池：所有頁面、圖片、音訊請求都走同一個 Session，重複使用 TCP/TLS 連線
+# ------------------------------------------------------------------------
+POOL_SIZE = 32
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    回傳行程內共用的 requests.Session（含連線池），第一次呼叫時才建立。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+class HostLimiter:
+    """
+    限制同一個主機 (host) 同時進行中的請求數，避免對單一網站送出過多連線。
+    """
+
+    def __init__(self, per_host: int = 4):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.BoundedSemaphore(self.per_host)
+        with sem:
+            yield
+
+
+# 沒有另外指定 limiter 的單次呼叫共用這一個
+host_limiter = HostLimiter()
+
+
+def fetch_page_html(url: str, timeout: int = 10, limiter: Optional[HostLimiter] = None) -> str:
     """
     使用 requests 抓取完整 HTML。
     若需處理防爬蟲（如 Cloudflare），可再考慮 Selenium 或 cloudscraper。
+    頁面會經過磁碟快取，重複抓取時只需一個條件式請求 (304)。
+    limiter 為 None 時用模組共用的 host_limiter。
     """
-    resp = requests.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
-    resp.raise_for_status()
-    return resp.text
+    with span("fetch.html") as s:
+        with (limiter or host_limiter).slot(url):
+            entry = get_cache().fetch(url, get_session(), timeout=timeout, ext=".html")
+        with open(entry["path"], "rb") as f:
+            data = f.read()
+        s.size = len(data)
+    return data.decode(entry["encoding"] or "utf-8", errors="replace")
+
+# ------------------------------------------------------------------------
+# 單次解析：一份 HTML 只建一次 BeautifulSoup 樹，同時取出標題、可見文字與多媒體網址
+# ------------------------------------------------------------------------
+IMAGE_EXTS = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"]
+AUDIO_EXTS = [".mp3", ".wav", ".ogg", ".aac", ".flac", ".m4a"]
+
+# 文字擷取模式："main" 只留正文 (判斷不出來時退回全文)，"full" 保留所有可見文字。
+# parse_page 等函式預設 "full"；匯入流程 (ingest.fetch_page) 才依 INSTANOTE_EXTRACT_MODE，預設 "main"
+EXTRACT_MODES = ("main", "full")
+EXTRACT_MODE = os.environ.get("INSTANOTE_EXTRACT_MODE", "main")
+
 
-def extract_visible_text(html: str) -> str:
+def _clean_lines(text: str) -> str:
+    # 簡單去掉多餘空行
+    lines = [line.strip() for line in text.splitlines()]
+    return "\n".join([line for line in lines if line])
+
+
+@timed("parse.html", size=lambda html, *args, **kwargs: len(html))
+def parse_page(html: str, base_url: str = "", mode: str = "full") -> dict:
     """
-    用 BeautifulSoup 取出 <body> 裡主要可見文字 (去掉 <script>, <style> 等)。
+    只解析一次 HTML，回傳：
+      {"title": str, "text": str, "image_urls": list[str], "audio_urls": list[str], "extracted": str}
+    有給 base_url 時，多媒體的相對路徑會補成絕對網址。
+    mode="main" 時只留正文；extracted 為實際採用的模式 ("main" 或退回的 "full")。
     """
+    if mode not in EXTRACT_MODES:
+        raise ValueError(f"未知的擷取模式：{mode}（可用：{', '.join(EXTRACT_MODES)}）")
     soup = BeautifulSoup(html, "lxml")
+
+    title_tag = soup.find("title")
+    title = title_tag.get_text().strip() if title_tag else ""
+
+    # 多媒體網址要在移除 <noscript> 等標籤之前先收集
+    image_urls = []
+    for img in soup.find_all("img"):
+        src = img.get("src") or img.get("data-src") or ""
+        if src:
+            image_urls.append(urljoin(base_url, src))
+    audio_urls = []
+    for tag in soup.find_all(["audio", "source"]):
+        src = tag.get("src") or ""
+        if src:
+            audio_urls.append(urljoin(base_url, src))
+
     # 移除 script/style
     for tag in soup(["script", "style", "noscript"]):
         tag.decompose()
-    visible_text = soup.get_text(separator="\n")
-    # 簡單去掉多餘空行
-    lines = [line.strip() for line in visible_text.splitlines()]
-    return "\n".join([line for line in lines if line])
+    text = _clean_lines(soup.get_text(separator="\n"))
+    extracted = "full"
+    if mode == "main":
+        main_text = extract_main_text(soup, full_chars=len(text))
+        if main_text:
+            text, extracted = main_text, "main"
+        else:
+            incr("extract.fallback")
+
+    return {
+        "title": title,
+        "text": text,
+        "image_urls": image_urls,
+        "audio_urls": audio_urls,
+        "extracted": extracted,
+    }
+
+
+def extract_visible_text(html: str, mode: str = "full") -> str:
+    """
+    用 BeautifulSoup 取出 <body> 裡主要可見文字 (去掉 <script>, <style> 等)。
+    mode="main" 時只取正文。
+    """
+    return parse_page(html, mode=mode)["text"]
 
 def extract_title(html: str) -> str:
     """
     取出 <title> 標籤內容，若沒有則回空字串。
     """
-    soup = BeautifulSoup(html, "lxml")
-    title_tag = soup.find("title")
-    return title_tag.get_text().strip() if title_tag else ""
+    return parse_page(html, mode="full")["title"]
+
+
+# ------------------------------------------------------------------------
+# 正文擷取：以文字密度與連結密度為 DOM 節點評分，只留下文章 / 貼文本體，
+# 去掉導覽列、頁尾、cookie 橫幅、留言區與「相關文章」，減少送進 mT5 / XLM-R 的字數
+#   1) class/id 或標籤名明顯是樣板的區塊 (nav、footer、comment、cookie……) 整塊不評分
+#   2) 每個段落 (p/pre/blockquote/td，或直接含長文字的 div) 依長度與標點得分，
+#      加到父節點 (全額) 與祖父節點 (一半)
+#   3) 候選節點依 class/id 與標籤名加減分，乘上 (1 - 連結密度)，取最高分者；
+#      分數夠高的兄弟節點 (多則貼文並列的頁面) 一併保留
+#   4) 剪掉選中區塊裡連結密集或樣板類的子區塊 (相關文章、標籤、分享按鈕)
+#   5) 正文太短或只佔全頁極小比例時視為沒把握，回傳 None 由呼叫端退回全文
+# ------------------------------------------------------------------------
+MAIN_MIN_CHARS = 200      # 正文少於這麼多字就退回全文
+MAIN_MIN_RATIO = 0.05     # 正文佔全頁可見文字的比例低於此值也退回全文
+PARAGRAPH_MIN_CHARS = 25
+
+_PARAGRAPH_TAGS = {"p", "pre", "blockquote", "td"}
+_TEXT_BLOCK_TAGS = {"div", "section", "article", "main"}
+_BOILERPLATE_TAGS = {"nav", "aside", "footer", "form", "button", "select", "dialog", "menu"}
+_PRUNE_TAGS = {"div", "section", "ul", "ol", "dl", "table", "header"}
+_KEEP_TAGS = {"html", "body", "article", "main"}
+_TAG_WEIGHTS = {
+    "article": 10, "main": 10, "div": 5, "section": 3, "pre": 3, "td": 3, "blockquote": 3,
+    "ul": -3, "ol": -3, "dl": -3, "li": -3, "form": -3,
+    "header": -5, "th": -5, "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5,
+}
+# 看到就整塊略過；弱樣板字眼 (sidebar、footer……) 只有在沒有正文字眼時才略過
+_STRONG_NEGATIVE_RE = re.compile(
+    r"comment|cookie|consent|gdpr|related|recommend|share|sharing|social|subscribe|newsletter|"
+    r"popup|modal|breadcrumb|advert|sponsor|\bads?\b|promo",
+    re.I,
+)
+_NEGATIVE_RE = re.compile(
+    r"sidebar|side-bar|widget|footer|footnote|masthead|\bnav|navbar|menu|banner|pagination|pager|"
+    r"\btags?\b|login|signup|toolbar",
+    re.I,
+)
+_POSITIVE_RE = re.compile(r"article|\bbody|content|entry|\bmain|\bpost|\btext|blog|story|hentry", re.I)
+_PUNCT_RE = re.compile(r"[,，、。；;！？!?]")
+
+
+def _class_id(tag) -> str:
+    classes = tag.get("class") or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return " ".join(classes) + " " + (tag.get("id") or "")
+
+
+def _is_boilerplate(tag) -> bool:
+    if tag.name in _KEEP_TAGS:
+        return False
+    if tag.name in _BOILERPLATE_TAGS:
+        return True
+    if tag.get("aria-hidden") == "true" or tag.has_attr("hidden"):
+        return True
+    names = _class_id(tag)
+    if _STRONG_NEGATIVE_RE.search(names):
+        return True
+    return bool(_NEGATIVE_RE.search(names)) and not _POSITIVE_RE.search(names)
+
+
+def _initial_score(tag) -> float:
+    score = _TAG_WEIGHTS.get(tag.name, 0)
+    names = _class_id(tag)
+    if _POSITIVE_RE.search(names):
+        score += 25
+    if _NEGATIVE_RE.search(names) or _STRONG_NEGATIVE_RE.search(names):
+        score -= 25
+    return score
+
+
+def _text_stats(tags: list) -> dict:
+    """
+    由內而外算出每個節點的 [文字長度, 連結文字長度, 直屬文字長度]，以 id(tag) 為鍵。
+    find_all 是文件順序，反過來走就一定先算完子節點。
+    """
+    from bs4.element import NavigableString, PreformattedString, Tag
+
+    stats = {}
+    for tag in reversed(tags):
+        text_len = link_len = own_len = 0
+        for child in tag.children:
+            if isinstance(child, Tag):
+                child_stats = stats[id(child)]
+                text_len += child_stats[0]
+                link_len += child_stats[1]
+            elif isinstance(child, NavigableString) and not isinstance(child, PreformattedString):
+                n = len(child.strip())
+                text_len += n
+                own_len += n
+        if tag.name == "a":
+            link_len = text_len
+        stats[id(tag)] = [text_len, link_len, own_len]
+    return stats
+
+
+def extract_main_text(soup, full_chars: int = 0) -> Optional[str]:
+    """
+    從已移除 script/style 的 BeautifulSoup 樹取出正文 (會修改 soup)；
+    沒把握時回傳 None。full_chars 為全文字數，用來判斷正文比例是否過低。
+    """
+    tags = soup.find_all(True)
+    if not tags:
+        return None
+    stats = _text_stats(tags)
+
+    def link_density(tag) -> float:
+        text_len, link_len, _ = stats[id(tag)]
+        return link_len / text_len if text_len else 0.0
+
+    # 樣板區塊 (含其子孫) 不評分；文件順序保證父節點先判斷
+    excluded = set()
+    for tag in tags:
+        if id(tag.parent) in excluded or _is_boilerplate(tag):
+            excluded.add(id(tag))
+
+    scores, candidates = {}, {}
+    for tag in tags:
+        if id(tag) in excluded:
+            continue
+        text_len, _, own_len = stats[id(tag)]
+        if tag.name in _PARAGRAPH_TAGS:
+            text = tag.get_text()
+        elif tag.name in _TEXT_BLOCK_TAGS and own_len >= PARAGRAPH_MIN_CHARS:
+            # 直接把文字放在 div 裡 (以 <br> 分行) 的頁面，只算直屬文字
+            text = "".join(tag.find_all(string=True, recursive=False))
+            text_len = own_len
+        else:
+            continue
+        if text_len < PARAGRAPH_MIN_CHARS:
+            continue
+        score = (1 + len(_PUNCT_RE.findall(text)) + min(text_len / 100, 3)) * (1 - link_density(tag))
+        for level, ancestor in enumerate((tag.parent, tag.parent.parent if tag.parent else None)):
+            if ancestor is None or ancestor.name == "[document]":
+                break
+            if id(ancestor) not in scores:
+                scores[id(ancestor)] = _initial_score(ancestor)
+                candidates[id(ancestor)] = ancestor
+            scores[id(ancestor)] += score / (level + 1)
+
+    if not scores:
+        return None
+    for key, tag in candidates.items():
+        scores[key] *= 1 - link_density(tag)
+    top_key = max(scores, key=scores.get)
+    top, top_score = candidates[top_key], scores[top_key]
+
+    selected = [top]
+    if top.parent is not None and top.name not in ("html", "body"):
+        threshold = max(10, top_score * 0.2)
+        top_class = _class_id(top).strip()
+        selected = []
+        for sibling in top.parent.find_all(True, recursive=False):
+            if sibling is top:
+                selected.append(sibling)
+                continue
+            if id(sibling) in excluded:
+                continue
+            score = scores.get(id(sibling), 0)
+            if top_class and _class_id(sibling).strip() == top_class:
+                score += top_score * 0.2
+            text_len = stats[id(sibling)][0]
+            if score >= threshold or (
+                sibling.name == "p" and text_len > 80 and link_density(sibling) < 0.25
+            ):
+                selected.append(sibling)
+
+    lines = []
+    for node in selected:
+        # 文件順序走訪，父節點已被剪掉的就不必再看 (tag.decomposed 在 bs4 裡會觸發子樹搜尋，很慢)
+        removed, outermost = set(), []
+        for tag in node.find_all(True):
+            if id(tag.parent) in removed:
+                removed.add(id(tag))
+                continue
+            density = link_density(tag)
+            if id(tag) in excluded or (
+                tag.name in _PRUNE_TAGS
+                and (density > 0.5 or (density > 0.25 and stats[id(tag)][0] < 200))
+            ):
+                removed.add(id(tag))
+                outermost.append(tag)
+        for tag in outermost:
+            tag.decompose()
+        lines.append(_clean_lines(node.get_text(separator="\n")))
+    text = "\n".join(line for line in lines if line)
+
+    if len(text) < MAIN_MIN_CHARS or (full_chars and len(text) < full_chars * MAIN_MIN_RATIO):
+        return None
+    return text
+
+
+# ------------------------------------------------------------------------
+# 多媒體下載：
+#   - 以 Content-Type 與檔頭 magic bytes 判斷真正型別 (不信任網址副檔名)
+#   - 單檔與整頁都有位元組上限，超過就中途放棄，不拖慢整批
+#   - 同一頁內以網址 (去掉 #fragment) 與內容雜湊去重
+#   - 同一頁的檔案以 MEDIA_WORKERS 條執行緒同時下載，仍受 host limiter 與整頁額度限制
+# ------------------------------------------------------------------------
+MAX_FILE_BYTES = {"image": 20 * 1024 ** 2, "audio": 200 * 1024 ** 2}
+MAX_PAGE_MEDIA_BYTES = 300 * 1024 ** 2
+MEDIA_WORKERS = int(os.environ.get("INSTANOTE_MEDIA_WORKERS", 4))
+
+_CONTENT_TYPES = {
+    "image": {
+        "image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif",
+        "image/bmp": ".bmp", "image/webp": ".webp",
+    },
+    "audio": {
+        "audio/mpeg": ".mp3", "audio/mp3": ".mp3", "audio/wav": ".wav", "audio/x-wav": ".wav",
+        "audio/ogg": ".ogg", "audio/aac": ".aac", "audio/flac": ".flac", "audio/x-flac": ".flac",
+        "audio/mp4": ".m4a", "audio/x-m4a": ".m4a",
+    },
+}
+
+
+def _magic_ext(head: bytes) -> str:
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head.startswith(b"BM"):
+        return ".bmp"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return ".webp"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return ".wav"
+    if head.startswith(b"ID3"):
+        return ".mp3"
+    if head.startswith(b"OggS"):
+        return ".ogg"
+    if head.startswith(b"fLaC"):
+        return ".flac"
+    if head[4:8] == b"ftyp":
+        return ".m4a"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0:
+        return ".aac"   # ADTS (要先於 MP3 frame sync 判斷)
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return ".mp3"
+    return ""
+
+
+def sniff_media_type(head: bytes, content_type: str, kind: str) -> str:
+    """
+    依檔頭判斷副檔名，判斷不出來才參考 Content-Type；不是 kind (image/audio) 就拒收。
+    """
+    exts = IMAGE_EXTS if kind == "image" else AUDIO_EXTS
+    ext = _magic_ext(head)
+    if ext in exts:
+        return ext
+    if not ext:
+        mime = content_type.split(";")[0].strip().lower()
+        ext = _CONTENT_TYPES[kind].get(mime, "")
+        if ext:
+            return ext
+    raise FetchRejected(f"not {kind}: magic={head[:8]!r} content-type={content_type!r}")
+
+
+class ByteBudget:
+    """
+    一個頁面所有多媒體共用的位元組額度。
+    同時下載時每個檔案先 reserve() 預留單檔上限，下載完再 settle() 退回沒用到的部分，
+    所以總量不會超過額度。
+    """
+
+    def __init__(self, total: int = MAX_PAGE_MEDIA_BYTES):
+        self.remaining = total
+        self._reserved = 0
+        self._cond = threading.Condition()
+
+    def reserve(self, size: int) -> int:
+        """
+        預留至多 size 位元組，回傳實際預留的量。額度暫時都被其他下載預留時先等它們結算，
+        真的用完才回傳 0。
+        """
+        with self._cond:
+            while self.remaining <= 0 and self._reserved > 0:
+                self._cond.wait()
+            taken = max(0, min(size, self.remaining))
+            self.remaining -= taken
+            self._reserved += taken
+            return taken
+
+    def settle(self, reserved: int, used: int) -> None:
+        with self._cond:
+            self._reserved -= reserved
+            self.remaining += reserved - used
+            self._cond.notify_all()
+
+
+def _place(src: str, dst: str) -> None:
+    """
+    把快取檔放到 dst：優先用硬連結，不行才複製到暫存檔再 os.replace，兩者都是原子的。
+    """
+    if os.path.exists(dst):
+        return
+    try:
+        os.link(src, dst)
+        return
+    except FileExistsError:
+        return
+    except OSError:
+        pass
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dst), suffix=".part")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _download(
+    url: str, save_dir: str, kind: str, budget: ByteBudget, limiter: Optional[HostLimiter] = None,
+) -> Optional[dict]:
+    """
+    經由快取下載單一檔案，再以內容雜湊為檔名放進 save_dir，
+    不同網址的檔案不會互相覆蓋，相同內容也只會有一份。整頁額度已用完時回傳 None。
+    """
+    limit = budget.reserve(MAX_FILE_BYTES[kind])
+    if limit <= 0:
+        return None
+    used = 0
+    try:
+        with (limiter or host_limiter).slot(url):
+            entry = get_cache().fetch(
+                url, get_session(), timeout=10, max_size=limit,
+                sniff=functools.partial(sniff_media_type, kind=kind),
+            )
+        used = entry["size"]
+    finally:
+        budget.settle(limit, used)
+    ext = os.path.splitext(entry["path"])[1]
+    fpath = os.path.join(save_dir, entry["sha256"][:16] + ext)
+    _place(entry["path"], fpath)
+    return {"path": fpath, "sha256": entry["sha256"]}
+
+
+def _download_many(
+    urls: list[str], save_dir: str, kind: str, budget: Optional[ByteBudget], limiter: Optional[HostLimiter] = None,
+) -> list[str]:
+    budget = budget or ByteBudget()
+    unique = list(dict.fromkeys(urldefrag(u)[0] for u in urls))
+    if not unique:
+        return []
+
+    def download(url: str):
+        # 回傳 entry；額度用完為 None，下載失敗或被拒收為 False
+        try:
+            return _download(url, save_dir, kind, budget, limiter)
+        except FetchRejected as e:
+            logger.info("skipped %s: %s", kind, e)
+        except Exception as e:
+            logger.warning("failed to download %s %s: %s", kind, url, e)
+        return False
+
+    # 結果依原本的網址順序取回，內容去重時保留的是頁面上較早出現的那一個
+    saved, seen_hashes, over_budget = [], set(), 0
+    with ThreadPoolExecutor(max_workers=min(MEDIA_WORKERS, len(unique))) as pool:
+        for entry in pool.map(download, unique):
+            if entry is None:
+                over_budget += 1
+            elif entry and entry["sha256"] not in seen_hashes:
+                seen_hashes.add(entry["sha256"])
+                saved.append(entry["path"])
+    if over_budget:
+        logger.info("page media budget exhausted, skipped %d %s", over_budget, kind)
+    return saved
+
+
+def download_images(
+    image_urls: list[str], save_dir: str, budget: Optional[ByteBudget] = None, limiter: Optional[HostLimiter] = None,
+) -> list[str]:
+    """
+    下載 parse_page() 取得的圖片網址到 save_dir，回傳成功下載 (且內容不重複) 的檔案路徑。
+    budget 可與同頁的 download_audio 共用；limiter 為 None 時用模組共用的 host_limiter。
+    """
+    return _download_many(image_urls, save_dir, "image", budget, limiter)
+
+
+def download_audio(
+    audio_urls: list[str], save_dir: str, budget: Optional[ByteBudget] = None, limiter: Optional[HostLimiter] = None,
+) -> list[str]:
+    """
+    下載 parse_page() 取得的音訊網址到 save_dir，回傳成功下載 (且內容不重複) 的檔案路徑。
+    """
+    return _download_many(audio_urls, save_dir, "audio", budget, limiter)
+
 
 def download_all_images(html: str, base_url: str, save_dir: str) -> list[str]:
     """
     從 <img> 標籤抓出所有 src，下載到 save_dir 資料夾並回傳檔名清單。
     save_dir 必須已存在 (或自行先 os.makedirs(save_dir, exist_ok=True))。
     """
-    soup = BeautifulSoup(html, "lxml")
-    img_tags = soup.find_all("img")
-    saved_files = []
-    for idx, img in enumerate(img_tags):
-        src = img.get("src") or img.get("data-src") or ""
-        if not src:
-            continue
-        # 針對相對路徑加上 base_url
-        img_url = urljoin(base_url, src)
-        try:
-            r = requests.get(img_url, stream=True, timeout=10)
-            r.raise_for_status()
-            ext = os.path.splitext(img_url)[-1].split("?")[0]
-            if ext.lower() not in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"]:
-                ext = ".jpg"
-            fname = f"image_{idx}{ext}"
-            fpath = os.path.join(save_dir, fname)
-            with open(fpath, "wb") as f:
-                for chunk in r.iter_content(1024):
-                    f.write(chunk)
-            saved_files.append(fpath)
-        except Exception:
-            continue
-    return saved_files
+    return download_images(parse_page(html, base_url, mode="full")["image_urls"], save_dir)
 
 def download_all_audio(html: str, base_url: str, save_dir: str) -> list[str]:
     """
     從 <audio> 或 <source> 標籤抓音訊檔 URL 下載到本地。回傳檔案路徑清單。
     """
-    soup = BeautifulSoup(html, "lxml")
-    audio_files = []
-    # 找 <audio src="…"> 或 <source src="…">
-    tags = soup.find_all(["audio", "source"])
-    for idx, tag in enumerate(tags):
-        src = tag.get("src") or ""
-        if not src:
-            continue
-        audio_url = urljoin(base_url, src)
-        try:
-            r = requests.get(audio_url, stream=True, timeout=10)
-            r.raise_for_status()
-            ext = os.path.splitext(audio_url)[-1].split("?")[0]
-            if ext.lower() not in [".mp3", ".wav", ".ogg", ".aac", ".flac"]:
-                ext = ".mp3"
-            fname = f"audio_{idx}{ext}"
-            fpath = os.path.join(save_dir, fname)
-            with open(fpath, "wb") as f:
-                for chunk in r.iter_content(1024):
-                    f.write(chunk)
-            audio_files.append(fpath)
-        except Exception:
-            continue
-    return audio_files
+    return download_audio(parse_page(html, base_url, mode="full")["audio_urls"], save_dir)
@@ -1,99 +1,351 @@
 # utils/gpt.py
 
-import streamlit as st
-from typing import Tuple, List
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+import os
+import threading
+import numpy as np
+from typing import Tuple, List, Optional, Iterator, Dict
+
+from utils._compat import cache_data
+from utils.keyword_index import extract_keywords
+from utils.inference import backend_for, load_model
+from utils.metrics import span
+from utils.models import register_model
+
+# transformers / torch 匯入很慢，一律在模型第一次被用到時才在載入函式裡 import
+
+# 推論後端 (fp32 / int8 / onnx) 與本地模型資料夾見 utils/inference.py，
+# 例如 INSTANOTE_BACKEND_SUMMARIZER=int8、INSTANOTE_BACKEND_CLASSIFIER=onnx
+SUMMARIZER_MODEL = "google/mt5-base"
+CLASSIFIER_MODEL = "joeddav/xlm-roberta-large-xnli"
+
+
+def _pipeline_kwargs(backend: str) -> dict:
+    # ONNX Runtime 的模型不是 torch Module，交給 pipeline 自行判斷
+    return {} if backend == "onnx" else {"framework": "pt"}
 
 # ------------------------------------------------------------------------
 # 1) 多語言摘要：使用 mT5-base（支援中、英、日、韓……等 50+ 種語言）
 # ------------------------------------------------------------------------
-@st.cache_resource
-def load_multilang_summarizer():
+def build_summarizer(backend: Optional[str] = None):
     """
-    載入 mT5-base 模型，做多語系的摘要 (最多 100 tokens 左右)。
+    以指定後端 (預設依設定) 建立 mT5-base 摘要 pipeline (最多 100 tokens 左右)。
     """
-    model_name = "google/mt5-base"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    from transformers import pipeline
+
+    backend = backend or backend_for("summarizer")
+    tokenizer, model = load_model(SUMMARIZER_MODEL, "seq2seq", backend)
     return pipeline(
         "summarization",
         model=model,
         tokenizer=tokenizer,
-        framework="pt",
         # max_length、min_length 可以在呼叫時再進行微調
+        **_pipeline_kwargs(backend),
     )
 
+
+@register_model("summarizer")
+def load_multilang_summarizer():
+    return build_summarizer()
+
 # ------------------------------------------------------------------------
 # 2) 多語零樣本分類：使用 XLM-RoBERTa-large-xnli
 # ------------------------------------------------------------------------
-@st.cache_resource
-def load_multilang_classifier():
+def build_classifier(backend: Optional[str] = None):
     """
-    載入 xlm-roberta-large-xnli，做多語 zero-shot 分類。
+    以指定後端 (預設依設定) 建立 xlm-roberta-large-xnli 多語 zero-shot 分類 pipeline。
     """
-    model_name = "joeddav/xlm-roberta-large-xnli"
+    from transformers import pipeline
+
+    backend = backend or backend_for("classifier")
+    tokenizer, model = load_model(CLASSIFIER_MODEL, "sequence-classification", backend)
     return pipeline(
         "zero-shot-classification",
-        model=model_name,
-        tokenizer=model_name,
-        framework="pt",
+        model=model,
+        tokenizer=tokenizer,
+        **_pipeline_kwargs(backend),
     )
 
+
+@register_model("classifier")
+def load_multilang_classifier():
+    return build_classifier()
+
 # ------------------------------------------------------------------------
-# 3) 多語摘要＋分類 + 簡易關鍵字擷取
+# 2-1) 快速分類：每篇筆記只算一次句向量，和預先算好的標籤向量比餘弦相似度
+#      (XLM-R NLI 每個標籤都要跑一次大模型；這裡整批筆記只需一次小模型前向)
 # ------------------------------------------------------------------------
-@st.cache_data(show_spinner=False, max_entries=128, ttl=3600)
-def multilang_summarize_and_classify(text: str) -> Tuple[str, str, List[str]]:
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+LABEL_TEMPLATE = "這篇筆記的主題是「{}」"
+CLASSIFY_MODES = ("nli", "embedding")
+# nli：高準確度 (預設)；embedding：快速模式
+DEFAULT_CLASSIFY_MODE = os.environ.get("INSTANOTE_CLASSIFY_MODE", "nli")
+
+_label_vectors: Dict[str, np.ndarray] = {}
+_label_lock = threading.Lock()
+
+
+@register_model("embedder")
+def load_multilang_embedder():
     """
-    輸入任意語言的長文本 (text)，
-    1) 用 mT5-base 做摘要 (大約 100 tokens 左右)。
-    2) 用 xlm-roberta-large-xnli 做 zero-shot 分類 (多語支援)。
-    3) 用最簡易的方式 (統計摘要裡最常見的詞) 做關鍵字擷取，僅作示範。
+    載入多語句向量模型 (MiniLM)，回傳 (tokenizer, model)。
+    """
+    return load_model(EMBEDDING_MODEL, "feature-extraction", backend_for("embedder"))
 
-    回傳：
-      (summary: str, category: str, keywords: List[str])
+
+# 各模型的 Hub 名稱與種類 (python -m utils.inference prepare 依此下載)
+MODELS = {
+    "summarizer": (SUMMARIZER_MODEL, "seq2seq"),
+    "classifier": (CLASSIFIER_MODEL, "sequence-classification"),
+    "embedder": (EMBEDDING_MODEL, "feature-extraction"),
+}
+
+
+def embed_texts(texts: List[str], batch_size: int = 32, max_length: int = 256) -> np.ndarray:
     """
-    # --- 1. 摘要 ---
-    summarizer = load_multilang_summarizer()
+    把 texts 轉成 L2 正規化後的 float32 句向量 (mean pooling)，形狀為 (len(texts), dim)。
+    """
+    import torch
+
+    tokenizer, model = load_multilang_embedder()
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        enc = tokenizer(
+            texts[start:start + batch_size],
+            padding=True,
+            truncation=True,
+            max_length=max_length,
+            return_tensors="pt",
+        )
+        with torch.no_grad(), span("model.embed", size=int(enc["attention_mask"].sum())):
+            hidden = model(**enc).last_hidden_state
+        mask = enc["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        pooled = torch.nn.functional.normalize(pooled, dim=1)
+        vectors.append(pooled.cpu().numpy().astype(np.float32))
+    if not vectors:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+    return np.vstack(vectors)
+
+
+def get_label_vectors(labels: List[str]) -> np.ndarray:
+    """
+    取得標籤向量矩陣 (len(labels), dim)。每個標籤只在第一次出現時計算，
+    之後自訂新的標籤組合也只會補算沒見過的那幾個。
+    """
+    with _label_lock:
+        missing = [label for label in dict.fromkeys(labels) if label not in _label_vectors]
+        if missing:
+            vectors = embed_texts([LABEL_TEMPLATE.format(label) for label in missing])
+            _label_vectors.update(zip(missing, vectors))
+        return np.vstack([_label_vectors[label] for label in labels])
+
+
+def classify_by_embedding(texts: List[str], labels: Optional[List[str]] = None) -> List[str]:
+    """
+    以句向量的餘弦相似度分類：回傳每篇最接近的標籤。
+    """
+    labels = labels or CANDIDATE_LABELS
+    if not texts:
+        return []
+    scores = embed_texts(texts) @ get_label_vectors(labels).T
+    return [labels[j] for j in scores.argmax(axis=1)]
+
+
+# ------------------------------------------------------------------------
+# 3) 多語摘要＋分類 + 關鍵字擷取 (BM25，見 utils/keyword_index.py)
+# ------------------------------------------------------------------------
+# 你可以自行增減下面這些「主題標籤」
+CANDIDATE_LABELS = ["生活", "美食", "科技", "旅遊", "娛樂", "學習", "商業", "其他"]
+DEFAULT_BATCH_SIZE = 8
+
+
+def _set_num_threads(num_threads: Optional[int]) -> None:
+    """
+    CPU 推論時限制 PyTorch 使用的執行緒數 (None 表示維持預設)。
+    """
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+
+
+def _summarize_batch(summarizer, texts: List[str]) -> List[str]:
     try:
         # max_length=100：輸出在 100 tokens 左右；min_length=30：至少 30 tokens
-        result = summarizer(
-            text,
-            max_length=100,
-            min_length=30,
-            do_sample=False
-        )
-        summary_text = result[0]["summary_text"].strip()
+        with span("model.summarize", size=sum(map(len, texts))):
+            results = summarizer(
+                texts,
+                max_length=100,
+                min_length=30,
+                do_sample=False,
+                truncation=True,
+                batch_size=len(texts),
+            )
+        return [r["summary_text"].strip() for r in results]
     except Exception as e:
-        summary_text = f"❌ 摘要失敗：{e}"
+        if len(texts) == 1:
+            return [f"❌ 摘要失敗：{e}"]
+        # 整批失敗時逐筆重試，讓錯誤只落在出問題的那一筆
+        return [_summarize_batch(summarizer, [t])[0] for t in texts]
+
+
+# ------------------------------------------------------------------------
+# 長文摘要：依 token 切塊 → 各塊批次摘要 (map) → 合併部分摘要再摘要一次 (reduce)
+# ------------------------------------------------------------------------
+MAX_INPUT_TOKENS = 512  # mT5 一次能看的 token 數，超過就切塊
+
+
+def iter_token_chunks(text: str, tokenizer, max_tokens: int = MAX_INPUT_TOKENS) -> Iterator[str]:
+    """
+    以段落為單位逐段編碼，累積到 max_tokens 就產出一塊；單一段落過長時直接在 token 邊界切開。
+    每次只持有一塊的內容，不會一次把整篇文件編碼進記憶體。
+    """
+    # 保留一個位置給結尾的 </s>
+    limit = max_tokens - 1
+    buf: List[str] = []
+    used = 0
+    for para in text.splitlines():
+        ids = tokenizer.encode(para, add_special_tokens=False)
+        if not ids:
+            continue
+        # 段落間的換行也可能佔一個 token，保守起見一併計入
+        if buf and used + 1 + len(ids) > limit:
+            yield "\n".join(buf)
+            buf, used = [], 0
+        if len(ids) <= limit:
+            used += len(ids) + (1 if buf else 0)
+            buf.append(para)
+            continue
+        # 單一段落本身就超過上限：在 token 邊界切開
+        for start in range(0, len(ids), limit):
+            piece = ids[start:start + limit]
+            if len(piece) == limit:
+                yield tokenizer.decode(piece, skip_special_tokens=True)
+            else:
+                buf, used = [tokenizer.decode(piece, skip_special_tokens=True)], len(piece)
+    if buf:
+        yield "\n".join(buf)
+
+
+def _map_reduce_summarize(
+    summarizer,
+    texts: List[str],
+    batch_size: int,
+    max_tokens: int = MAX_INPUT_TOKENS,
+) -> List[str]:
+    """
+    短文直接摘要；長文切塊後與其他文件的塊一起依長度分批摘要，
+    同一篇的部分摘要依原順序串起來，若仍超過 max_tokens 再遞迴摘要一次。
+    """
+    tokenizer = summarizer.tokenizer
+    jobs = []  # (文件序號, 塊序號, 文字)
+    for i, text in enumerate(texts):
+        # 字元數低於上限時 token 數也一定低於上限，不必編碼就能直接摘要
+        if len(text) < max_tokens:
+            jobs.append((i, 0, text))
+        else:
+            jobs.extend((i, seq, chunk) for seq, chunk in enumerate(iter_token_chunks(text, tokenizer, max_tokens)))
+
+    jobs.sort(key=lambda job: len(job[2]))
+    partials: List[List[Tuple[int, str]]] = [[] for _ in texts]
+    for start in range(0, len(jobs), batch_size):
+        batch = jobs[start:start + batch_size]
+        outputs = _summarize_batch(summarizer, [chunk for _, _, chunk in batch])
+        for (i, seq, _), summary_text in zip(batch, outputs):
+            partials[i].append((seq, summary_text))
+
+    summaries = [""] * len(texts)
+    to_reduce = []
+    for i, parts in enumerate(partials):
+        parts.sort()
+        failed = [p for _, p in parts if p.startswith("❌")]
+        if failed:
+            summaries[i] = failed[0]
+        elif len(parts) == 1:
+            summaries[i] = parts[0][1]
+        elif parts:
+            to_reduce.append(i)
+
+    if to_reduce:
+        joined = ["\n".join(p for _, p in partials[i]) for i in to_reduce]
+        for i, summary_text in zip(to_reduce, _map_reduce_summarize(summarizer, joined, batch_size, max_tokens)):
+            summaries[i] = summary_text
+    return summaries
+
 
-    # --- 2. 分類 ---
-    classifier = load_multilang_classifier()
-    # 你可以自行增減下面這些「主題標籤」
-    candidate_labels = ["生活", "美食", "科技", "旅遊", "娛樂", "學習", "商業", "其他"]
+def _classify_batch(classifier, texts: List[str], labels: List[str]) -> List[str]:
     try:
-        cls_result = classifier(
-            text,
-            candidate_labels=candidate_labels,
-            multi_label=False  # 單選最可能的一個分類
-        )
-        top_label = cls_result["labels"][0]
+        with span("model.classify", size=sum(map(len, texts))):
+            results = classifier(
+                texts,
+                candidate_labels=labels,
+                multi_label=False,  # 單選最可能的一個分類
+                batch_size=len(texts),
+            )
+        if isinstance(results, dict):
+            results = [results]
+        return [r["labels"][0] for r in results]
     except Exception as e:
-        top_label = f"❌ 分類失敗：{e}"
-
-    # --- 3. 簡易關鍵字擷取（示範用，僅取 summary 裡最常見的 5 個詞） ---
-    from collections import Counter
-    import re
-
-    # 把 summary_text 轉成小寫，並切出所有「字詞」
-    words = re.findall(r"\b\w+\b", summary_text.lower())
-    # 這邊給出一個中英文混合的簡易停用詞列表，實務可自行擴充
-    stopwords = set([
-        "的", "了", "在", "是", "我", "也", "和", "就", "不", "有",
-        "the", "and", "to", "of", "in", "for", "with", "on", "that"
-    ])
-    filtered = [w for w in words if w not in stopwords and len(w) > 1]
-    most_common = [w for w, _ in Counter(filtered).most_common(5)]
-    keywords = most_common
-
-    return summary_text, top_label, keywords
+        if len(texts) == 1:
+            return [f"❌ 分類失敗：{e}"]
+        return [_classify_batch(classifier, [t], labels)[0] for t in texts]
+
+
+def _classify_texts(texts: List[str], labels: List[str], mode: str) -> List[str]:
+    """
+    依 mode 選擇分類引擎："nli" 走 XLM-R zero-shot，"embedding" 走句向量相似度。
+    """
+    if mode == "embedding":
+        try:
+            return classify_by_embedding(texts, labels)
+        except Exception as e:
+            return [f"❌ 分類失敗：{e}"] * len(texts)
+    return _classify_batch(load_multilang_classifier(), texts, labels)
+
+
+@cache_data(show_spinner=False, max_entries=128, ttl=3600)
+def multilang_summarize_and_classify_batch(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    num_threads: Optional[int] = None,
+    classify_mode: str = DEFAULT_CLASSIFY_MODE,
+    labels: Optional[List[str]] = None,
+) -> List[Tuple[str, str, List[str]]]:
+    """
+    批次版的摘要＋分類：先依文字長度排序分桶，讓同一批的長度接近、padding 最少，
+    再以 batch_size 筆為一批送進 mT5 與 XLM-R。超過 MAX_INPUT_TOKENS 的長文會先切塊摘要再合併。
+    classify_mode 可選 "nli" (高準確度) 或 "embedding" (快速)；labels 預設為 CANDIDATE_LABELS。
+
+    回傳：與 texts 順序相同的 [(summary, category, keywords), ...]
+    """
+    if classify_mode not in CLASSIFY_MODES:
+        raise ValueError(f"未知的分類模式：{classify_mode}（可用：{', '.join(CLASSIFY_MODES)}）")
+    if not texts:
+        return []
+    _set_num_threads(num_threads)
+    summarizer = load_multilang_summarizer()
+    labels = labels or CANDIDATE_LABELS
+
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results: List[Optional[Tuple[str, str, List[str]]]] = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        idxs = order[start:start + batch_size]
+        batch = [texts[i] for i in idxs]
+        summaries = _map_reduce_summarize(summarizer, batch, batch_size)
+        top_labels = _classify_texts(batch, labels, classify_mode)
+        for i, summary_text, top_label in zip(idxs, summaries, top_labels):
+            results[i] = (summary_text, top_label, extract_keywords(texts[i], summary_text))
+    return results
+
+
+@cache_data(show_spinner=False, max_entries=128, ttl=3600)
+def multilang_summarize_and_classify(text: str) -> Tuple[str, str, List[str]]:
+    """
+    輸入任意語言的長文本 (text)，
+    1) 用 mT5-base 做摘要 (大約 100 tokens 左右)。
+    2) 用 xlm-roberta-large-xnli 做 zero-shot 分類 (多語支援)。
+    3) 從原文與摘要擷取關鍵字 (不含筆記庫統計；要以整個筆記庫計算 IDF 請用 NoteStore.extract_keywords)。
+
+    回傳：
+      (summary: str, category: str, keywords: List[str])
+    """
+    return multilang_summarize_and_classify_batch([text])[0]
@@ -0,0 +1,160 @@
+# utils/inference.py
+"""
+CPU 推論後端：每個模型可各自選 fp32 (原始 PyTorch)、int8 (PyTorch 動態量化) 或 onnx (ONNX Runtime)，
+模型優先從本地資料夾載入，離線環境 (或測試) 不需要連網。
+
+    # 事先把模型下載到本地資料夾，並匯出 ONNX 圖
+    python -m utils.inference prepare --onnx
+
+設定 (環境變數)：
+    INSTANOTE_MODEL_DIR           本地模型資料夾 (預設 ~/.instanote/models)
+    INSTANOTE_OFFLINE=1           只從本地資料夾載入，不連 Hugging Face Hub
+    INSTANOTE_BACKEND             所有模型的預設後端 (fp32 / int8 / onnx，預設 fp32)
+    INSTANOTE_BACKEND_SUMMARIZER  個別模型覆寫，名稱為 models.registry 裡的登記名稱 (大寫)
+"""
+
+import os
+import logging
+import argparse
+from typing import Optional, Tuple
+
+# ------------------------------------------------------------------------
+# 本地模型資料夾：Hub 名稱 "google/mt5-base" 對應到 <MODEL_DIR>/google--mt5-base，
+# 匯出的 ONNX 圖放在 <MODEL_DIR>/google--mt5-base--onnx，只匯出一次
+# ------------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.environ.get(
+    "INSTANOTE_MODEL_DIR",
+    os.path.join(os.path.expanduser("~"), ".instanote", "models"),
+)
+OFFLINE = os.environ.get("INSTANOTE_OFFLINE", "") not in ("", "0")
+BACKENDS = ("fp32", "int8", "onnx")
+DEFAULT_BACKEND = os.environ.get("INSTANOTE_BACKEND", "fp32")
+
+# 模型種類 → optimum 的 ORTModel 類別名稱
+_ORT_CLASSES = {
+    "seq2seq": "ORTModelForSeq2SeqLM",
+    "sequence-classification": "ORTModelForSequenceClassification",
+    "feature-extraction": "ORTModelForFeatureExtraction",
+}
+
+
+def backend_for(role: str) -> str:
+    """
+    模型 role (例如 "summarizer") 要用的後端：INSTANOTE_BACKEND_<ROLE> > INSTANOTE_BACKEND > fp32。
+    """
+    backend = os.environ.get(f"INSTANOTE_BACKEND_{role.upper()}", DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的推論後端：{backend}（可用：{', '.join(BACKENDS)}）")
+    return backend
+
+
+def local_path(model_name: str, suffix: str = "") -> str:
+    return os.path.join(MODEL_DIR, model_name.replace("/", "--") + suffix)
+
+
+def resolve(model_name: str) -> str:
+    """
+    有本地資料夾就回傳本地路徑，否則回傳 Hub 名稱；離線模式下找不到本地模型直接報錯。
+    """
+    path = local_path(model_name)
+    if os.path.isdir(path):
+        return path
+    if OFFLINE:
+        raise FileNotFoundError(
+            f"離線模式找不到 {model_name} 的本地模型 ({path})，請先執行 python -m utils.inference prepare"
+        )
+    return model_name
+
+
+def _auto_class(kind: str):
+    import transformers
+
+    return getattr(transformers, {
+        "seq2seq": "AutoModelForSeq2SeqLM",
+        "sequence-classification": "AutoModelForSequenceClassification",
+        "feature-extraction": "AutoModel",
+    }[kind])
+
+
+def quantize_int8(model):
+    """
+    PyTorch 動態量化：Linear 層權重轉成 int8，推論時動態量化激活值 (只適用 CPU)。
+    """
+    import torch
+
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_onnx(model_name: str, kind: str):
+    try:
+        import optimum.onnxruntime as ort
+    except ImportError as e:
+        raise RuntimeError("onnx 後端需要安裝 optimum[onnxruntime]") from e
+
+    cls = getattr(ort, _ORT_CLASSES[kind])
+    exported = local_path(model_name, "--onnx")
+    if os.path.isdir(exported):
+        return cls.from_pretrained(exported)
+    if OFFLINE and not os.path.isdir(local_path(model_name)):
+        raise FileNotFoundError(f"離線模式找不到 {model_name} 的 ONNX 圖 ({exported})")
+    logger.info("exporting %s to ONNX (%s)", model_name, exported)
+    model = cls.from_pretrained(resolve(model_name), export=True)
+    model.save_pretrained(exported)
+    return model
+
+
+def load_model(model_name: str, kind: str, backend: str) -> Tuple[object, object]:
+    """
+    依後端載入 (tokenizer, model)。kind 為 seq2seq / sequence-classification / feature-extraction。
+    """
+    from transformers import AutoTokenizer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的推論後端：{backend}（可用：{', '.join(BACKENDS)}）")
+    tokenizer = AutoTokenizer.from_pretrained(resolve(model_name))
+    if backend == "onnx":
+        return tokenizer, _load_onnx(model_name, kind)
+
+    model = _auto_class(kind).from_pretrained(resolve(model_name))
+    model.eval()
+    if backend == "int8":
+        model = quantize_int8(model)
+    return tokenizer, model
+
+
+def prepare(model_names, onnx: bool = False) -> None:
+    """
+    下載模型存到本地資料夾 (已存在就略過)；onnx=True 時一併匯出 ONNX 圖。
+    """
+    from transformers import AutoTokenizer
+
+    for model_name, kind in model_names:
+        path = local_path(model_name)
+        if not os.path.isdir(path):
+            logger.info("downloading %s to %s", model_name, path)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(path)
+            _auto_class(kind).from_pretrained(model_name).save_pretrained(path)
+        if onnx:
+            _load_onnx(model_name, kind)
+
+
+def main(argv: Optional[list] = None) -> None:
+    from utils.gpt import MODELS
+
+    parser = argparse.ArgumentParser(description="下載模型到本地資料夾並 (選擇性) 匯出 ONNX 圖")
+    parser.add_argument("command", choices=["prepare"])
+    parser.add_argument("--onnx", action="store_true", help="一併匯出 ONNX Runtime 用的圖")
+    parser.add_argument("--roles", default=",".join(MODELS), help="要準備的模型 (逗號分隔)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    roles = [r for r in args.roles.split(",") if r]
+    prepare([MODELS[role] for role in roles], onnx=args.onnx)
+    logger.info("models ready in %s", MODEL_DIR)
+
+
+if __name__ == "__main__":
+    main()
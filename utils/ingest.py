@@ -0,0 +1,89 @@
+# utils/ingest.py
+
+import os
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, Optional, Tuple
+
+from utils import fetch_url
+from utils.fetch_url import (
+    fetch_page_html,
+    parse_page,
+    download_images,
+    download_audio,
+    ByteBudget,
+    HostLimiter,
+)
+from utils.metrics import span
+
+# ------------------------------------------------------------------------
+# 並行網址擷取：多執行緒同時抓取頁面與多媒體，完成一頁就先交給後續 OCR/ASR/摘要
+# ------------------------------------------------------------------------
+MAX_WORKERS = 16      # 全域同時處理的網址數
+MAX_PER_HOST = 4      # 同一主機同時進行中的請求數
+FETCH_ROOT = os.path.join(tempfile.gettempdir(), "url_fetch")
+
+
+def media_dir_for(url: str, root: str = FETCH_ROOT) -> str:
+    """
+    每個網址各自一個資料夾，避免不同網址的 image_0 / audio_0 互相覆蓋。
+    """
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(root, digest)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def fetch_page(
+    url: str,
+    root: str = FETCH_ROOT,
+    extract_mode: Optional[str] = None,
+    limiter: Optional[HostLimiter] = None,
+) -> dict:
+    """
+    抓取單一網址：HTML、標題、可見文字，以及頁面上的圖片與音訊檔。
+    extract_mode 為 "main" (只留正文) 或 "full"，None 依 INSTANOTE_EXTRACT_MODE。
+    頁面與多媒體的請求都經過 limiter (None 時用 fetch_url 模組共用的 host_limiter)。
+    """
+    html = fetch_page_html(url, limiter=limiter)
+    parsed = parse_page(html, base_url=url, mode=extract_mode or fetch_url.EXTRACT_MODE)
+    save_dir = media_dir_for(url, root)
+    budget = ByteBudget()  # 圖片與音訊共用整頁的位元組上限
+    with span("fetch.media", size=len(parsed["image_urls"]) + len(parsed["audio_urls"])):
+        images = download_images(parsed["image_urls"], save_dir, budget, limiter)
+        audios = download_audio(parsed["audio_urls"], save_dir, budget, limiter)
+    return {
+        "url": url,
+        "title": parsed["title"],
+        "text": parsed["text"],
+        "images": images,
+        "audios": audios,
+    }
+
+
+def iter_fetched_pages(
+    urls: Iterable[str],
+    max_workers: int = MAX_WORKERS,
+    per_host: int = MAX_PER_HOST,
+    root: str = FETCH_ROOT,
+    extract_mode: Optional[str] = None,
+) -> Iterator[Tuple[str, Optional[dict], Optional[Exception]]]:
+    """
+    以執行緒池並行抓取 urls，依「完成順序」逐筆產出 (url, page, error)：
+      - 成功：page 為 fetch_page() 的結果，error 為 None
+      - 失敗：page 為 None，error 為例外物件
+    重複的網址只會抓一次。每次呼叫各自建立 HostLimiter，同時進行的呼叫不會互相換掉對方的限制。
+    """
+    unique_urls = list(dict.fromkeys(urls))
+    if not unique_urls:
+        return
+    limiter = HostLimiter(per_host)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_urls))) as pool:
+        futures = {pool.submit(fetch_page, url, root, extract_mode, limiter): url for url in unique_urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                yield url, future.result(), None
+            except Exception as e:
+                yield url, None, e
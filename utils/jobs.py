@@ -0,0 +1,598 @@
+# utils/jobs.py
+
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import sqlite3
+import threading
+import multiprocessing
+from contextlib import closing
+from queue import Empty, Queue
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils import ingest, metrics
+from utils._compat import JOB_WORKER_ENV
+from utils.note_store import NoteStore, STORE_PATH, content_key
+
+# ------------------------------------------------------------------------
+# 背景工作佇列：OCR / ASR / 多語摘要分類交給獨立的 worker 行程處理
+#   - 工作與每個項目的狀態存在 SQLite，重新整理頁面 (甚至重啟服務) 後都還在
+#   - 派工執行緒從佇列領取項目送進行程池，完成一筆就寫進筆記庫
+#   - 網址項目先在本行程由擷取執行緒以 ingest.iter_fetched_pages 並行抓取 (全域執行緒數與
+#     每個主機的同時請求數都有上限)，抓好一頁就送進行程池做 OCR/ASR/摘要，不等整批
+#   - 取消時不再派送剩下的項目，已在排隊的 future 也會一併取消
+#   - 領取的項目記下擁有者與租約期限，派工執行緒定期續約；只有租約過期 (擁有的行程已不在)
+#     的項目才會重新排隊，多個 Streamlit 行程共用同一個佇列時不會互搶
+#   - worker 行程異常結束 (例如 OOM) 時重建行程池，手上的項目重新排隊，重試 MAX_ATTEMPTS 次仍失敗才標為 failed
+# ------------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+JOBS_PATH = os.environ.get(
+    "INSTANOTE_JOBS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(STORE_PATH)), "jobs.sqlite"),
+)
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(JOBS_PATH)), "spool")
+MAX_WORKERS = int(os.environ.get("INSTANOTE_WORKERS", 2))
+POLL_INTERVAL = 1.0
+LEASE_SECONDS = 60.0
+MAX_ATTEMPTS = 2
+URL_KINDS = ("url", "url_batch")
+# 擷取階段最多同時持有的網址項目數 (同時抓取的執行緒數另由 ingest.MAX_WORKERS 限制)
+FETCH_AHEAD = int(os.environ.get("INSTANOTE_FETCH_AHEAD", ingest.MAX_WORKERS * 2))
+# worker 行程啟動後先在背景載入的模型 (逗號分隔，留空則完全延遲到第一次使用)
+WORKER_WARMUP = [n for n in os.environ.get("INSTANOTE_WORKER_WARMUP", "summarizer,classifier").split(",") if n]
+
+# 項目狀態：queued → running → done / failed / cancelled
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id               TEXT PRIMARY KEY,
+    label            TEXT NOT NULL,
+    options          TEXT NOT NULL DEFAULT '{}',
+    status           TEXT NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at       REAL NOT NULL,
+    updated_at       REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id  TEXT NOT NULL,
+    seq     INTEGER NOT NULL,
+    key     TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    source  TEXT NOT NULL,
+    path    TEXT NOT NULL DEFAULT '',
+    status  TEXT NOT NULL,
+    error   TEXT NOT NULL DEFAULT '',
+    owner       TEXT NOT NULL DEFAULT '',
+    lease_until REAL NOT NULL DEFAULT 0,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items(status);
+CREATE INDEX IF NOT EXISTS items_key ON items(key);
+"""
+
+
+def _init_worker(workers: int = 1) -> None:
+    """
+    worker 行程的初始化：登記模型並在背景預先載入，第一個項目不必從零等模型；
+    量測結果改為隨每個項目送回主行程。workers 為同時執行的 worker 行程數，
+    OCR / ASR 的行程池依此平分 CPU (見 _compat.cpu_share)。
+    """
+    os.environ[JOB_WORKER_ENV] = str(workers)
+    import utils.gpt  # noqa: F401  (登記 summarizer / classifier / embedder)
+    import utils.whisper_asr  # noqa: F401  (登記 whisper)
+    from utils.models import registry
+
+    metrics.metrics.forward()
+    registry.warm_up(WORKER_WARMUP, background=True)
+
+
+_worker_store = None
+
+
+def _get_worker_store() -> NoteStore:
+    """
+    worker 行程內共用的 NoteStore (查詢近似重複與關鍵字詞頻統計用)。
+    """
+    global _worker_store
+    if _worker_store is None:
+        _worker_store = NoteStore()
+    return _worker_store
+
+
+def run_item(item: dict, options: dict, page: Optional[dict] = None) -> Tuple[dict, list]:
+    """
+    在 worker 行程裡處理單一項目，回傳 (完成摘要分類的筆記, 這段期間的量測)，
+    量測由主行程 metrics.merge()。options["profile_dir"] 有值時對這個項目開剖析器。
+    網址項目可帶已擷取好的 page (ingest.fetch_page 的結果)，就不在 worker 行程裡再抓一次。
+    (模組層級函式，才能被 ProcessPoolExecutor pickle)
+    """
+    profile_dir = options.get("profile_dir")
+    with metrics.span("pipeline.item") as s:
+        if profile_dir:
+            ext = ".html" if metrics.PROFILER == "sampling" else ".prof"
+            with metrics.profile(os.path.join(profile_dir, item["key"][:16] + ext)):
+                note = _process_item(item, options, page)
+        else:
+            note = _process_item(item, options, page)
+        s.size = len(note["content"])
+    metrics.incr(f"pipeline.items_{item['kind']}")
+    return note, metrics.metrics.drain()
+
+
+def _process_item(item: dict, options: dict, page: Optional[dict] = None) -> dict:
+    from utils.gpt import DEFAULT_CLASSIFY_MODE
+    from utils.pipeline import build_url_note, build_file_note, reuse_near_duplicate, summarize_notes
+
+    if item["kind"] in URL_KINDS:
+        note = build_url_note(
+            item["source"], note_type=item["kind"], extract_mode=options.get("extract_mode"), page=page,
+        )
+    else:
+        note = build_file_note(item["path"], item["source"], item["kind"], key=item["key"])
+    # 轉貼的內容沿用既有筆記的摘要分類，不再跑 mT5 / XLM-R
+    store = _get_worker_store()
+    if reuse_near_duplicate(note, store):
+        return note
+    return summarize_notes(
+        [note],
+        classify_mode=options.get("classify_mode") or DEFAULT_CLASSIFY_MODE,
+        labels=options.get("labels"),
+        store=store,
+    )[0]
+
+
+class JobQueue:
+    """
+    SQLite 上的工作佇列。所有方法各自開連線，可在多個 session / 行程之間共用。
+    """
+
+    def __init__(self, path: str = JOBS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # 舊版資料庫沒有租約欄位
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(items)")}
+            for column, ddl in (
+                ("owner", "TEXT NOT NULL DEFAULT ''"),
+                ("lease_until", "REAL NOT NULL DEFAULT 0"),
+                ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+            ):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE items ADD COLUMN {column} {ddl}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # --- 建立工作 ---------------------------------------------------------
+    def spool_upload(self, data: bytes, name: str) -> str:
+        """
+        上傳檔案先存到 spool 資料夾 (以內容雜湊命名)，worker 行程才讀得到。
+        """
+        ext = os.path.splitext(name)[1].lower()
+        path = os.path.join(SPOOL_DIR, content_key(data) + ext)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return path
+
+    def submit(self, label: str, items: List[dict], options: Optional[dict] = None) -> str:
+        """
+        建立一個工作。items 每筆需含 key / kind (url, url_batch, image, audio, text) / source，
+        檔案類另含 path。回傳 job id。
+        """
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO jobs (id, label, options, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, label, json.dumps(options or {}, ensure_ascii=False), now, now),
+            )
+            conn.executemany(
+                "INSERT INTO items (job_id, seq, key, kind, source, path, status) VALUES (?, ?, ?, ?, ?, ?, 'queued')",
+                [
+                    (job_id, seq, item["key"], item["kind"], item["source"], item.get("path", ""))
+                    for seq, item in enumerate(items)
+                ],
+            )
+        return job_id
+
+    def cancel(self, job_id: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            paths = [row[0] for row in conn.execute(
+                "SELECT path FROM items WHERE job_id = ? AND status = 'queued'", (job_id,)
+            )]
+            conn.execute(
+                "UPDATE items SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'", (job_id,)
+            )
+            self._update_job_status(conn, job_id)
+        self._remove_spooled(paths)
+
+    # --- 查詢 -------------------------------------------------------------
+    def active_keys(self) -> set:
+        """
+        還在排隊或處理中的項目 key，用來避免重複送出同一份內容。
+        """
+        with closing(self._connect()) as conn:
+            return {
+                row[0] for row in conn.execute("SELECT key FROM items WHERE status IN ('queued', 'running')")
+            }
+
+    def list_jobs(self, limit: int = 10) -> List[dict]:
+        """
+        最近的工作與各狀態的項目數：[{id, label, status, total, done, failed, cancelled, running, errors}]
+        """
+        with closing(self._connect()) as conn:
+            jobs = [dict(row) for row in conn.execute(
+                "SELECT id, label, status, created_at, updated_at FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            )]
+            for job in jobs:
+                counts = dict(conn.execute(
+                    "SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status", (job["id"],)
+                ).fetchall())
+                job["total"] = sum(counts.values())
+                for state in ("queued", "running") + FINISHED_STATES:
+                    job[state] = counts.get(state, 0)
+                job["errors"] = [
+                    (row["source"], row["error"]) for row in conn.execute(
+                        "SELECT source, error FROM items WHERE job_id = ? AND status = 'failed' ORDER BY seq",
+                        (job["id"],),
+                    )
+                ]
+        return jobs
+
+    # --- 給派工執行緒用 ---------------------------------------------------
+    def claim(self, limit: int, owner: str = "", kinds: Optional[Sequence[str]] = None,
+              exclude: bool = False) -> List[dict]:
+        """
+        原子地領取最多 limit 個排隊中的項目 (狀態改為 running，租約期限為 LEASE_SECONDS 之後)。
+        有給 kinds 時只領取這些種類 (exclude=True 則是排除這些種類)。
+        """
+        where, params = "", []
+        if kinds:
+            where = f" AND i.kind {'NOT IN' if exclude else 'IN'} ({', '.join('?' * len(kinds))})"
+            params = list(kinds)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT i.*, j.options FROM items i JOIN jobs j ON j.id = i.job_id "
+                f"WHERE i.status = 'queued' AND j.cancel_requested = 0{where} "
+                "ORDER BY j.created_at, i.seq LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE items SET status = 'running', owner = ?, lease_until = ? WHERE job_id = ? AND seq = ?",
+                    (owner, time.time() + LEASE_SECONDS, row["job_id"], row["seq"]),
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), row["job_id"])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def finish(self, item: dict, status: str, error: str = "") -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE items SET status = ?, error = ?, owner = '' WHERE job_id = ? AND seq = ?",
+                (status, error, item["job_id"], item["seq"]),
+            )
+            self._update_job_status(conn, item["job_id"])
+        self._remove_spooled([item.get("path", "")])
+
+    def retry(self, item: dict, error: str) -> None:
+        """
+        worker 行程異常結束時手上的項目：重試次數未滿 MAX_ATTEMPTS 就重新排隊，否則標為 failed。
+        """
+        with closing(self._connect()) as conn, conn:
+            key = (item["job_id"], item["seq"])
+            conn.execute("UPDATE items SET attempts = attempts + 1 WHERE job_id = ? AND seq = ?", key)
+            attempts = conn.execute("SELECT attempts FROM items WHERE job_id = ? AND seq = ?", key).fetchone()[0]
+        if attempts >= MAX_ATTEMPTS:
+            self.finish(item, "failed", error)
+        else:
+            self.requeue(item)
+
+    def requeue(self, item: dict) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE items SET status = 'queued', owner = '' WHERE job_id = ? AND seq = ? AND status = 'running'",
+                (item["job_id"], item["seq"]),
+            )
+
+    def renew(self, owner: str) -> None:
+        """
+        延長 owner 手上所有 running 項目的租約。
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE items SET lease_until = ? WHERE owner = ? AND status = 'running'",
+                (time.time() + LEASE_SECONDS, owner),
+            )
+
+    def requeue_stale(self) -> int:
+        """
+        租約已過期 (擁有的行程已結束或當掉) 的 running 項目重新排隊，回傳筆數。
+        """
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "UPDATE items SET status = 'queued', owner = '' WHERE status = 'running' AND lease_until < ?",
+                (time.time(),),
+            ).rowcount
+
+    def cancel_requested(self) -> set:
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute("SELECT id FROM jobs WHERE cancel_requested = 1")}
+
+    def _remove_spooled(self, paths: List[str]) -> None:
+        """
+        刪掉已沒有待處理項目使用的 spool 檔 (同內容的檔案可能被其他工作共用)。
+        """
+        spool = os.path.join(os.path.abspath(SPOOL_DIR), "")
+        paths = {p for p in paths if p and os.path.abspath(p).startswith(spool)}
+        if not paths:
+            return
+        with closing(self._connect()) as conn:
+            for path in paths:
+                in_use = conn.execute(
+                    "SELECT 1 FROM items WHERE path = ? AND status IN ('queued', 'running') LIMIT 1", (path,)
+                ).fetchone()
+                if in_use is None:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def _update_job_status(self, conn: sqlite3.Connection, job_id: str) -> None:
+        counts = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall())
+        if counts.get("queued") or counts.get("running"):
+            return
+        status = "cancelled" if counts.get("cancelled") else "done"
+        conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+
+
+class JobWorker:
+    """
+    派工執行緒 + 網址擷取執行緒 + worker 行程池。每個行程只需建立一次，由 get_worker() 取得。
+    """
+
+    def __init__(self, queue: JobQueue, store: NoteStore, max_workers: int = MAX_WORKERS):
+        self.queue = queue
+        self.store = store
+        self.max_workers = max_workers
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._pool = self._new_pool()
+        self._inflight: Dict[Future, dict] = {}
+        self._renewed_at = self._swept_at = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="instanote-jobs", daemon=True)
+        # 擷取階段：派工執行緒把一組 [(item, options)] 放進 _to_fetch，擷取執行緒抓好一頁就
+        # 把 (item, options, page, error) 放進 _fetched；_fetching 為還沒送進行程池的網址項目數
+        self._to_fetch: "Queue[Optional[list]]" = Queue()
+        self._fetched: "Queue[tuple]" = Queue()
+        self._fetching = 0
+        self._fetcher = threading.Thread(target=self._fetch_loop, name="instanote-fetch", daemon=True)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # 用 spawn 啟動 worker，避免在已有多執行緒 (Streamlit、torch) 的行程裡 fork
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.max_workers,),
+        )
+
+    def start(self) -> "JobWorker":
+        self._fetcher.start()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._to_fetch.put(None)
+        self._thread.join()
+        self._pool.shutdown(cancel_futures=True)
+        # 還在擷取中的項目不等了，租約過期後會重新排隊
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._step()
+            except BrokenProcessPool as e:
+                logger.error("a job worker process died (%s); restarting the pool", e)
+                self._restart_pool(f"worker 行程異常結束：{e}")
+            except sqlite3.Error:
+                logger.exception("job queue database error; retrying in %.0fs", POLL_INTERVAL)
+                self._stop.wait(POLL_INTERVAL)
+            except Exception:
+                logger.exception("job dispatcher error; retrying in %.0fs", POLL_INTERVAL)
+                self._stop.wait(POLL_INTERVAL)
+
+    def _step(self) -> None:
+        self._maintain_leases()
+        self._cancel_requested()
+        self._submit_fetched()
+        # 多派一倍給行程池排隊，讓 worker 不會閒置；網址項目另外最多 FETCH_AHEAD 筆在擷取階段
+        capacity = self.max_workers * 2
+        busy = len(self._inflight) + self._fetching
+        url_free = min(FETCH_AHEAD - self._fetching, capacity + FETCH_AHEAD - busy)
+        if url_free > 0:
+            self._claim_urls(url_free)
+        file_free = capacity - len(self._inflight)
+        if file_free > 0:
+            claimed = self.queue.claim(file_free, owner=self.owner, kinds=URL_KINDS, exclude=True)
+            for i, item in enumerate(claimed):
+                options = json.loads(item.pop("options") or "{}")
+                try:
+                    future = self._pool.submit(run_item, item, options)
+                except BrokenProcessPool:
+                    for rest in claimed[i:]:
+                        self.queue.requeue(rest)
+                    raise
+                self._inflight[future] = item
+        # 擷取中的頁面隨時可能好，等待時間縮短，抓好的頁面才不會在這裡多等
+        timeout = POLL_INTERVAL / 10 if self._fetching else POLL_INTERVAL
+        if not self._inflight:
+            self._stop.wait(timeout)
+            return
+        done, _ = wait(list(self._inflight), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                raise future.exception()
+            self._collect(future, self._inflight.pop(future))
+
+    def _claim_urls(self, limit: int) -> None:
+        """
+        領取網址項目交給擷取執行緒；同一次領取裡擷取模式相同的項目合成一組，一起並行抓取。
+        """
+        groups: Dict[Optional[str], list] = {}
+        for item in self.queue.claim(limit, owner=self.owner, kinds=URL_KINDS):
+            options = json.loads(item.pop("options") or "{}")
+            groups.setdefault(options.get("extract_mode"), []).append((item, options))
+        for pairs in groups.values():
+            self._fetching += len(pairs)
+            self._to_fetch.put(pairs)
+
+    def _fetch_loop(self) -> None:
+        """
+        擷取執行緒：一次抓一組，組內以 iter_fetched_pages 並行 (最多 ingest.MAX_WORKERS 個執行緒、
+        每個主機 ingest.MAX_PER_HOST 個請求)，依完成順序交回派工執行緒。
+        各組依序處理，所以這兩個上限對整個行程都成立。
+        """
+        while True:
+            pairs = self._to_fetch.get()
+            if pairs is None:
+                return
+            by_url: Dict[str, list] = {}
+            for item, options in pairs:
+                by_url.setdefault(item["source"], []).append((item, options))
+            extract_mode = pairs[0][1].get("extract_mode")
+            try:
+                for url, page, error in ingest.iter_fetched_pages(list(by_url), extract_mode=extract_mode):
+                    for item, options in by_url.pop(url):
+                        self._fetched.put((item, options, page, error))
+            except Exception as e:
+                logger.exception("fetch stage error")
+                for rest in by_url.values():
+                    for item, options in rest:
+                        self._fetched.put((item, options, None, e))
+
+    def _submit_fetched(self) -> None:
+        """
+        把擷取好的頁面送進行程池；擷取失敗的項目直接標為 failed，已取消的工作標為 cancelled。
+        """
+        cancelled = None
+        while True:
+            try:
+                item, options, page, error = self._fetched.get_nowait()
+            except Empty:
+                return
+            self._fetching -= 1
+            if error is not None:
+                self.queue.finish(item, "failed", str(error) or type(error).__name__)
+                continue
+            if cancelled is None:
+                cancelled = self.queue.cancel_requested()
+            if item["job_id"] in cancelled:
+                self.queue.finish(item, "cancelled")
+                continue
+            try:
+                future = self._pool.submit(run_item, item, options, page)
+            except BrokenProcessPool:
+                self.queue.requeue(item)  # 頁面已在快取裡，重新擷取只花一個條件式請求
+                raise
+            self._inflight[future] = item
+
+    def _maintain_leases(self) -> None:
+        """
+        定期續約自己手上的項目，並把其他已結束行程留下的過期項目重新排隊。
+        """
+        now = time.time()
+        if now - self._renewed_at >= LEASE_SECONDS / 3:
+            self.queue.renew(self.owner)
+            self._renewed_at = now
+        if now - self._swept_at >= LEASE_SECONDS:
+            requeued = self.queue.requeue_stale()
+            if requeued:
+                logger.info("requeued %d items with expired leases", requeued)
+            self._swept_at = now
+
+    def _restart_pool(self, error: str) -> None:
+        """
+        行程池壞掉時：手上的項目重新排隊 (或已重試過的標為 failed)，再換一個新的行程池。
+        """
+        inflight, self._inflight = self._inflight, {}
+        for item in inflight.values():
+            try:
+                self.queue.retry(item, error)
+            except sqlite3.Error:
+                logger.exception("could not release %s/%s; it will be requeued when its lease expires",
+                                 item["job_id"], item["seq"])
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._new_pool()
+
+    def _collect(self, future: Future, item: dict) -> None:
+        from utils.pipeline import note_error
+
+        if future.cancelled():
+            self.queue.finish(item, "cancelled")
+            return
+        try:
+            note, measurements = future.result()
+        except Exception as e:
+            self.queue.finish(item, "failed", str(e))
+            return
+        metrics.merge(measurements)
+        error = note_error(note)
+        if error:
+            self.queue.finish(item, "failed", error)
+            return
+        self.store.add_many([note])
+        self.queue.finish(item, "done")
+
+    def _cancel_requested(self) -> None:
+        cancelled = self.queue.cancel_requested()
+        if not cancelled:
+            return
+        for future, item in list(self._inflight.items()):
+            if item["job_id"] in cancelled and future.cancel():
+                self._collect(future, self._inflight.pop(future))
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> JobWorker:
+    """
+    回傳行程內唯一的 JobWorker，第一次呼叫時啟動。
+    """
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = JobWorker(JobQueue(), NoteStore()).start()
+    return _worker
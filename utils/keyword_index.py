@@ -0,0 +1,252 @@
+# utils/keyword_index.py
+
+import os
+import re
+import math
+import json
+import logging
+import sqlite3
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from utils.search_index import _CJK, _TOKEN_RE
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------
+# 關鍵字擷取：以整個筆記庫的文件頻率 (DF) 為基礎，用 BM25 權重為單篇筆記的詞打分
+#   - DF 統計存在筆記庫同一個 SQLite 檔，NoteStore 寫入筆記時只更新這一篇用到的詞，
+#     成本和新筆記的長度成正比，不必重算整個語料
+#   - 中文切詞：有安裝 jieba 就用 jieba，否則退回 CJK bigram，再把排名相鄰、
+#     在原文裡接得起來的 bigram 合併成較長的詞
+#   - 切詞方式改變 (例如後來才裝 jieba) 時，ensure_index() 會重建統計
+# ------------------------------------------------------------------------
+TOP_K = 5
+SEGMENTER = os.environ.get("INSTANOTE_KEYWORD_SEGMENTER", "auto")   # auto / jieba / bigram
+K1, B = 1.2, 0.75
+SUMMARY_WEIGHT = 2   # 摘要裡出現的詞代表文章重點，詞頻加權
+MAX_PHRASE = 6       # bigram 合併後的最長字數
+
+_STOPWORDS = {
+    # 英文
+    "the", "and", "to", "of", "in", "for", "with", "on", "that", "this", "is", "are", "was",
+    "were", "be", "been", "it", "its", "as", "at", "by", "an", "or", "from", "but", "not",
+    "have", "has", "had", "you", "your", "we", "our", "they", "their", "he", "she", "his",
+    "her", "will", "can", "just", "so", "if", "do", "all", "more", "about", "what", "when",
+    "http", "https", "www", "com",
+    # 中文 (多字)
+    "我們", "你們", "他們", "她們", "自己", "一個", "這個", "那個", "這些", "那些", "什麼",
+    "因為", "所以", "但是", "如果", "還是", "就是", "可以", "沒有", "已經", "不是", "而且",
+    "以及", "或是", "其實", "然後", "怎麼", "這樣", "那樣", "時候", "現在", "今天", "真的", "覺得",
+    "我们", "你们", "他们", "这个", "那个", "这些", "什么", "因为", "还是", "没有",
+}
+# bigram 退路中含這些虛字的詞組多半是跨詞的片段，直接略過
+_STOP_CHARS = set("的了是在和也就不有我你他她它這那們之與及或但而被把個嗎呢吧啊喔哦很都又得地著着過过这们个与还")
+_CJK_RE = re.compile(rf"[{_CJK}]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS keyword_df (
+    term TEXT PRIMARY KEY,
+    df   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keyword_docs (
+    note_id TEXT PRIMARY KEY,
+    terms   TEXT NOT NULL,
+    length  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keyword_meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+@lru_cache(maxsize=1)
+def _load_jieba():
+    if SEGMENTER == "bigram":
+        return None
+    try:
+        import jieba
+    except ImportError:
+        if SEGMENTER == "jieba":
+            raise
+        logger.warning("jieba is not installed, falling back to CJK bigram keywords")
+        return None
+    jieba.setLogLevel(60)
+    return jieba
+
+
+def segmenter_name() -> str:
+    return "jieba" if _load_jieba() is not None else "bigram"
+
+
+def segment(text: str) -> List[str]:
+    """
+    關鍵字用切詞：英文等以單字為單位、轉小寫；中日韓文字用 jieba 切詞 (沒有則切 bigram)。
+    去掉停用詞、單一字元與純數字。
+    """
+    jieba = _load_jieba()
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(text or ""):
+        if word:
+            word = word.lower()
+            if len(word) > 1 and not word.isdigit() and word not in _STOPWORDS:
+                tokens.append(word)
+        elif jieba is not None:
+            tokens.extend(t for t in jieba.cut(cjk) if len(t) > 1 and t not in _STOPWORDS)
+        else:
+            tokens.extend(
+                cjk[i:i + 2] for i in range(len(cjk) - 1)
+                if cjk[i] not in _STOP_CHARS and cjk[i + 1] not in _STOP_CHARS and cjk[i:i + 2] not in _STOPWORDS
+            )
+    return tokens
+
+
+# --- DF 統計 --------------------------------------------------------------
+def _meta(conn: sqlite3.Connection) -> Dict[str, str]:
+    return dict(conn.execute("SELECT name, value FROM keyword_meta").fetchall())
+
+
+def _bump_meta(conn: sqlite3.Connection, docs: int, length: int) -> None:
+    for name, delta in (("docs", docs), ("total_length", length)):
+        conn.execute(
+            "INSERT INTO keyword_meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = CAST(value AS INTEGER) + ?",
+            (name, str(delta), delta),
+        )
+
+
+def ensure_index(conn: sqlite3.Connection) -> None:
+    """
+    建表，補算尚未統計的筆記 (例如舊版資料庫)；切詞方式和上次不同時整個重建。
+    """
+    conn.executescript(_SCHEMA)
+    with conn:
+        segmenter = segmenter_name()
+        if _meta(conn).get("segmenter") != segmenter:
+            conn.execute("DELETE FROM keyword_df")
+            conn.execute("DELETE FROM keyword_docs")
+            conn.execute("DELETE FROM keyword_meta")
+            conn.execute("INSERT INTO keyword_meta (name, value) VALUES ('segmenter', ?)", (segmenter,))
+        pending = conn.execute(
+            "SELECT id, title, content FROM notes WHERE id NOT IN (SELECT note_id FROM keyword_docs)"
+        ).fetchall()
+        for note_id, title, content in pending:
+            index_note(conn, note_id, f"{title}\n{content}")
+
+
+def index_note(conn: sqlite3.Connection, note_id: str, text: str) -> None:
+    """
+    把一篇筆記的詞加進 DF 統計 (同 id 已統計過就先扣掉舊版本)。
+    """
+    unindex_note(conn, note_id)
+    tokens = segment(text)
+    terms = sorted(set(tokens))
+    conn.executemany(
+        "INSERT INTO keyword_df (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+        [(t,) for t in terms],
+    )
+    conn.execute(
+        "INSERT INTO keyword_docs (note_id, terms, length) VALUES (?, ?, ?)",
+        (note_id, json.dumps(terms, ensure_ascii=False), len(tokens)),
+    )
+    _bump_meta(conn, 1, len(tokens))
+
+
+def unindex_note(conn: sqlite3.Connection, note_id: str) -> None:
+    row = conn.execute("SELECT terms, length FROM keyword_docs WHERE note_id = ?", (note_id,)).fetchone()
+    if row is None:
+        return
+    terms = [(t,) for t in json.loads(row[0])]
+    conn.executemany("UPDATE keyword_df SET df = df - 1 WHERE term = ?", terms)
+    conn.executemany("DELETE FROM keyword_df WHERE term = ? AND df <= 0", terms)
+    conn.execute("DELETE FROM keyword_docs WHERE note_id = ?", (note_id,))
+    _bump_meta(conn, -1, -row[1])
+
+
+def _document_frequencies(conn: sqlite3.Connection, terms: List[str]) -> Dict[str, int]:
+    dfs = {}
+    # SQLite 參數數量有上限，分批查詢
+    for start in range(0, len(terms), 500):
+        chunk = terms[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        dfs.update(conn.execute(f"SELECT term, df FROM keyword_df WHERE term IN ({marks})", chunk).fetchall())
+    return dfs
+
+
+# --- 擷取 -----------------------------------------------------------------
+def _join(prev: str, term: str, text: str) -> Optional[str]:
+    """
+    prev 與 term 首尾相接，且在原文裡多半一起出現 (接起來的詞至少出現兩次，
+    且不少於兩段各自出現次數的一半) 時回傳合併後的詞，否則 None。
+    """
+    for left, right in ((prev, term), (term, prev)):
+        if left[-1] != right[0]:
+            continue
+        joined = left + right[1:]
+        if len(joined) > MAX_PHRASE:
+            continue
+        count = text.count(joined)
+        if count >= 2 and 2 * count >= max(text.count(left), text.count(right)):
+            return joined
+    return None
+
+
+def _merge_phrases(ranked: Iterable[str], text: str, top_k: int) -> List[str]:
+    """
+    bigram 退路：排名靠前、在原文裡首尾相接的 bigram (例如「機器」「器學」「學習」)
+    合併成一個詞 (「機器學習」)，避免關鍵字被同一個詞的片段佔滿。
+    """
+    picked: List[str] = []
+    for term in ranked:
+        if any(term in prev for prev in picked):
+            continue
+        for i, prev in enumerate(picked):
+            if not (_CJK_RE.fullmatch(term) and _CJK_RE.fullmatch(prev)):
+                continue
+            joined = _join(prev, term, text)
+            if joined:
+                picked[i] = joined
+                break
+        else:
+            if len(picked) < top_k:
+                picked.append(term)
+    return picked
+
+
+def extract_keywords(
+    text: str,
+    summary: str = "",
+    conn: Optional[sqlite3.Connection] = None,
+    top_k: int = TOP_K,
+) -> List[str]:
+    """
+    從原文 (text) 與摘要擷取 top_k 個關鍵字，依 BM25 權重排序。
+    有 conn 時以筆記庫的 DF 計算 IDF；沒有時所有詞的 IDF 相同，只看詞頻。
+    """
+    counts = Counter(segment(text))
+    length = sum(counts.values())
+    for term in segment(summary):
+        counts[term] += SUMMARY_WEIGHT
+    if not counts:
+        return []
+
+    docs, avg_length, dfs = 0, float(length or 1), {}
+    if conn is not None:
+        meta = _meta(conn)
+        docs = int(meta.get("docs", 0))
+        if docs:
+            avg_length = max(1.0, int(meta.get("total_length", 0)) / docs)
+        dfs = _document_frequencies(conn, list(counts))
+
+    norm = K1 * (1 - B + B * length / avg_length)
+    scores = {}
+    for term, tf in counts.items():
+        df = dfs.get(term, 0)
+        idf = math.log(1 + (docs - df + 0.5) / (df + 0.5))
+        scores[term] = idf * tf * (K1 + 1) / (tf + norm)
+    ranked = sorted(scores, key=lambda t: (-scores[t], t))
+    if segmenter_name() == "bigram":
+        return _merge_phrases(ranked[:top_k * 4], f"{text}\n{summary}", top_k)
+    return ranked[:top_k]
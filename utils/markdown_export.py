@@ -1,9 +1,23 @@
+from utils.exporter import export_notes
+
+# 舊版欄位名稱 (中文) → 筆記庫欄位
+_LEGACY_KEYS = {
+    "標題": "title",
+    "主題": "category",
+    "摘要": "summary",
+    "原文": "content",
+    "關鍵字": "keywords",
+    "網址": "url",
+}
+
+
 def export_notes_to_md(notes, path="notes.md"):
-    with open(path, "w", encoding="utf-8") as f:
+    """
+    舊介面：notes 可用中文欄位名稱或筆記庫欄位名稱，逐筆串流寫成 Markdown。
+    """
+    def normalized():
         for note in notes:
-            f.write(f"# {note['檔名']}\n")
-            f.write(f"**主題：** {note['主題']}\n\n")
-            f.write(f"**摘要：** {note['摘要']}\n\n")
-            f.write("**原文內容：**\n")
-            f.write(f"{note['原文']}\n\n---\n")
+            yield {_LEGACY_KEYS.get(k, k): v for k, v in note.items()}
+
+    export_notes(normalized(), path, "markdown")
     return path
@@ -0,0 +1,273 @@
+# utils/metrics.py
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# ------------------------------------------------------------------------
+# 輕量量測：每個處理階段 / 模型呼叫的耗時 (span) 與事件計數 (counter)
+#   - span 記下耗時與輸入大小 (位元組、字數、張數……依階段而定)，每個階段保留最近
+#     RESERVOIR 筆耗時計算 p50 / p95
+#   - 背景工作在 worker 行程裡執行：worker 把量測結果 drain() 後隨筆記送回，
+#     主行程 merge()，側邊欄看到的是所有行程的合計
+#   - 可匯出成 Prometheus 文字格式 (node_exporter textfile collector) 或 JSON
+#   - 設定 INSTANOTE_METRICS=0 即停用，span() 直接回傳共用的空物件，幾乎沒有額外成本
+#   - profile() 可對單次執行開 cProfile (或 pyinstrument 取樣剖析)
+# ------------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("INSTANOTE_METRICS", "1") not in ("", "0")
+EXPORT_PATH = os.environ.get("INSTANOTE_METRICS_EXPORT", "")   # .json 或 .prom，CLI 結束時寫出
+PROFILER = os.environ.get("INSTANOTE_PROFILER", "cprofile")    # cprofile / sampling
+RESERVOIR = 1024
+
+
+class _Span:
+    """
+    with metrics.span("階段", size=...) as s: ...；大小要等做完才知道時可設定 s.size。
+    """
+
+    __slots__ = ("registry", "name", "size", "start")
+
+    def __init__(self, registry: Optional["Metrics"], name: str, size: Optional[float]):
+        self.registry = registry
+        self.name = name
+        self.size = size
+        self.start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.registry.observe(self.name, time.perf_counter() - self.start, self.size)
+
+
+class _NoopSpan:
+    __slots__ = ("size",)
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Stage:
+    __slots__ = ("durations", "count", "seconds", "size")
+
+    def __init__(self):
+        self.durations = deque(maxlen=RESERVOIR)
+        self.count = 0
+        self.seconds = 0.0
+        self.size = 0.0
+
+
+def _quantile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    def __init__(self, enabled: bool = ENABLED):
+        self.enabled = enabled
+        self._stages: Dict[str, _Stage] = {}
+        self._counters: Dict[str, float] = {}
+        self._outbox: Optional[list] = None   # worker 行程要送回主行程的量測
+        self._lock = threading.Lock()
+
+    # --- 記錄 -------------------------------------------------------------
+    def span(self, name: str, size: Optional[float] = None):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, size)
+
+    def observe(self, name: str, seconds: float, size: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = _Stage()
+            stage.durations.append(seconds)
+            stage.count += 1
+            stage.seconds += seconds
+            stage.size += size or 0
+            if self._outbox is not None:
+                self._outbox.append(("span", name, seconds, size))
+
+    def incr(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+            if self._outbox is not None:
+                self._outbox.append(("counter", name, value, None))
+
+    def timed(self, name: str, size: Optional[Callable[..., float]] = None) -> Callable:
+        """
+        裝飾器版的 span；size(*args, **kwargs) 由呼叫參數算出輸入大小。
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(name, size(*args, **kwargs) if size else None):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # --- 跨行程 -----------------------------------------------------------
+    def forward(self) -> None:
+        """
+        在 worker 行程呼叫：之後的量測另外暫存一份，等 drain() 送回主行程。
+        """
+        with self._lock:
+            self._outbox = []
+
+    def drain(self) -> list:
+        with self._lock:
+            if self._outbox is None:
+                return []
+            batch, self._outbox = self._outbox, []
+        return batch
+
+    def merge(self, batch: Optional[list]) -> None:
+        for kind, name, value, size in batch or ():
+            if kind == "span":
+                self.observe(name, value, size)
+            else:
+                self.incr(name, value)
+
+    # --- 查詢與匯出 -------------------------------------------------------
+    def summary(self) -> List[dict]:
+        """
+        各階段的統計：[{stage, count, p50, p95, mean, total, size}] (秒；size 為輸入大小總和)，依總耗時排序。
+        """
+        with self._lock:
+            stages = [(name, list(s.durations), s.count, s.seconds, s.size) for name, s in self._stages.items()]
+        rows = [
+            {
+                "stage": name,
+                "count": count,
+                "p50": _quantile(durations, 0.5),
+                "p95": _quantile(durations, 0.95),
+                "mean": seconds / count if count else 0.0,
+                "total": seconds,
+                "size": size,
+            }
+            for name, durations, count, seconds, size in stages
+        ]
+        return sorted(rows, key=lambda r: -r["total"])
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"timestamp": time.time(), "stages": self.summary(), "counters": self.counters()},
+            ensure_ascii=False, indent=2,
+        )
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP instanote_stage_seconds Latency of ingest pipeline stages and model calls.",
+            "# TYPE instanote_stage_seconds summary",
+        ]
+        rows = self.summary()
+        for row in rows:
+            label = f'stage="{row["stage"]}"'
+            lines.append(f'instanote_stage_seconds{{{label},quantile="0.5"}} {row["p50"]:.6f}')
+            lines.append(f'instanote_stage_seconds{{{label},quantile="0.95"}} {row["p95"]:.6f}')
+            lines.append(f"instanote_stage_seconds_sum{{{label}}} {row['total']:.6f}")
+            lines.append(f"instanote_stage_seconds_count{{{label}}} {row['count']}")
+        lines += [
+            "# HELP instanote_stage_input_size_total Total input size seen by each stage.",
+            "# TYPE instanote_stage_input_size_total counter",
+        ]
+        lines += [f'instanote_stage_input_size_total{{stage="{r["stage"]}"}} {r["size"]:g}' for r in rows]
+        lines += [
+            "# HELP instanote_events_total Pipeline event counters.",
+            "# TYPE instanote_events_total counter",
+        ]
+        lines += [f'instanote_events_total{{name="{name}"}} {value:g}' for name, value in sorted(self.counters().items())]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """
+        依副檔名寫出 JSON (.json) 或 Prometheus 文字格式 (其他)，先寫暫存檔再換名。
+        """
+        data = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+# 行程內共用的量測表
+metrics = Metrics()
+span = metrics.span
+observe = metrics.observe
+incr = metrics.incr
+timed = metrics.timed
+merge = metrics.merge
+
+
+@contextmanager
+def profile(path: str, mode: str = PROFILER):
+    """
+    剖析 with 區塊內的執行：mode="cprofile" 寫出 .prof (可用 snakeviz / pstats 檢視) 並在 log 印出前幾名；
+    mode="sampling" 用 pyinstrument 取樣剖析 (需另外安裝)，寫出 HTML。
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if mode == "sampling":
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise RuntimeError("取樣剖析需要安裝 pyinstrument") from e
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            logger.info("wrote sampling profile to %s", path)
+        return
+
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+        logger.info("wrote cProfile stats to %s\n%s", path, out.getvalue())
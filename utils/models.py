@@ -0,0 +1,99 @@
+# utils/models.py
+
+import time
+import logging
+import functools
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+# ------------------------------------------------------------------------
+# 延遲載入的模型登錄表：
+#   - 各 util 用 @register_model("名稱") 登記載入函式，第一次真正用到時才 import / 載入
+#   - 同一行程內所有 session 共用同一份模型 (取代 st.cache_resource，也能在 Streamlit 之外使用)
+#   - warm_up() 可在背景先載入，get() 遇到載入中的模型會等它完成，不會重複載入
+#   - load_times() 回報每個模型的載入耗時
+# ------------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], object]] = {}
+        self._models: Dict[str, object] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._load_times: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], object]) -> None:
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def names(self) -> list:
+        return list(self._loaders)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def get(self, name: str):
+        """
+        取得模型；尚未載入就在這裡載入 (每個模型各自一把鎖，不同模型可同時載入)。
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"未登記的模型：{name}")
+        with self._locks[name]:
+            if name not in self._models:
+                start = time.perf_counter()
+                self._models[name] = self._loaders[name]()
+                self._load_times[name] = time.perf_counter() - start
+                logger.info("loaded model %s in %.2fs", name, self._load_times[name])
+        return self._models[name]
+
+    def warm_up(self, names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        預先載入 names (預設全部)。background=True 時在背景執行緒載入並回傳該執行緒。
+        """
+        names = list(names) if names is not None else self.names()
+
+        def _load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    logger.exception("warm-up failed for model %s", name)
+
+        if not background:
+            _load_all()
+            return None
+        thread = threading.Thread(target=_load_all, name="instanote-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def load_times(self) -> Dict[str, float]:
+        return dict(self._load_times)
+
+
+registry = ModelRegistry()
+
+
+def register_model(name: str):
+    """
+    裝飾器：把載入函式登記到 registry，呼叫被裝飾的函式時回傳共用的模型。
+
+        @register_model("summarizer")
+        def load_multilang_summarizer():
+            ...
+    """
+    def decorator(loader):
+        registry.register(name, loader)
+
+        @functools.wraps(loader)
+        def get_model():
+            return registry.get(name)
+
+        return get_model
+
+    return decorator
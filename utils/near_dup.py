@@ -0,0 +1,161 @@
+# utils/near_dup.py
+
+import os
+import sqlite3
+import hashlib
+from collections import Counter
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from utils.search_index import tokenize
+
+# ------------------------------------------------------------------------
+# 近似重複偵測：每筆筆記內容算一個 64 位元 SimHash，漢明距離 ≤ MAX_DISTANCE 視為重複
+#   - 索引存在筆記庫同一個 SQLite 檔，由 NoteStore 寫入筆記時同步更新
+#   - 以鴿籠原理切成 MAX_DISTANCE + 1 段 (band)：距離 ≤ k 的兩個雜湊至少有一段完全相同，
+#     查詢時只要比對各段命中的候選，不必掃過整個筆記庫
+#   - 調整門檻後 band 數改變，ensure_index() 會自動重建 band 表
+# ------------------------------------------------------------------------
+MAX_DISTANCE = int(os.environ.get("INSTANOTE_DUP_DISTANCE", 3))   # 設為負數即停用
+MIN_TOKENS = 20   # 太短的內容指紋不穩定，不做比對
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS note_simhash (
+    note_id TEXT PRIMARY KEY,
+    hash    INTEGER
+);
+CREATE TABLE IF NOT EXISTS simhash_bands (
+    band    INTEGER NOT NULL,
+    key     INTEGER NOT NULL,
+    note_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS simhash_bands_key ON simhash_bands(band, key);
+CREATE INDEX IF NOT EXISTS simhash_bands_note ON simhash_bands(note_id);
+CREATE TABLE IF NOT EXISTS simhash_meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    以 search_index.tokenize 的 token (CJK bigram / 單字) 為特徵、出現次數為權重的 SimHash。
+    token 數少於 MIN_TOKENS 時回傳 None。
+    """
+    counts = Counter(tokenize(text))
+    if sum(counts.values()) < MIN_TOKENS:
+        return None
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little") for t in counts],
+        dtype=np.uint64,
+    )
+    weights = np.array(list(counts.values()), dtype=np.float64)
+    bits = ((hashes[:, None] >> _BITS) & np.uint64(1)).astype(np.float64)
+    votes = weights @ (2 * bits - 1)
+    return int(sum(1 << i for i in np.flatnonzero(votes > 0)))
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _band_count(max_distance: int) -> int:
+    return max(1, min(max_distance + 1, 16))
+
+
+def _bands(h: int, count: int) -> Iterator[Tuple[int, int]]:
+    width = 64 // count
+    for band in range(count):
+        bits = width if band < count - 1 else 64 - width * (count - 1)
+        yield band, (h >> (band * width)) & ((1 << bits) - 1)
+
+
+def _to_signed(h: int) -> int:
+    # SQLite INTEGER 是有號 64 位元
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def _to_unsigned(h: int) -> int:
+    return h + (1 << 64) if h < 0 else h
+
+
+def ensure_index(conn: sqlite3.Connection, max_distance: int = MAX_DISTANCE) -> None:
+    """
+    建表，補算尚未建指紋的筆記 (例如舊版資料庫)；band 數和設定不同時重建 band 表。
+    """
+    conn.executescript(_SCHEMA)
+    count = _band_count(max_distance)
+    with conn:
+        pending = conn.execute(
+            "SELECT id, content FROM notes WHERE id NOT IN (SELECT note_id FROM note_simhash)"
+        ).fetchall()
+        for note_id, content in pending:
+            index_note(conn, note_id, content, max_distance)
+
+        row = conn.execute("SELECT value FROM simhash_meta WHERE name = 'bands'").fetchone()
+        if row is not None and int(row[0]) == count:
+            return
+        conn.execute("DELETE FROM simhash_bands")
+        for note_id, h in conn.execute("SELECT note_id, hash FROM note_simhash WHERE hash IS NOT NULL").fetchall():
+            conn.executemany(
+                "INSERT INTO simhash_bands (band, key, note_id) VALUES (?, ?, ?)",
+                [(band, key, note_id) for band, key in _bands(_to_unsigned(h), count)],
+            )
+        conn.execute("INSERT OR REPLACE INTO simhash_meta (name, value) VALUES ('bands', ?)", (str(count),))
+
+
+def index_note(conn: sqlite3.Connection, note_id: str, content: str, max_distance: int = MAX_DISTANCE) -> None:
+    unindex_note(conn, note_id)
+    h = simhash(content)
+    conn.execute(
+        "INSERT INTO note_simhash (note_id, hash) VALUES (?, ?)",
+        (note_id, None if h is None else _to_signed(h)),
+    )
+    if h is not None:
+        conn.executemany(
+            "INSERT INTO simhash_bands (band, key, note_id) VALUES (?, ?, ?)",
+            [(band, key, note_id) for band, key in _bands(h, _band_count(max_distance))],
+        )
+
+
+def unindex_note(conn: sqlite3.Connection, note_id: str) -> None:
+    conn.execute("DELETE FROM note_simhash WHERE note_id = ?", (note_id,))
+    conn.execute("DELETE FROM simhash_bands WHERE note_id = ?", (note_id,))
+
+
+def find_duplicate(
+    conn: sqlite3.Connection,
+    content: str,
+    max_distance: int = MAX_DISTANCE,
+    exclude: Optional[str] = None,
+) -> Optional[Tuple[str, int]]:
+    """
+    找出與 content 最接近、漢明距離 ≤ max_distance 的筆記，回傳 (note_id, 距離)；沒有則 None。
+    """
+    if max_distance < 0:
+        return None
+    h = simhash(content)
+    if h is None:
+        return None
+    clauses, params = [], []
+    for band, key in _bands(h, _band_count(max_distance)):
+        clauses.append("(b.band = ? AND b.key = ?)")
+        params.extend((band, key))
+    rows = conn.execute(
+        "SELECT DISTINCT s.note_id, s.hash FROM simhash_bands b "
+        "JOIN note_simhash s ON s.note_id = b.note_id "
+        f"WHERE {' OR '.join(clauses)}",
+        params,
+    ).fetchall()
+    best = None
+    for note_id, other in rows:
+        if note_id == exclude:
+            continue
+        distance = hamming(h, _to_unsigned(other))
+        if distance <= max_distance and (best is None or distance < best[1]):
+            best = (note_id, distance)
+    return best
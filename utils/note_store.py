@@ -0,0 +1,268 @@
+# utils/note_store.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import closing
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from utils import keyword_index, near_dup, search_index
+from utils.metrics import span
+
+# ------------------------------------------------------------------------
+# 持久化筆記庫：每筆筆記以「上傳內容或網址的雜湊」為 id 存進 SQLite，
+# Streamlit 重新執行時只需處理庫裡還沒有的項目
+# ------------------------------------------------------------------------
+STORE_PATH = os.environ.get(
+    "INSTANOTE_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".instanote", "notes.sqlite"),
+)
+
+NOTE_COLUMNS = [
+    "id", "type", "source", "url", "title", "content",
+    "summary", "category", "keywords", "media", "duplicate_of", "created_at",
+]
+_JSON_COLUMNS = ("keywords", "media")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id         TEXT PRIMARY KEY,
+    type       TEXT NOT NULL,
+    source     TEXT NOT NULL,
+    url        TEXT NOT NULL DEFAULT '',
+    title      TEXT NOT NULL DEFAULT '',
+    content    TEXT NOT NULL DEFAULT '',
+    summary    TEXT NOT NULL DEFAULT '',
+    category   TEXT NOT NULL DEFAULT '',
+    keywords   TEXT NOT NULL DEFAULT '[]',
+    media      TEXT NOT NULL DEFAULT '[]',
+    duplicate_of TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_category ON notes(category);
+"""
+
+
+def content_key(data) -> str:
+    """
+    計算上傳檔案 (bytes) 或網址 (str) 的 SHA-256，作為筆記 id。
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class NoteStore:
+    """
+    SQLite 筆記庫。每次操作各自開連線，可安全地在多個 Streamlit session 之間共用。
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # 舊版資料庫沒有 duplicate_of 欄位
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(notes)")}
+            if "duplicate_of" not in columns:
+                conn.execute("ALTER TABLE notes ADD COLUMN duplicate_of TEXT NOT NULL DEFAULT ''")
+            search_index.ensure_index(conn)
+            near_dup.ensure_index(conn)
+            keyword_index.ensure_index(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def has(self, note_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT 1 FROM notes WHERE id = ?", (note_id,)).fetchone() is not None
+
+    def missing(self, note_ids: Iterable[str]) -> List[str]:
+        """
+        回傳 note_ids 中尚未存在於庫裡的 id（保留原順序、去除重複）。
+        """
+        note_ids = list(dict.fromkeys(note_ids))
+        if not note_ids:
+            return []
+        with closing(self._connect()) as conn:
+            existing = set()
+            # SQLite 參數數量有上限，分批查詢
+            for start in range(0, len(note_ids), 500):
+                chunk = note_ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                existing.update(
+                    row[0] for row in conn.execute(f"SELECT id FROM notes WHERE id IN ({marks})", chunk)
+                )
+        return [i for i in note_ids if i not in existing]
+
+    def add_many(self, notes: List[dict]) -> None:
+        """
+        寫入多筆筆記 (dict 需含 id)；同 id 已存在時覆蓋，全文索引、重複偵測索引與關鍵字統計一併更新。
+        """
+        if not notes:
+            return
+        now = time.time()
+        placeholders = ",".join("?" * len(NOTE_COLUMNS))
+        sql = f"INSERT OR REPLACE INTO notes ({', '.join(NOTE_COLUMNS)}) VALUES ({placeholders})"
+        with span("store.add", size=len(notes)), closing(self._connect()) as conn, conn:
+            for note in notes:
+                row = {col: note.get(col, "") for col in NOTE_COLUMNS}
+                for col in _JSON_COLUMNS:
+                    row[col] = json.dumps(note.get(col) or [], ensure_ascii=False)
+                row["created_at"] = note.get("created_at") or now
+
+                # 同步更新全文索引：先移除舊版本的索引，再以新的 rowid 加入
+                old = conn.execute("SELECT rowid FROM notes WHERE id = ?", (row["id"],)).fetchone()
+                if old is not None:
+                    search_index.unindex_note(conn, old[0])
+                cur = conn.execute(sql, tuple(row[col] for col in NOTE_COLUMNS))
+                search_index.index_note(conn, cur.lastrowid, note)
+                near_dup.index_note(conn, row["id"], row["content"])
+                keyword_index.index_note(conn, row["id"], f"{row['title']}\n{row['content']}")
+
+    def find_near_duplicate(self, content: str, exclude: Optional[str] = None) -> Optional[dict]:
+        """
+        找出內容近似重複的既有筆記，回傳 {id, summary, category, keywords, duplicate_of, distance}；
+        沒有則 None。門檻見 near_dup.MAX_DISTANCE。
+        """
+        with closing(self._connect()) as conn:
+            match = near_dup.find_duplicate(conn, content, exclude=exclude)
+            if match is None:
+                return None
+            row = conn.execute(
+                "SELECT id, summary, category, keywords, duplicate_of FROM notes WHERE id = ?", (match[0],)
+            ).fetchone()
+        if row is None:
+            return None
+        return {**dict(row), "keywords": json.loads(row["keywords"]), "distance": match[1]}
+
+    def extract_keywords(self, text: str, summary: str = "", top_k: int = keyword_index.TOP_K) -> List[str]:
+        """
+        以整個筆記庫的詞頻統計為 text (原文) 與摘要擷取關鍵字，見 keyword_index.extract_keywords。
+        """
+        with closing(self._connect()) as conn:
+            return keyword_index.extract_keywords(text, summary, conn=conn, top_k=top_k)
+
+    def search(self, query: str, category: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """
+        全文檢索，依相關度回傳筆記 id。語法見 search_index.build_match_query。
+        """
+        with closing(self._connect()) as conn:
+            return search_index.search(conn, query, category=category, limit=limit)
+
+    def category_counts(self, query: Optional[str] = None) -> dict:
+        """
+        各主題分類的筆記數 (有 query 時只算命中的筆記)。
+        """
+        with closing(self._connect()) as conn:
+            return search_index.category_counts(conn, query)
+
+    def version(self) -> Tuple[int, int]:
+        """
+        回傳 (筆數, 最大 rowid)：新增或覆蓋筆記都會改變這個值，可當作快取鍵。
+        """
+        with closing(self._connect()) as conn:
+            return tuple(conn.execute("SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM notes").fetchone())
+
+    def iter_notes(
+        self,
+        columns: Optional[List[str]] = None,
+        batch_size: int = 500,
+        after_rowid: int = 0,
+        until_rowid: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """
+        依建立時間逐筆產生筆記 dict (keywords / media 已轉回 list)，一次只從資料庫取 batch_size 筆。
+        after_rowid / until_rowid 限定 rowid 範圍 (搭配 version() 的最大 rowid 做增量處理)。
+        """
+        columns = columns or NOTE_COLUMNS
+        sql = f"SELECT {', '.join(columns)} FROM notes WHERE rowid > ?"
+        params = [after_rowid]
+        if until_rowid is not None:
+            sql += " AND rowid <= ?"
+            params.append(until_rowid)
+        with closing(self._connect()) as conn:
+            cur = conn.execute(sql + " ORDER BY created_at, rowid", params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    note = dict(row)
+                    for col in _JSON_COLUMNS:
+                        if col in note:
+                            note[col] = json.loads(note[col])
+                    yield note
+
+    def ids(self) -> List[str]:
+        """
+        依建立時間回傳所有筆記 id (不讀內容)。
+        """
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT id FROM notes ORDER BY created_at, rowid")]
+
+    def get_notes(self, note_ids: Iterable[str], columns: Optional[List[str]] = None) -> List[dict]:
+        """
+        依 note_ids 的順序讀取筆記 dict (keywords / media 已轉回 list)，不存在的 id 略過。
+        """
+        note_ids = list(dict.fromkeys(note_ids))
+        columns = list(columns or NOTE_COLUMNS)
+        if "id" not in columns:
+            columns.insert(0, "id")
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(note_ids), 500):
+                chunk = note_ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for row in conn.execute(f"SELECT {', '.join(columns)} FROM notes WHERE id IN ({marks})", chunk):
+                    note = dict(row)
+                    for col in _JSON_COLUMNS:
+                        if col in note:
+                            note[col] = json.loads(note[col])
+                    found[note["id"]] = note
+        return [found[i] for i in note_ids if i in found]
+
+    def get_content(self, note_id: str) -> str:
+        """
+        單筆筆記的完整原文 (筆記牆展開時才讀)。
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT content FROM notes WHERE id = ?", (note_id,)).fetchone()
+        return row[0] if row is not None else ""
+
+    def substring_search(self, keyword: str, category: Optional[str] = None) -> List[str]:
+        """
+        不分大小寫的原文子字串比對 (全文索引切不出詞時的退路)，依建立時間回傳筆記 id。
+        """
+        sql = "SELECT id FROM notes WHERE instr(lower(content), lower(?)) > 0"
+        params = [keyword]
+        if category:
+            sql += " AND category = ?"
+            params.append(category)
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute(sql + " ORDER BY created_at, rowid", params)]
+
+    def load_df(self, columns: Optional[List[str]] = None, preview_chars: int = 0) -> pd.DataFrame:
+        """
+        把筆記讀成 DataFrame (依建立時間排序)，keywords / media 轉回 list。
+        preview_chars > 0 時另加 preview 欄 (原文前幾個字)，不必載入整份原文。
+        """
+        columns = columns or NOTE_COLUMNS
+        select = ", ".join(columns)
+        if preview_chars:
+            select += f", substr(content, 1, {int(preview_chars)}) AS preview"
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query(
+                f"SELECT {select} FROM notes ORDER BY created_at, rowid", conn
+            )
+        for col in _JSON_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].map(json.loads)
+        return df
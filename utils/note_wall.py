@@ -0,0 +1,75 @@
+# utils/note_wall.py
+
+import math
+from typing import Callable, Dict
+
+import pandas as pd
+import streamlit as st
+
+# ------------------------------------------------------------------------
+# 分頁顯示筆記牆：
+#   - 只渲染目前這一頁 (PAGE_SIZE 筆) 的 expander，筆記再多頁面元素數量也固定
+#   - 牆上只用原文前 PREVIEW_CHARS 個字，打開「顯示完整原文」才向筆記庫讀整份原文
+#   - 以欄位 (Series → list) 取值，不逐列 iterrows
+# ------------------------------------------------------------------------
+PAGE_SIZE = 24
+PREVIEW_CHARS = 300
+
+# 筆記牆需要的欄位 (不含 content，原文改用 preview 與展開時讀取)
+WALL_COLUMNS = ["id", "type", "source", "url", "title", "summary", "category", "keywords", "duplicate_of", "created_at"]
+
+
+def page_count(total: int, page_size: int = PAGE_SIZE) -> int:
+    return max(1, math.ceil(total / page_size))
+
+
+def page_slice(df: pd.DataFrame, page: int, page_size: int = PAGE_SIZE) -> pd.DataFrame:
+    """
+    依主題穩定排序 (同主題內保留原本的相關度順序) 後，取第 page 頁 (從 1 起算)。
+    """
+    ordered = df.sort_values("主題", kind="stable")
+    start = (page - 1) * page_size
+    return ordered.iloc[start:start + page_size]
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _load_content(_store, note_id: str, version: tuple) -> str:
+    return _store.get_content(note_id)
+
+
+def render_note_page(
+    store,
+    page_df: pd.DataFrame,
+    topic_counts: Dict[str, int],
+    titles_by_id: Dict[str, str],
+    on_similar: Callable[[str], None],
+    version: tuple = (),
+) -> None:
+    """
+    渲染一頁筆記：按主題分段、兩欄排列。topic_counts 為各主題在篩選結果中的總筆數。
+    """
+    labels = page_df["title"].where(page_df["title"] != "", page_df["source"]).tolist()
+    previews = page_df["preview"].tolist()
+    columns = zip(
+        page_df["id"].tolist(), page_df["主題"].tolist(), labels,
+        page_df["摘要"].tolist(), previews, page_df["duplicate_of"].tolist(),
+    )
+
+    current_topic, position, left_col, right_col = None, 0, None, None
+    for note_id, topic, label, summary, preview, duplicate_of in columns:
+        if topic != current_topic:
+            st.subheader(f"📂 {topic} ({topic_counts.get(topic, 0)})")
+            left_col, right_col = st.columns(2)
+            current_topic, position = topic, 0
+        with (left_col if position % 2 == 0 else right_col).expander(f"📎 {label}"):
+            if duplicate_of:
+                original = titles_by_id.get(duplicate_of) or duplicate_of[:12]
+                st.caption(f"🔁 與「{original}」內容重複，沿用其摘要與分類")
+            st.markdown(f"**摘要：** {summary}")
+            if st.toggle("📖 顯示完整原文", key=f"full_{note_id}"):
+                st.markdown(f"**原文內容：**\n{_load_content(store, note_id, version)}")
+            else:
+                more = "..." if len(preview) >= PREVIEW_CHARS else ""
+                st.markdown(f"**原文內容：**\n{preview}{more}")
+            st.button("🔗 找相似筆記", key=f"similar_{note_id}", on_click=on_similar, args=(note_id,))
+        position += 1
@@ -1,18 +1,381 @@
-from notion_client import Client
-
-def upload_to_notion(page_id, summary, category, source_text, notion_token):
-    notion = Client(auth=notion_token)
-    notion.pages.create(
-        parent={"database_id": page_id},
-        properties={
-            "摘要": {"title": [{"text": {"content": summary}}]},
-            "分類": {"select": {"name": category}},
-        },
-        children=[
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {"text": [{"type": "text", "text": {"content": source_text[:1900]}}]}
+# utils/notion_api.py
+
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import closing
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+from utils.note_store import STORE_PATH, content_key
+
+# ------------------------------------------------------------------------
+# Notion 同步引擎：
+#   - 同一組 token / database 共用一個 notion_client.Client
+#   - 多執行緒並行送出，但整體請求速率受 RateLimiter 控制 (Notion 約每秒 3 個請求)
+#   - 429 依 Retry-After 等待，5xx / 逾時以指數退避重試
+#   - 長內容切成多個 paragraph block (每段 ≤ 2000 字、每個請求 ≤ 100 個 block)
+#   - 本地同步狀態表記錄每筆筆記的內容雜湊與 Notion 頁面 id，重複同步只送新增或有變動的筆記
+# 測試時可用 base_url (或 INSTANOTE_NOTION_BASE_URL) 指向本地的假 Notion 伺服器
+# ------------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+SYNC_STATE_PATH = os.environ.get(
+    "INSTANOTE_NOTION_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(STORE_PATH)), "notion_sync.sqlite"),
+)
+NOTION_BASE_URL = os.environ.get("INSTANOTE_NOTION_BASE_URL") or None
+REQUESTS_PER_SECOND = 3.0
+MAX_WORKERS = 4
+MAX_RETRIES = 5
+TEXT_LIMIT = 2000
+BLOCKS_PER_REQUEST = 100
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# notion_client 的 RequestTimeoutError 沒有 status，只有這個 code
+TIMEOUT_CODE = "notionhq_client_request_timeout"
+
+# 筆記欄位 → Notion 資料庫屬性名稱；資料庫裡沒有的屬性會自動略過
+PROPERTY_NAMES = {
+    "summary": "摘要",
+    "category": "分類",
+    "title": "標題",
+    "url": "網址",
+    "keywords": "關鍵字",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notion_sync (
+    database_id  TEXT NOT NULL,
+    note_id      TEXT NOT NULL,
+    page_id      TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    synced_at    REAL NOT NULL,
+    PRIMARY KEY (database_id, note_id)
+);
+"""
+
+
+class RateLimiter:
+    """
+    讓所有執行緒的請求平均間隔 1/rate 秒；遇到 429 時 pause() 讓大家一起等。
+    """
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+def split_text(text: str, limit: int = TEXT_LIMIT) -> List[str]:
+    """
+    依段落把文字切成每段不超過 limit 字；單一段落太長才硬切。
+    """
+    chunks, current = [], ""
+    for paragraph in (text or "").split("\n"):
+        while len(paragraph) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:limit])
+            paragraph = paragraph[limit:]
+        if current and len(current) + 1 + len(paragraph) > limit:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n{paragraph}" if current else paragraph
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def content_blocks(text: str) -> List[dict]:
+    return [
+        {
+            "object": "block",
+            "type": "paragraph",
+            "paragraph": {"rich_text": [{"type": "text", "text": {"content": chunk}}]},
+        }
+        for chunk in split_text(text)
+    ]
+
+
+def _property_value(kind: str, value) -> Optional[dict]:
+    if kind in ("title", "rich_text"):
+        return {kind: [{"type": "text", "text": {"content": str(value)[:TEXT_LIMIT]}}]}
+    if kind == "select":
+        # Notion 的選項名稱不能有逗號
+        return {"select": {"name": str(value).replace(",", " ")[:100]}} if value else {"select": None}
+    if kind == "multi_select":
+        names = value if isinstance(value, (list, tuple)) else [value] if value else []
+        return {"multi_select": [{"name": str(n).replace(",", " ")[:100]} for n in names]}
+    if kind == "url":
+        return {"url": value or None}
+    return None
+
+
+def _is_timeout(error: Exception) -> bool:
+    """
+    notion_client 的 RequestTimeoutError、httpx 的 TimeoutException 或內建 TimeoutError 都算逾時。
+    """
+    if isinstance(error, TimeoutError) or getattr(error, "code", None) == TIMEOUT_CODE:
+        return True
+    return any("Timeout" in cls.__name__ for cls in type(error).__mro__)
+
+
+def retry_after_seconds(value) -> Optional[float]:
+    """
+    解析 Retry-After：可能是秒數，也可能是 HTTP-date；無法解析時回傳 None 改用指數退避。
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def note_hash(note: dict) -> str:
+    fields = [note.get(k) or "" for k in ("title", "summary", "category", "content", "url")]
+    fields.append(list(note.get("keywords") or []))
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class NotionSync:
+    """
+    把筆記同步到一個 Notion 資料庫。notes 為 dict，需含 id，其餘欄位同 NoteStore。
+    client 可直接注入 (測試用)；否則以 token 建立，base_url 可指向假伺服器。
+    """
+
+    def __init__(
+        self,
+        token: str,
+        database_id: str,
+        state_path: str = SYNC_STATE_PATH,
+        base_url: Optional[str] = NOTION_BASE_URL,
+        client=None,
+        rate: float = REQUESTS_PER_SECOND,
+        max_workers: int = MAX_WORKERS,
+    ):
+        if client is None:
+            from notion_client import Client  # 用到同步時才匯入
+
+            options = {"auth": token}
+            if base_url:
+                options["base_url"] = base_url
+            client = Client(**options)
+        self.client = client
+        self.database_id = database_id
+        self.state_path = state_path
+        self.limiter = RateLimiter(rate)
+        self.max_workers = max_workers
+        self._properties = None
+        os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.state_path, timeout=30)
+
+    # --- 請求 -------------------------------------------------------------
+    def _call(self, fn: Callable, **kwargs):
+        """
+        經過速率限制送出請求；429 依 Retry-After 等待，5xx 與逾時以指數退避重試。
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.wait()
+            try:
+                return fn(**kwargs)
+            except Exception as e:
+                status = getattr(e, "status", None)
+                timed_out = status is None and _is_timeout(e)
+                if (status not in RETRY_STATUSES and not timed_out) or attempt == MAX_RETRIES:
+                    raise
+                headers = getattr(e, "headers", None) or {}
+                delay = retry_after_seconds(headers.get("Retry-After") or headers.get("retry-after"))
+                if delay is None:
+                    delay = min(30.0, 0.5 * 2 ** attempt) * (1 + random.random() * 0.25)
+                if status == 429:
+                    self.limiter.pause(delay)
+                logger.info(
+                    "notion %s, retrying in %.1fs (attempt %d)",
+                    "timeout" if timed_out else status, delay, attempt + 1,
+                )
+                time.sleep(delay)
+
+    def _database_properties(self) -> Dict[str, str]:
+        """
+        資料庫的屬性名稱 → 型別，只查一次。
+        """
+        if self._properties is None:
+            database = self._call(self.client.databases.retrieve, database_id=self.database_id)
+            self._properties = {name: prop["type"] for name, prop in database["properties"].items()}
+        return self._properties
+
+    def build_properties(self, note: dict) -> dict:
+        schema = self._database_properties()
+        properties = {}
+        for field, name in PROPERTY_NAMES.items():
+            if name not in schema:
+                continue
+            value = _property_value(schema[name], note.get(field))
+            if value is not None:
+                properties[name] = value
+        return properties
+
+    def _append_blocks(self, block_id: str, blocks: List[dict]) -> None:
+        for start in range(0, len(blocks), BLOCKS_PER_REQUEST):
+            self._call(
+                self.client.blocks.children.append,
+                block_id=block_id,
+                children=blocks[start:start + BLOCKS_PER_REQUEST],
+            )
+
+    def _create(self, note: dict) -> str:
+        blocks = content_blocks(note.get("content", ""))
+        page = self._call(
+            self.client.pages.create,
+            parent={"database_id": self.database_id},
+            properties=self.build_properties(note),
+            children=blocks[:BLOCKS_PER_REQUEST],
+        )
+        self._append_blocks(page["id"], blocks[BLOCKS_PER_REQUEST:])
+        return page["id"]
+
+    def _update(self, note: dict, page_id: str) -> str:
+        """
+        更新屬性並換掉頁面內容；頁面已在 Notion 被刪除時改為重新建立。
+        """
+        try:
+            self._call(self.client.pages.update, page_id=page_id, properties=self.build_properties(note))
+        except Exception as e:
+            if getattr(e, "status", None) == 404:
+                return self._create(note)
+            raise
+        cursor = None
+        old_blocks = []
+        while True:
+            kwargs = {"block_id": page_id, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            listing = self._call(self.client.blocks.children.list, **kwargs)
+            old_blocks.extend(block["id"] for block in listing["results"])
+            if not listing.get("has_more"):
+                break
+            cursor = listing["next_cursor"]
+        for block_id in old_blocks:
+            self._call(self.client.blocks.delete, block_id=block_id)
+        self._append_blocks(page_id, content_blocks(note.get("content", "")))
+        return page_id
+
+    # --- 同步 -------------------------------------------------------------
+    def sync(self, notes: Iterable[dict], progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        同步 notes，回傳 {"created", "updated", "skipped", "failed", "errors": [(note_id, 訊息)]}。
+        progress(done, total) 會在每筆送出完成後呼叫。
+        """
+        notes = list({note["id"]: note for note in notes}.values())
+        with closing(self._connect()) as conn:
+            state = {
+                note_id: (page_id, digest)
+                for note_id, page_id, digest in conn.execute(
+                    "SELECT note_id, page_id, content_hash FROM notion_sync WHERE database_id = ?",
+                    (self.database_id,),
+                )
             }
-        ]
-    )
+
+        result = {"created": 0, "updated": 0, "skipped": 0, "failed": 0, "errors": []}
+        pending = []
+        for note in notes:
+            digest = note_hash(note)
+            page_id, old_digest = state.get(note["id"], (None, None))
+            if old_digest == digest:
+                result["skipped"] += 1
+            else:
+                pending.append((note, digest, page_id))
+        if not pending:
+            return result
+
+        def push(note, page_id):
+            return self._update(note, page_id) if page_id else self._create(note)
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool, closing(self._connect()) as conn:
+            futures = {pool.submit(push, note, page_id): (note, digest, page_id) for note, digest, page_id in pending}
+            for future in as_completed(futures):
+                note, digest, old_page_id = futures[future]
+                try:
+                    page_id = future.result()
+                except Exception as e:
+                    result["failed"] += 1
+                    result["errors"].append((note["id"], str(e)))
+                else:
+                    result["updated" if old_page_id else "created"] += 1
+                    with conn:
+                        conn.execute(
+                            "INSERT OR REPLACE INTO notion_sync "
+                            "(database_id, note_id, page_id, content_hash, synced_at) VALUES (?, ?, ?, ?, ?)",
+                            (self.database_id, note["id"], page_id, digest, time.time()),
+                        )
+                done += 1
+                if progress is not None:
+                    progress(done, len(pending))
+        return result
+
+
+_syncs: Dict[tuple, NotionSync] = {}
+_syncs_lock = threading.Lock()
+
+
+def get_notion_sync(token: str, database_id: str) -> NotionSync:
+    """
+    同一組 token / database 在行程內共用一個 NotionSync (也就共用同一個 Client)。
+    """
+    key = (token, database_id)
+    with _syncs_lock:
+        if key not in _syncs:
+            _syncs[key] = NotionSync(token, database_id)
+        return _syncs[key]
+
+
+def upload_to_notion(page_id, summary, category, source_text, notion_token, url="", title="", keywords=None):
+    """
+    單筆上傳 (舊介面)，內部走 NotionSync：內容沒變就不會重送。失敗時丟出例外。
+    """
+    note = {
+        "id": content_key(url or source_text),
+        "title": title,
+        "summary": summary,
+        "category": category,
+        "content": source_text,
+        "url": url,
+        "keywords": keywords or [],
+    }
+    result = get_notion_sync(notion_token, page_id).sync([note])
+    if result["errors"]:
+        raise RuntimeError(result["errors"][0][1])
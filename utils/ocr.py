@@ -1,8 +1,188 @@
-import pytesseract
-from PIL import Image
-import streamlit as st
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+import threading
 
-@st.cache_data(show_spinner=False)
+from utils._compat import cache_data, cpu_share
+from utils.metrics import incr, observe, span
+
+OCR_LANG = "chi_tra+eng"
+
+# ------------------------------------------------------------------------
+# 網頁圖片的 OCR 前處理：
+#   1) 太小 (icon、頭像、追蹤像素) 或資訊量太低 (純色、漸層) 的圖片直接略過
+#   2) 以 dHash 感知雜湊去除重複圖片 (重複的 logo、同一張圖不同尺寸)
+#   3) 縮小過大的圖片並二值化後再交給 Tesseract
+#   4) 剩下的圖片用行程池平行 OCR；在背景工作的 worker 行程裡，行程池大小為
+#      OCR_WORKERS // worker 行程數，所有 worker 合起來剛好用滿核心
+# ------------------------------------------------------------------------
+MIN_SIDE = 48            # 寬或高小於這個像素就略過
+MIN_PIXELS = 120 * 120   # 面積太小也略過
+MIN_ENTROPY = 2.5        # 灰階熵 (bits) 低於此值視為沒有文字資訊
+DUPLICATE_DISTANCE = 4   # dHash 漢明距離 ≤ 此值視為重複
+MAX_SIDE = 2000          # 長邊超過就等比縮小
+OCR_WORKERS = int(os.environ.get("INSTANOTE_OCR_WORKERS", os.cpu_count() or 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_ocr_worker() -> None:
+    # 每個行程已經各佔一核，避免 Tesseract 內部再開多執行緒互搶
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # 用 spawn 啟動，避免在已有多執行緒 (Streamlit、模型載入) 的行程裡 fork
+                _pool = ProcessPoolExecutor(
+                    max_workers=cpu_share(OCR_WORKERS),
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_init_ocr_worker,
+                )
+    return _pool
+
+
+def preprocess(img):
+    """
+    灰階 → 長邊縮到 MAX_SIDE 以內 → 自動對比 → 以 Otsu 門檻二值化。
+    """
+    from PIL import ImageOps
+
+    img = ImageOps.exif_transpose(img).convert("L")
+    if max(img.size) > MAX_SIDE:
+        img.thumbnail((MAX_SIDE, MAX_SIDE))
+    img = ImageOps.autocontrast(img)
+    threshold = _otsu_threshold(img.histogram())
+    return img.point(lambda p: 255 if p > threshold else 0)
+
+
+def _otsu_threshold(histogram: list) -> int:
+    total = sum(histogram)
+    sum_all = sum(i * h for i, h in enumerate(histogram))
+    sum_bg, weight_bg, best, threshold = 0.0, 0, 0.0, 127
+    for i, h in enumerate(histogram):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def dhash(img, size: int = 8) -> int:
+    """
+    差異雜湊：縮成 (size+1)×size 灰階，比較相鄰像素亮度，得到 size² 位元的整數。
+    """
+    small = img.convert("L").resize((size + 1, size))
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def _ocr_file(path: str) -> tuple:
+    """
+    在 OCR 行程裡執行：前處理 + Tesseract，回傳 (文字, 耗時秒數)。
+    """
+    import pytesseract
+    from PIL import Image
+
+    start = time.perf_counter()
+    with Image.open(path) as img:
+        text = pytesseract.image_to_string(preprocess(img), lang=OCR_LANG)
+    return text, time.perf_counter() - start
+
+
+def select_images(paths: list[str]) -> tuple:
+    """
+    篩選值得 OCR 的圖片，回傳 (保留的路徑, 各略過原因的計數)。
+    """
+    from PIL import Image
+
+    kept, hashes = [], []
+    skipped = {"small": 0, "low_entropy": 0, "duplicate": 0, "unreadable": 0}
+    for path in paths:
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+                if min(width, height) < MIN_SIDE or width * height < MIN_PIXELS:
+                    skipped["small"] += 1
+                    continue
+                gray = img.convert("L")
+                if gray.entropy() < MIN_ENTROPY:
+                    skipped["low_entropy"] += 1
+                    continue
+                h = dhash(gray)
+        except Exception:
+            skipped["unreadable"] += 1
+            continue
+        if any(bin(h ^ other).count("1") <= DUPLICATE_DISTANCE for other in hashes):
+            skipped["duplicate"] += 1
+            continue
+        hashes.append(h)
+        kept.append(path)
+    return kept, skipped
+
+
+def ocr_images(paths: list[str]) -> tuple:
+    """
+    對一頁的所有圖片做篩選 + 平行 OCR。回傳 (依原順序的文字清單, 統計)：
+      統計包含 total / ocr / skipped_* / filter_seconds / wall_seconds / cpu_seconds，
+      以及 saved_seconds：相較於逐張、不篩選地 OCR，估計省下的時間。
+    """
+    start = time.perf_counter()
+    kept, skipped = select_images(paths)
+    filter_seconds = time.perf_counter() - start
+    observe("ocr.filter", filter_seconds, len(paths))
+    for reason, count in skipped.items():
+        incr(f"ocr.skipped_{reason}", count)
+
+    texts, cpu_seconds = [], 0.0
+    ocr_start = time.perf_counter()
+    if kept:
+        for text, seconds in _get_pool().map(_ocr_file, kept):
+            texts.append(text)
+            cpu_seconds += seconds
+            observe("ocr.tesseract", seconds, 1)
+    wall_seconds = time.perf_counter() - ocr_start
+
+    # 略過的圖片以平均單張耗時估算；逐張 OCR 的成本即各張耗時總和
+    per_image = cpu_seconds / len(kept) if kept else 0.0
+    serial_estimate = cpu_seconds + per_image * sum(skipped.values())
+    stats = {
+        "total": len(paths),
+        "ocr": len(kept),
+        **{f"skipped_{reason}": count for reason, count in skipped.items()},
+        "filter_seconds": filter_seconds,
+        "wall_seconds": wall_seconds,
+        "cpu_seconds": cpu_seconds,
+        "saved_seconds": max(0.0, serial_estimate - (filter_seconds + wall_seconds)),
+    }
+    return texts, stats
+
+
+@cache_data(show_spinner=False)
 def extract_text_from_image(image_file):
-    img = Image.open(image_file)
-    return pytesseract.image_to_string(img, lang="chi_tra+eng")
+    # pytesseract / PIL 在第一次 OCR 時才匯入
+    import pytesseract
+    from PIL import Image
+
+    with span("ocr.tesseract", size=1):
+        img = Image.open(image_file)
+        return pytesseract.image_to_string(preprocess(img), lang=OCR_LANG)
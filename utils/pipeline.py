@@ -0,0 +1,145 @@
+# utils/pipeline.py
+
+import logging
+from typing import List, Optional
+
+from utils.ingest import fetch_page
+from utils.ocr import extract_text_from_image, ocr_images
+from utils.whisper_asr import transcribe_audio
+from utils.gpt import multilang_summarize_and_classify_batch, DEFAULT_CLASSIFY_MODE
+from utils.metrics import incr, span
+from utils.note_store import content_key
+
+# ------------------------------------------------------------------------
+# 單筆項目的處理流程：擷取 → OCR/ASR → 多語摘要分類
+# 不依賴 Streamlit 的頁面狀態，背景工作與其他入口都共用這裡
+# ------------------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+
+def page_text_with_media(page: dict) -> str:
+    """
+    頁面可見文字 + 圖片 OCR (先篩掉小圖/重複圖，再平行辨識) + 每段音訊的 ASR。
+    """
+    text_content = page["text"]
+    ocr_texts, ocr_stats = ocr_images(page["images"])
+    page["ocr_stats"] = ocr_stats
+    logger.info(
+        "OCR %d/%d images (skipped small=%d low_entropy=%d duplicate=%d unreadable=%d), "
+        "%.2fs wall, ~%.2fs saved",
+        ocr_stats["ocr"], ocr_stats["total"], ocr_stats["skipped_small"],
+        ocr_stats["skipped_low_entropy"], ocr_stats["skipped_duplicate"],
+        ocr_stats["skipped_unreadable"], ocr_stats["wall_seconds"], ocr_stats["saved_seconds"],
+    )
+    for text in ocr_texts:
+        text_content += "\n" + text
+    for audio_path in page["audios"]:
+        with open(audio_path, "rb") as f:
+            text_content += "\n" + transcribe_audio(f)
+    return text_content
+
+
+def build_url_note(
+    url: str, note_type: str = "url", extract_mode: Optional[str] = None, page: Optional[dict] = None,
+) -> dict:
+    """
+    抓取網址並做 OCR/ASR，回傳尚未摘要的筆記 (summary / category / keywords 為空)。
+    extract_mode 為 "main" (只留正文) 或 "full"，None 依 INSTANOTE_EXTRACT_MODE。
+    已由 ingest.iter_fetched_pages 抓好的 page 可直接傳入，不再重抓。
+    """
+    if page is None:
+        page = fetch_page(url, extract_mode=extract_mode)
+    return {
+        "id": content_key(url),
+        "type": note_type,
+        "source": url,
+        "url": url,
+        "title": page["title"],
+        "content": page_text_with_media(page),
+        "summary": "",
+        "category": "",
+        "keywords": [],
+        "media": page["images"] + page["audios"],
+        "duplicate_of": "",
+    }
+
+
+def build_file_note(path: str, name: str, kind: str, key: Optional[str] = None) -> dict:
+    """
+    讀取本地檔案做 OCR (image) / ASR (audio) / 純文字 (text)，回傳尚未摘要的筆記。
+    """
+    if kind == "image":
+        with open(path, "rb") as f:
+            content = extract_text_from_image(f)
+    elif kind == "audio":
+        with open(path, "rb") as f:
+            content = transcribe_audio(f)
+    else:
+        with open(path, "rb") as f:
+            content = f.read().decode("utf-8")
+    if key is None:
+        with open(path, "rb") as f:
+            key = content_key(f.read())
+    return {
+        "id": key,
+        "type": "text" if kind == "text" else "file",
+        "source": name,
+        "url": "",
+        "title": name,
+        "content": content,
+        "summary": "",
+        "category": "",
+        "keywords": [],
+        "media": [],
+        "duplicate_of": "",
+    }
+
+
+def reuse_near_duplicate(note: dict, store) -> bool:
+    """
+    若筆記庫裡已有內容近似重複的筆記，直接沿用它的 summary / category / keywords，
+    並以 duplicate_of 指向最早的那一筆，省下摘要分類的推論。有沿用時回傳 True。
+    """
+    with span("near_dup.lookup", size=len(note["content"])):
+        match = store.find_near_duplicate(note["content"], exclude=note["id"])
+    if match is None:
+        return False
+    incr("near_dup.reused")
+    note.update(
+        summary=match["summary"],
+        category=match["category"],
+        keywords=match["keywords"],
+        duplicate_of=match["duplicate_of"] or match["id"],
+    )
+    return True
+
+
+def summarize_notes(
+    notes: List[dict],
+    classify_mode: str = DEFAULT_CLASSIFY_MODE,
+    labels: Optional[List[str]] = None,
+    store=None,
+) -> List[dict]:
+    """
+    對 notes 的 content 批次做多語摘要分類，結果直接填回 summary / category / keywords。
+    有 store 時關鍵字改用整個筆記庫的詞頻統計 (IDF) 重新擷取。
+    """
+    with span("pipeline.summarize", size=len(notes)):
+        results = multilang_summarize_and_classify_batch(
+            [n["content"] for n in notes],
+            classify_mode=classify_mode,
+            labels=labels or None,
+        )
+    for note, (summary, category, keywords) in zip(notes, results):
+        if store is not None and not summary.startswith("❌"):
+            with span("keywords.extract", size=len(note["content"])):
+                keywords = store.extract_keywords(f"{note['title']}\n{note['content']}", summary)
+        note.update(summary=summary, category=category, keywords=keywords)
+    return notes
+
+
+def note_error(note: dict) -> Optional[str]:
+    """
+    摘要或分類失敗時回傳錯誤訊息 (以 ❌ 開頭)，否則回傳 None。
+    """
+    return next((v for v in (note["summary"], note["category"]) if v.startswith("❌")), None)
@@ -2,7 +2,26 @@ import pandas as pd
 
 def filter_notes(df, keyword=None, category=None):
     if keyword:
-        df = df[df["原文"].str.contains(keyword, case=False, na=False)]
+        # 關鍵字視為一般字串，不當成正規表示式
+        df = df[df["原文"].str.contains(keyword, case=False, na=False, regex=False)]
     if category and category != "全部":
         df = df[df["主題"] == category]
     return df
+
+def search_notes(store, df, keyword=None, category=None):
+    """
+    用筆記庫的全文索引 (FTS5) 取代逐筆掃描原文：結果依相關度排序，再按主題分類篩選。
+    df 需含 id 欄；關鍵字切不出可搜尋的詞時 (例如只有標點)，退回筆記庫的子字串比對。
+    """
+    if not keyword or not keyword.strip():
+        return filter_notes(df, category=category)
+    category = category if category and category != "全部" else None
+    ids = store.search(keyword, category=category)
+    if not ids and not any(ch.isalnum() for ch in keyword):
+        ids = store.substring_search(keyword, category=category)
+    return (
+        df.set_index("id", drop=False)
+        .reindex(ids)
+        .dropna(subset=["id"])
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,156 @@
+# utils/search_index.py
+
+import re
+import sqlite3
+from typing import Dict, List, Optional
+
+# ------------------------------------------------------------------------
+# 全文檢索：SQLite FTS5 倒排索引 (標題、摘要、原文、關鍵字)
+#   - 中日韓文字切成「字元二元組」(bigram)，英文等以單字為單位並轉小寫
+#   - 由 NoteStore 在寫入筆記時同步更新，不需整批重建
+# ------------------------------------------------------------------------
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"([{_CJK}]+)|((?:(?![{_CJK}])[^\W_])+)")
+
+# bm25 欄位權重：title, summary, content, keywords
+_BM25_WEIGHTS = (8.0, 4.0, 1.0, 4.0)
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, summary, content, keywords,
+    tokenize = 'unicode61'
+);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切詞：CJK 連續字串切成 bigram，並在結尾補上最後一個字 (讓單字查詢也找得到)；
+    其他文字以單字為單位、轉小寫。
+    """
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(text or ""):
+        if word:
+            tokens.append(word.lower())
+            continue
+        tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        tokens.append(cjk[-1])
+    return tokens
+
+
+def _query_tokens(text: str) -> List[str]:
+    """
+    查詢用切詞：CJK 只取 bigram (不補尾字)，單一個 CJK 字則保留原字。
+    """
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(text):
+        if word:
+            tokens.append(word.lower())
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+def build_match_query(query: str) -> str:
+    """
+    把使用者輸入轉成 FTS5 MATCH 語法：
+      - "雙引號內" 視為片語，必須連續出現
+      - 其餘以空白分隔的詞全部都要命中 (AND)；最後一個 token 做前綴比對，方便邊打邊搜
+    沒有可搜尋的 token 時回傳空字串。
+    """
+    clauses = []
+    for phrase, term in re.findall(r'"([^"]*)"|(\S+)', query or ""):
+        tokens = _query_tokens(phrase or term)
+        if not tokens:
+            continue
+        clause = '"' + " ".join(tokens) + '"'
+        # 片語不做前綴；單一 CJK 字也要前綴，才能比對到以它開頭的 bigram
+        if term:
+            clause += " *"
+        clauses.append(clause)
+    return " AND ".join(clauses)
+
+
+def ensure_index(conn: sqlite3.Connection) -> None:
+    """
+    建立 FTS 表；若和 notes 表筆數對不上 (例如舊版資料庫)，就重建一次。
+    """
+    conn.executescript(_SCHEMA)
+    indexed = conn.execute("SELECT COUNT(*) FROM notes_fts").fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+    if indexed == total:
+        return
+    with conn:
+        conn.execute("DELETE FROM notes_fts")
+        for row in conn.execute("SELECT rowid, title, summary, content, keywords FROM notes"):
+            conn.execute(
+                "INSERT INTO notes_fts (rowid, title, summary, content, keywords) VALUES (?, ?, ?, ?, ?)",
+                (row[0], *(" ".join(tokenize(v)) for v in row[1:])),
+            )
+
+
+def index_note(conn: sqlite3.Connection, rowid: int, note: dict) -> None:
+    keywords = note.get("keywords") or []
+    if not isinstance(keywords, str):
+        keywords = " ".join(keywords)
+    conn.execute(
+        "INSERT INTO notes_fts (rowid, title, summary, content, keywords) VALUES (?, ?, ?, ?, ?)",
+        (
+            rowid,
+            " ".join(tokenize(note.get("title", ""))),
+            " ".join(tokenize(note.get("summary", ""))),
+            " ".join(tokenize(note.get("content", ""))),
+            " ".join(tokenize(keywords)),
+        ),
+    )
+
+
+def unindex_note(conn: sqlite3.Connection, rowid: int) -> None:
+    conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (rowid,))
+
+
+def search(
+    conn: sqlite3.Connection,
+    query: str,
+    category: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[str]:
+    """
+    依 bm25 相關度回傳符合 query 的筆記 id (最相關在前)，可再限定主題分類。
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+    sql = (
+        "SELECT n.id FROM notes_fts JOIN notes n ON n.rowid = notes_fts.rowid "
+        "WHERE notes_fts MATCH ?"
+    )
+    params: list = [match]
+    if category:
+        sql += " AND n.category = ?"
+        params.append(category)
+    sql += f" ORDER BY bm25(notes_fts, {', '.join(map(str, _BM25_WEIGHTS))})"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+def category_counts(conn: sqlite3.Connection, query: Optional[str] = None) -> Dict[str, int]:
+    """
+    主題分類的分面統計：沒有 query 時統計全部筆記，有 query 時只統計命中的筆記。
+    """
+    match = build_match_query(query) if query else ""
+    if match:
+        rows = conn.execute(
+            "SELECT n.category, COUNT(*) FROM notes_fts JOIN notes n ON n.rowid = notes_fts.rowid "
+            "WHERE notes_fts MATCH ? GROUP BY n.category",
+            (match,),
+        )
+    elif query:
+        return {}
+    else:
+        rows = conn.execute("SELECT category, COUNT(*) FROM notes GROUP BY category")
+    return {category: count for category, count in rows}
@@ -0,0 +1,234 @@
+# utils/vector_index.py
+
+import os
+import json
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.note_store import STORE_PATH
+
+# ------------------------------------------------------------------------
+# 語意相似搜尋：筆記句向量存成連續的 float32 檔案並以 memmap 讀取
+#   - vectors.f32：每列一個 L2 正規化向量，新筆記直接附加在檔尾，不需重建
+#   - ids.txt：與向量同順序的筆記 id (寫入順序：向量 → 簽章 → id，id 數即有效列數；
+#     附加中斷留下的多餘列在下次寫入前截掉)
+#   - lsh.u64：隨機超平面 LSH 的 64 位元簽章，大型語料可先用漢明距離粗篩再精算
+# ------------------------------------------------------------------------
+VECTOR_DIR = os.environ.get(
+    "INSTANOTE_VECTOR_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(STORE_PATH)), "vectors"),
+)
+LSH_BITS = 64
+APPROX_THRESHOLD = 50_000   # 超過這個筆數時預設改用近似搜尋
+APPROX_CANDIDATES = 50      # 近似搜尋時，每個 k 保留多少候選再精算
+
+
+class VectorIndex:
+    """
+    以 memmap 讀取的向量索引。寫入由同一行程內的鎖保護；讀取只看 ids.txt 已寫入的列數，
+    所以附加到一半的資料不會被讀到。
+    """
+
+    def __init__(self, root: str = VECTOR_DIR, dim: Optional[int] = None, seed: int = 0):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._vectors_path = os.path.join(root, "vectors.f32")
+        self._ids_path = os.path.join(root, "ids.txt")
+        self._lsh_path = os.path.join(root, "lsh.u64")
+        self._meta_path = os.path.join(root, "meta.json")
+        self._lock = threading.Lock()
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        else:
+            meta = {"dim": dim, "seed": seed}
+        self.dim = meta["dim"]
+        self.seed = meta["seed"]
+        self._planes = None
+
+        self._ids: List[str] = []
+        self._positions: dict = {}
+        self._ids_size = -1
+        self._matrix = None
+        self._signatures = None
+
+    # --- 讀取 -------------------------------------------------------------
+    def _refresh(self) -> None:
+        """
+        ids.txt 大小有變才重新載入 id 清單與 memmap。
+        """
+        size = os.path.getsize(self._ids_path) if os.path.exists(self._ids_path) else 0
+        if size == self._ids_size:
+            return
+        ids = []
+        if size:
+            with open(self._ids_path, encoding="utf-8") as f:
+                ids = [line.rstrip("\n") for line in f if line.endswith("\n")]
+        self._ids = ids
+        self._positions = {note_id: i for i, note_id in enumerate(ids)}
+        self._ids_size = size
+        n = len(ids)
+        if n:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+            self._signatures = np.memmap(self._lsh_path, dtype="<u8", mode="r", shape=(n,))
+        else:
+            self._matrix = self._signatures = None
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._ids)
+
+    def __contains__(self, note_id: str) -> bool:
+        self._refresh()
+        return note_id in self._positions
+
+    def ids(self) -> List[str]:
+        self._refresh()
+        return list(self._ids)
+
+    # --- 寫入 -------------------------------------------------------------
+    def _lsh_planes(self) -> np.ndarray:
+        if self._planes is None:
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal((self.dim, LSH_BITS)).astype(np.float32)
+        return self._planes
+
+    def _truncate_orphans(self) -> None:
+        """
+        上次附加若在寫完 ids.txt 之前中斷，向量與簽章檔會多出沒有 id 的列 (ids.txt 也可能有半行)，
+        不截掉的話之後附加的列號會和 id 對不上。呼叫前須先 _refresh()。
+        """
+        n = len(self._ids)
+        for path, size in (
+            (self._ids_path, sum(len(i.encode("utf-8")) + 1 for i in self._ids)),
+            (self._vectors_path, n * self.dim * 4),
+            (self._lsh_path, n * 8),
+        ):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def _signature(self, vectors: np.ndarray) -> np.ndarray:
+        bits = (vectors @ self._lsh_planes()) > 0
+        return np.packbits(bits, axis=1, bitorder="little").view("<u8").ravel()
+
+    def add(self, note_ids: List[str], vectors: np.ndarray) -> int:
+        """
+        附加新向量 (已存在的 id 會略過)，回傳實際新增的筆數。
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            if self.dim is None or not os.path.exists(self._meta_path):
+                self.dim = self.dim or int(vectors.shape[1])
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim, "seed": self.seed}, f)
+            keep = [i for i, note_id in enumerate(note_ids) if note_id not in self._positions]
+            keep = list({note_ids[i]: i for i in keep}.values())
+            if not keep:
+                return 0
+            self._truncate_orphans()
+            new_vectors = np.ascontiguousarray(vectors[keep])
+            with open(self._vectors_path, "ab") as f:
+                f.write(new_vectors.tobytes())
+            with open(self._lsh_path, "ab") as f:
+                f.write(self._signature(new_vectors).astype("<u8").tobytes())
+            with open(self._ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(note_ids[i] + "\n" for i in keep))
+            return len(keep)
+
+    # --- 查詢 -------------------------------------------------------------
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        approximate: Optional[bool] = None,
+        exclude: Iterable[str] = (),
+    ) -> List[Tuple[str, float]]:
+        """
+        回傳與 query 向量最相近的 k 筆 [(note_id, cosine)]。
+        approximate=None 時，筆數超過 APPROX_THRESHOLD 才改用 LSH 粗篩 + 精算。
+        """
+        self._refresh()
+        n = len(self._ids)
+        if not n:
+            return []
+        query = np.asarray(query, dtype=np.float32).ravel()
+        exclude = {self._positions[i] for i in exclude if i in self._positions}
+        want = min(k + len(exclude), n)
+        if approximate is None:
+            approximate = n > APPROX_THRESHOLD
+
+        if approximate:
+            distances = self._hamming(self._signature(query[None, :])[0])
+            n_candidates = min(n, want * APPROX_CANDIDATES)
+            candidates = np.argpartition(distances, n_candidates - 1)[:n_candidates]
+            candidates.sort()  # 依檔案順序讀取 memmap 比較快
+            scores = self._matrix[candidates] @ query
+        else:
+            candidates = None
+            scores = self._matrix @ query
+
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for j in top:
+            pos = int(candidates[j]) if candidates is not None else int(j)
+            if pos in exclude:
+                continue
+            results.append((self._ids[pos], float(scores[j])))
+        return results[:k]
+
+    def _hamming(self, signature: np.ndarray) -> np.ndarray:
+        xor = np.bitwise_xor(np.asarray(self._signatures), signature)
+        return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+    def similar_to(self, note_id: str, k: int = 10, approximate: Optional[bool] = None) -> List[Tuple[str, float]]:
+        """
+        「找和這篇相似的筆記」：以該筆記自己的向量查詢，並排除自己。
+        """
+        self._refresh()
+        pos = self._positions.get(note_id)
+        if pos is None:
+            return []
+        return self.search(np.array(self._matrix[pos]), k=k, approximate=approximate, exclude=[note_id])
+
+
+# ------------------------------------------------------------------------
+# 與筆記庫整合：只為還沒有向量的筆記計算句向量，並提供文字查詢
+# ------------------------------------------------------------------------
+def note_text(note: dict) -> str:
+    return "\n".join(part for part in (note.get("title"), note.get("summary"), note.get("content")) if part)
+
+
+def sync_index(index: VectorIndex, store, batch_size: int = 64) -> int:
+    """
+    把筆記庫裡尚未建立向量的筆記補進索引，回傳新增筆數。
+    """
+    from utils.gpt import embed_texts
+
+    indexed = set(index.ids())
+    # 先只比對 id，原文只為缺向量的筆記分批讀取，不必把整個筆記庫載入記憶體
+    pending = [note_id for note_id in store.ids() if note_id not in indexed]
+    added = 0
+    for start in range(0, len(pending), batch_size):
+        notes = store.get_notes(pending[start:start + batch_size], columns=["id", "title", "summary", "content"])
+        if not notes:
+            continue
+        vectors = embed_texts([note_text(n) for n in notes])
+        added += index.add([n["id"] for n in notes], vectors)
+    return added
+
+
+def search_text(index: VectorIndex, query: str, k: int = 10, approximate: Optional[bool] = None) -> List[Tuple[str, float]]:
+    """
+    以自然語言描述做語意搜尋，回傳 [(note_id, cosine)]。
+    """
+    from utils.gpt import embed_texts
+
+    if not query.strip() or not len(index):
+        return []
+    return index.search(embed_texts([query])[0], k=k, approximate=approximate)
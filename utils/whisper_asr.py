@@ -1,9 +1,302 @@
-import whisper
-import streamlit as st
+import io
+import os
+import itertools
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from typing import Iterable, Iterator, Optional
 
-model = whisper.load_model("base")
+import numpy as np
 
-@st.cache_data(show_spinner=False)
+from utils._compat import cache_data, cpu_share
+from utils.metrics import span
+from utils.models import register_model
+
+# ------------------------------------------------------------------------
+# 串流式轉錄：
+#   1) ffmpeg 把音訊解碼成 16 kHz 單聲道 PCM，一次只讀一小段 (不必整檔載入記憶體)
+#   2) 以能量門檻的 VAD 找出有聲段落，長靜音直接丟掉
+#   3) 有聲段落打包成不超過 30 秒的視窗 (Whisper 本來就以 30 秒為單位)
+#   4) 視窗送到行程池平行轉錄，最後依時間順序接回；在背景工作的 worker 行程裡，
+#      行程池與 torch 執行緒只用 cpu_share() 分到的核心
+# 路徑與 file-like 物件 (Streamlit 上傳檔、BytesIO) 都可以
+# ------------------------------------------------------------------------
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000     # VAD 以 30ms 為一格
+SILENCE_DB = float(os.environ.get("INSTANOTE_VAD_DB", -40))
+MIN_SILENCE_SECONDS = 0.6                     # 靜音持續這麼久才切段
+SPEECH_PAD_SECONDS = 0.2                      # 段落前後保留的靜音
+WINDOW_SECONDS = 30.0
+WINDOW_GAP_SECONDS = 0.3                      # 同一視窗內段落之間補的靜音
+READ_SECONDS = 1.0
+ASR_WORKERS = int(os.environ.get("INSTANOTE_ASR_WORKERS", 2))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@register_model("whisper")
+def load_whisper_model():
+    """
+    第一次轉錄時才載入 Whisper base 模型 (import whisper 也一併延後)。
+    """
+    import whisper
+    return whisper.load_model("base")
+
+
+# ------------------------------------------------------------------------
+# 解碼
+# ------------------------------------------------------------------------
+def _ffmpeg_cmd(src: str) -> list:
+    return [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", src, "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+    ]
+
+
+def _feed(proc: subprocess.Popen, source) -> None:
+    try:
+        if source.seekable():
+            source.seek(0)
+        while True:
+            chunk = source.read(1 << 16)
+            if not chunk:
+                break
+            proc.stdin.write(chunk)
+    except (BrokenPipeError, ValueError):
+        pass  # ffmpeg 提早結束 (格式錯誤或呼叫端停止讀取)
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def iter_pcm(source, block_seconds: float = READ_SECONDS) -> Iterator[np.ndarray]:
+    """
+    逐段產生 float32 PCM (16 kHz 單聲道，範圍 -1..1)。
+    source 可以是路徑、本地檔案物件，或任何有 read() 的 file-like 物件。
+    """
+    if isinstance(source, (io.FileIO, io.BufferedReader)) and os.path.isfile(source.name):
+        source = source.name  # 真實檔案直接交給 ffmpeg 讀，免得經過管線
+    feeder = None
+    if isinstance(source, (str, os.PathLike)):
+        proc = subprocess.Popen(
+            _ffmpeg_cmd(os.fspath(source)),
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+    else:
+        proc = subprocess.Popen(
+            _ffmpeg_cmd("pipe:0"),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        feeder = threading.Thread(target=_feed, args=(proc, source), daemon=True)
+        feeder.start()
+
+    block_bytes = int(block_seconds * SAMPLE_RATE) * 2
+    finished = False
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            if len(data) % 2:
+                data = data[:-1]
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        finished = True
+    finally:
+        if not finished:
+            proc.kill()
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode("utf-8", "replace")
+        proc.stderr.close()
+        proc.wait()
+        if feeder is not None:
+            feeder.join()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg 解碼失敗：{stderr.strip()}")
+
+
+# ------------------------------------------------------------------------
+# 能量 VAD 與視窗打包
+# ------------------------------------------------------------------------
+def _iter_frames(blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+    rest = np.zeros(0, dtype=np.float32)
+    for block in blocks:
+        buf = np.concatenate([rest, block]) if rest.size else block
+        usable = len(buf) - len(buf) % FRAME_SAMPLES
+        for i in range(0, usable, FRAME_SAMPLES):
+            yield buf[i:i + FRAME_SAMPLES]
+        rest = buf[usable:]
+    if rest.size:
+        yield rest
+
+
+def iter_speech_segments(blocks: Iterable[np.ndarray], stats: Optional[dict] = None) -> Iterator[tuple]:
+    """
+    從 PCM 區塊切出有聲段落，產生 (開始秒數, samples)。
+    stats 若有給，會填入 audio_seconds / speech_seconds。
+    """
+    pad = max(1, int(SPEECH_PAD_SECONDS * SAMPLE_RATE / FRAME_SAMPLES))
+    min_silence = max(1, int(MIN_SILENCE_SECONDS * SAMPLE_RATE / FRAME_SAMPLES))
+    max_frames = int((WINDOW_SECONDS - SPEECH_PAD_SECONDS) * SAMPLE_RATE / FRAME_SAMPLES)
+    before = deque(maxlen=pad)
+    segment, silence, start = [], [], 0
+    total = speech = 0
+
+    def flush():
+        nonlocal segment, silence
+        frames = segment + silence[:pad]
+        before.extend(silence[pad:])   # 沒用到的尾端靜音留給下一段當前置靜音
+        segment, silence = [], []
+        return start / SAMPLE_RATE, np.concatenate(frames)
+
+    for frame in _iter_frames(blocks):
+        energy = 10 * np.log10(np.mean(frame * frame) + 1e-10)
+        if energy > SILENCE_DB:
+            speech += len(frame)
+            if not segment:
+                start = total - sum(len(f) for f in before)
+                segment.extend(before)
+                before.clear()
+            segment.extend(silence)
+            silence = []
+            segment.append(frame)
+            if len(segment) >= max_frames:
+                yield flush()
+        elif segment:
+            silence.append(frame)
+            if len(silence) >= min_silence:
+                yield flush()
+        else:
+            before.append(frame)
+        total += len(frame)
+    if segment:
+        yield flush()
+
+    if stats is not None:
+        stats["audio_seconds"] = total / SAMPLE_RATE
+        stats["speech_seconds"] = speech / SAMPLE_RATE
+
+
+def pack_windows(segments: Iterable[tuple], max_seconds: float = WINDOW_SECONDS) -> Iterator[tuple]:
+    """
+    把相鄰的有聲段落合併成不超過 max_seconds 的視窗，產生 (開始秒數, samples)。
+    """
+    gap = np.zeros(int(WINDOW_GAP_SECONDS * SAMPLE_RATE), dtype=np.float32)
+    limit = int(max_seconds * SAMPLE_RATE)
+    parts, size, start = [], 0, 0.0
+    for seg_start, samples in segments:
+        if parts and size + len(gap) + len(samples) > limit:
+            yield start, np.concatenate(parts)
+            parts, size = [], 0
+        if not parts:
+            start = seg_start
+        else:
+            parts.append(gap)
+            size += len(gap)
+        parts.append(samples)
+        size += len(samples)
+    if parts:
+        yield start, np.concatenate(parts)
+
+
+# ------------------------------------------------------------------------
+# 平行轉錄
+# ------------------------------------------------------------------------
+def _init_asr_worker(num_threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(num_threads)
+    load_whisper_model()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                cores = cpu_share(os.cpu_count() or 1)
+                workers = min(ASR_WORKERS, cores)
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_init_asr_worker,
+                    initargs=(max(1, cores // workers),),
+                )
+    return _pool
+
+
+def _transcribe_window(samples: np.ndarray, language: Optional[str] = None) -> str:
+    result = load_whisper_model().transcribe(
+        samples, language=language, fp16=False, condition_on_previous_text=False,
+    )
+    return result["text"].strip()
+
+
+def _is_cjk(ch: str) -> bool:
+    return "　" <= ch <= "鿿" or "豈" <= ch <= "￯"
+
+
+def join_transcripts(texts: Iterable[str]) -> str:
+    """
+    依序接回各視窗的文字；中日文之間不加空白，其他語言以空白分隔。
+    """
+    out = ""
+    for text in texts:
+        if not text:
+            continue
+        if out and not (_is_cjk(out[-1]) and _is_cjk(text[0])):
+            out += " "
+        out += text
+    return out
+
+
+def transcribe(source, language: Optional[str] = None, max_pending: Optional[int] = None) -> dict:
+    """
+    串流解碼 + VAD + 平行轉錄。回傳
+      {"text", "segments": [{"start", "text"}], "audio_seconds", "speech_seconds", "windows"}。
+    只有一個視窗的短音訊直接在本行程轉錄，不啟動行程池；
+    同時送出的視窗數以 max_pending 為上限，記憶體用量不隨音訊長度增加。
+    """
+    with span("asr.transcribe") as s:
+        result = _transcribe(source, language, max_pending)
+        s.size = result["audio_seconds"]   # 輸入大小以音訊秒數計
+    return result
+
+
+def _transcribe(source, language: Optional[str], max_pending: Optional[int]) -> dict:
+    stats = {}
+    windows = pack_windows(iter_speech_segments(iter_pcm(source), stats))
+    max_pending = max_pending or ASR_WORKERS * 2
+
+    segments, pending = [], deque()
+    first = next(windows, None)
+    second = next(windows, None) if first is not None else None
+    if first is not None and second is None:
+        start, samples = first
+        segments.append({"start": start, "text": _transcribe_window(samples, language)})
+    elif first is not None:
+        pool = _get_pool()
+        for start, samples in itertools.chain([first, second], windows):
+            if len(pending) >= max_pending:
+                seg_start, future = pending.popleft()
+                segments.append({"start": seg_start, "text": future.result()})
+            pending.append((start, pool.submit(_transcribe_window, samples, language)))
+        for seg_start, future in pending:
+            segments.append({"start": seg_start, "text": future.result()})
+
+    return {
+        "text": join_transcripts(s["text"] for s in segments),
+        "segments": segments,
+        "audio_seconds": stats.get("audio_seconds", 0.0),
+        "speech_seconds": stats.get("speech_seconds", 0.0),
+        "windows": len(segments),
+    }
+
+
+@cache_data(show_spinner=False)
 def transcribe_audio(audio_file):
-    result = model.transcribe(audio_file.name)
-    return result["text"]
+    return transcribe(audio_file)["text"]